@@ -1,10 +1,36 @@
-from fastapi import FastAPI, Body
-from app.main import process_event
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Body, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.main import process_event, process_events, warm_up, result_listeners
+from app.storage import close_connections
+from app.behavior import store as behavior_store
+from app.registry import registry as model_registry
+from app.cache import result_cache
+from app.tenants import tenant_id
+from app.metrics import render as render_metrics, gauges
+from app.feed import live_feed, publish_result, sse_stream, parse_cursor
+
+# push every saved result to live dashboards
+result_listeners.append(publish_result)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # load model, rules and users before taking traffic
+    warm_up()
+    live_feed.start()
+    behavior_store.start_snapshots()
+    yield
+    behavior_store.stop_snapshots()
+    live_feed.stop()
+    close_connections()
+
 
 app = FastAPI(
     title="TrustLens AI API",
     description="Real-time cybersecurity risk detection for SMEs",
-    version="2.0"
+    version="2.0",
+    lifespan=lifespan
 )
 
 
@@ -20,15 +46,79 @@ def health_check():
 
 
 # =========================
-# REAL-TIME RISK ANALYSIS
+# MODEL VERSION
 # =========================
-# 🔥 Accept ANY SME JSON (no schema restriction)
-@app.post("/analyze")
-def analyze_event(event: dict = Body(...)):
+@app.get("/model")
+def model_version():
+    return {"version": model_registry.current().version}
+
+
+# =========================
+# RESULT CACHE
+# =========================
+@app.get("/cache/results")
+def result_cache_stats():
+    return result_cache.stats()
+
+
+# =========================
+# METRICS (PROMETHEUS)
+# =========================
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_metrics(
+        gauges("trustlens_result_cache", result_cache.stats(), "Result cache"),
+        gauges("trustlens_feed", live_feed.stats(), "Live feed"),
+    )
+
+
+# =========================
+# TENANTS
+# =========================
+def checked_tenant(tenant):
+    # unknown and malformed tenant ids are client errors
+    try:
+        return tenant_id({"tenant": tenant})
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+# =========================
+# LIVE FEED
+# =========================
+# Every scored result as it is saved. Reconnect with ?since=<id>
+# (or Last-Event-ID) to replay what was missed; ?tenant= for one
+# tenant's results instead of the shared deployment's.
+@app.get("/feed")
+def live_feed_sse(since: int = None, tenant: str = None, last_event_id: str = Header(None)):
+    tenant = checked_tenant(tenant)
+    return StreamingResponse(
+        sse_stream(live_feed, parse_cursor(since, last_event_id), tenant),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    # pass raw event directly
-    result = process_event(event)
 
+@app.websocket("/feed/ws")
+async def live_feed_ws(websocket: WebSocket, since: int = None, tenant: str = None):
+    try:
+        tenant = tenant_id({"tenant": tenant})
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        async for kind, seq, message in live_feed.stream(since, tenant):
+            await websocket.send_json({"type": kind, "id": seq, "data": message})
+    except WebSocketDisconnect:
+        pass
+
+
+# =========================
+# RESPONSE FORMAT
+# =========================
+def format_result(result):
     return {
         "risk": result["risk"],
         "reasons": result["reasons"],
@@ -42,4 +132,34 @@ def analyze_event(event: dict = Body(...)):
             if result["risk"] >= 40 else
             "No action required"
         )
-    }
\ No newline at end of file
+    }
+
+
+# =========================
+# REAL-TIME RISK ANALYSIS
+# =========================
+# 🔥 Accept ANY SME JSON (no schema restriction)
+@app.post("/analyze")
+def analyze_event(event: dict = Body(...)):
+
+    checked_tenant(event.get("tenant"))
+
+    # pass raw event directly
+    result = process_event(event)
+
+    return format_result(result)
+
+
+# =========================
+# BATCH RISK ANALYSIS
+# =========================
+# Collectors flush bursts of events in one request
+@app.post("/analyze/batch")
+def analyze_batch(events: list[dict] = Body(...)):
+
+    for event in events:
+        checked_tenant(event.get("tenant"))
+
+    results = process_events(events)
+
+    return [format_result(result) for result in results]
@@ -1,15 +1,79 @@
-from fastapi import FastAPI, Header, HTTPException, Request
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Body, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 import os
 
-from app.main import process_event
+from app.main import score_event, score_events, warm_up
+from app.storage import close_connections
+from app.behavior import store as behavior_store
+from app.registry import registry as model_registry
+from app.tenants import tenant_registries, tenant_id, known_tenants, db_path, scoped
+from app.pipeline import AuditQueue, run_scoring, audit_maintenance, model_retraining
+from app.workers import ScoringPool
+from app.config import SCORING_WORKERS, AUDIT_MAINTENANCE_INTERVAL, RETRAIN_INTERVAL
+from app.users import registry as user_registry
+from app.blocklist import blocklist, KINDS
+from app.cache import result_cache
+from app.metrics import render as render_metrics, gauges
+from app.feed import live_feed, publish_audit, sse_stream, parse_cursor
+from app.analytics import Query, stream as stream_analytics, query_records, MEDIA_TYPES
 
 # Load .env variables
 load_dotenv()
 
 API_KEY = os.getenv("TRUSTLENS_API_KEY")
 
-app = FastAPI(title="TrustLens AI API")
+# rows reach live dashboards once they are committed, so a client
+# reloading from the database never misses one it was pushed
+audit_queue = AuditQueue(on_saved=publish_audit)
+
+# Optional multi-process scoring (SCORING_WORKERS > 0)
+scoring_pool = ScoringPool() if SCORING_WORKERS > 0 else None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # load model, rules and users before taking traffic
+    warm_up()
+    if scoring_pool is not None:
+        await scoring_pool.start()
+    await audit_queue.start()
+    live_feed.start()
+    behavior_store.start_snapshots()
+    # compaction + retention of the audit table
+    background = []
+    if AUDIT_MAINTENANCE_INTERVAL > 0:
+        background.append(asyncio.create_task(audit_maintenance()))
+    # periodic retraining from the audit history (off by default)
+    if RETRAIN_INTERVAL > 0:
+        background.append(asyncio.create_task(model_retraining()))
+    yield
+    for task in background:
+        task.cancel()
+    behavior_store.stop_snapshots()
+    if scoring_pool is not None:
+        await scoring_pool.stop()
+    # flush pending audit rows (and publish them) before exit
+    await audit_queue.stop()
+    live_feed.stop()
+    close_connections()
+
+
+async def score_one(event):
+    if scoring_pool is not None:
+        return await scoring_pool.submit(event)
+    return await run_scoring(score_event, event)
+
+
+async def score_many(events):
+    if scoring_pool is not None:
+        return await scoring_pool.submit_batch(events)
+    return await run_scoring(score_events, events)
+
+
+app = FastAPI(title="TrustLens AI API", lifespan=lifespan)
 
 
 @app.get("/")
@@ -17,18 +81,7 @@ def health_check():
     return {"status": "TrustLens AI running"}
 
 
-@app.post("/event")
-async def receive_event(
-    request: Request,
-    x_api_key: str = Header(None)
-):
-    """
-    Receives security events from bank-sme UI
-    Verifies API key
-    Sends to TrustLens AI engine
-    Returns risk result
-    """
-
+def verify_api_key(x_api_key):
     # Validate API key exists
     if not API_KEY:
         raise HTTPException(status_code=500, detail="Server key not configured")
@@ -37,18 +90,313 @@ async def receive_event(
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
-    # Read event body
-    event = await request.json()
 
+def apply_defaults(event):
     # Validate essential fields
     event.setdefault("user", "Unknown")
     event.setdefault("ip", "Unknown")
     event.setdefault("device", "Unknown Device")
     event.setdefault("location", "Unknown Location")
     event.setdefault("unknown_user", 1 if event.get("role") == "unknown" else 0)
+    checked_tenant(event.get("tenant"))
+    return event
+
+
+def checked_tenant(tenant):
+    # unknown and malformed tenant ids are client errors
+    try:
+        return tenant_id({"tenant": tenant})
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@app.post("/event")
+async def receive_event(
+    request: Request,
+    x_api_key: str = Header(None)
+):
+    """
+    Receives security events from bank-sme UI
+    Verifies API key
+    Sends to TrustLens AI engine
+    Returns risk result
+    """
 
-    # Process with AI engine
-    result = process_event(event)
+    verify_api_key(x_api_key)
+
+    # Read event body
+    event = apply_defaults(await request.json())
+
+    # Process with AI engine (off the event loop)
+    result, audit = await score_one(event)
+
+    # Audit is written (and pushed to live dashboards) behind the response
+    await audit_queue.put(audit)
 
     # Return response
-    return result
\ No newline at end of file
+    return result
+
+
+@app.post("/events/batch")
+async def receive_events(
+    events: list[dict] = Body(...),
+    x_api_key: str = Header(None)
+):
+    """
+    Receives a burst of security events in one request
+    Scores them together with one model call
+    Returns one risk result per event, in order
+    """
+
+    verify_api_key(x_api_key)
+
+    events = [apply_defaults(event) for event in events]
+
+    evaluated = await score_many(events)
+
+    await audit_queue.put_many([audit for _, audit in evaluated])
+
+    return [result for result, _ in evaluated]
+
+
+@app.get("/audit/queue")
+def audit_queue_stats():
+    """
+    Write-behind queue depth and drop/block counters
+    """
+    return audit_queue.stats()
+
+
+@app.get("/scoring/pool")
+def scoring_pool_stats():
+    """
+    Worker count and micro-batching counters
+    """
+    if scoring_pool is None:
+        return {"workers": 0}
+    return scoring_pool.stats()
+
+
+@app.get("/cache/results")
+def result_cache_stats():
+    """
+    Result cache size and hit/miss counters
+    (this process; with SCORING_WORKERS the cache stays here too)
+    """
+    return result_cache.stats()
+
+
+@app.delete("/cache/results")
+def clear_result_cache(x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    result_cache.clear()
+    return {"status": "cleared"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus text format: per-stage latency, risk bands, blocks,
+    audit queue, scoring pool and result cache
+    """
+    extra = [
+        gauges("trustlens_audit_queue", audit_queue.stats(), "Audit write-behind queue"),
+        gauges("trustlens_result_cache", result_cache.stats(), "Result cache"),
+        gauges("trustlens_feed", live_feed.stats(), "Live feed"),
+    ]
+    if scoring_pool is not None:
+        extra.append(gauges("trustlens_scoring_pool", scoring_pool.stats(), "Scoring worker pool"))
+    return render_metrics(*extra)
+
+
+# =========================
+# LIVE FEED
+# =========================
+@app.get("/feed")
+def live_feed_sse(
+    since: int = None,
+    tenant: str = None,
+    last_event_id: str = Header(None),
+    x_api_key: str = Header(None)
+):
+    """
+    Server-Sent Events stream of every scored result
+    Resume with ?since=<id> or the Last-Event-ID header
+    ?tenant= streams that tenant's results instead of the shared ones
+    """
+    verify_api_key(x_api_key)
+    tenant = checked_tenant(tenant)
+    return StreamingResponse(
+        sse_stream(live_feed, parse_cursor(since, last_event_id), tenant),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/feed/ws")
+async def live_feed_ws(websocket: WebSocket, since: int = None, tenant: str = None):
+    """
+    Same stream over a WebSocket: {"type", "id", "data"} messages
+    """
+    if not API_KEY or websocket.headers.get("x-api-key") != API_KEY:
+        await websocket.close(code=1008)
+        return
+    try:
+        tenant = tenant_id({"tenant": tenant})
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        async for kind, seq, message in live_feed.stream(since, tenant):
+            await websocket.send_json({"type": kind, "id": seq, "data": message})
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/feed/stats")
+def live_feed_stats():
+    """
+    Subscribers, sequence number and per-client drop counter
+    """
+    return live_feed.stats()
+
+
+# =========================
+# ANALYTICS
+# =========================
+@app.post("/analytics/query")
+async def analytics_query(
+    request: Request,
+    format: str = "json",
+    tenant: str = None,
+    x_api_key: str = Header(None)
+):
+    """
+    Group-by / filter / top-k over the whole audit history (hot + archived)
+    format=json returns the rows; csv / arrow stream them in chunks
+    ?tenant= queries that tenant's audit database
+    """
+    verify_api_key(x_api_key)
+    path = db_path(checked_tenant(tenant))
+
+    try:
+        query = Query.from_dict(await request.json())
+        if format == "json":
+            return await asyncio.get_running_loop().run_in_executor(None, query_records, query, path)
+        chunks = stream_analytics(query, format, path)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Arrow output needs pyarrow installed")
+
+    extension = "arrows" if format == "arrow" else format
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=trustlens-analytics.{extension}"}
+    )
+
+
+# =========================
+# REGISTERED USERS (ADMIN)
+# =========================
+@app.post("/users/reload")
+def reload_users(x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    user_registry.reload()
+    return {"users": len(user_registry)}
+
+
+@app.post("/users/{username}")
+def register_user(username: str, x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    user_registry.add_user(username)
+    return {"username": username, "registered": True}
+
+
+@app.delete("/users/{username}")
+def unregister_user(username: str, x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    user_registry.remove_user(username)
+    return {"username": username, "registered": False}
+
+
+
+# =========================
+# MODEL / RULES (ADMIN)
+# =========================
+@app.get("/model")
+def model_version():
+    return {"version": model_registry.current().version}
+
+
+@app.post("/model/reload")
+def reload_model(x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    return {"version": model_registry.reload().version}
+
+
+# =========================
+# TENANTS (ADMIN)
+# =========================
+@app.get("/tenants")
+def tenant_stats():
+    """
+    Tenants with loaded models/rules and LRU counters
+    """
+    return tenant_registries.stats()
+
+
+@app.post("/tenants/{tenant}/reload")
+def reload_tenant(tenant: str, x_api_key: str = Header(None)):
+    """
+    Re-resolve and reload a tenant's model and rules files
+    (after adding, replacing or removing them)
+    """
+    verify_api_key(x_api_key)
+    tenant = checked_tenant(tenant)
+    tenant_registries.forget(tenant)
+    return {"tenant": tenant, "version": tenant_registries.get(tenant).reload().version}
+
+
+# =========================
+# BLOCK LIST (ADMIN)
+# =========================
+# Blocks apply to one tenant: ?tenant= (none = shared deployment)
+@app.get("/blocks")
+def list_blocks(tenant: str = None, x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    tenant = checked_tenant(tenant)
+    prefixes = (f"{tenant}:",) if tenant is not None else tuple(f"{name}:" for name in known_tenants())
+    blocks = []
+    for entry in blocklist.active():
+        value = str(entry["value"])
+        if tenant is not None:
+            if not value.startswith(prefixes):
+                continue
+            entry["value"] = value[len(prefixes[0]):]
+        elif prefixes and value.startswith(prefixes):
+            continue
+        blocks.append(entry)
+    return blocks
+
+
+@app.post("/blocks/{kind}/{value}")
+def add_block(kind: str, value: str, ttl: float = None, reason: str = "", tenant: str = None,
+              x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    if kind not in KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown block kind: {kind}")
+    blocklist.block(kind, scoped(checked_tenant(tenant), value), ttl=ttl, reason=reason)
+    return {"kind": kind, "value": value, "tenant": tenant, "blocked": True}
+
+
+@app.delete("/blocks/{kind}/{value}")
+def remove_block(kind: str, value: str, tenant: str = None, x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    if kind not in KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown block kind: {kind}")
+    blocklist.unblock(kind, scoped(checked_tenant(tenant), value))
+    return {"kind": kind, "value": value, "tenant": tenant, "blocked": False}
@@ -0,0 +1,429 @@
+"""
+Analytics over the full audit history: the hot audit table plus the
+archived day partitions (app/archive.py).
+
+A query is a small JSON document:
+
+    {
+        "start": "2026-07-01", "end": "2026-10-01",
+        "filters": {"location": "Nairobi, Kenya", "min_risk": 40},
+        "group_by": ["user"],
+        "metrics": ["blocked", "count", "mean_risk"],
+        "order_by": "blocked", "limit": 50
+    }
+
+With group_by and/or metrics it aggregates; without, it exports the
+matching rows (`columns` picks which). Data is scanned column-wise in
+chunks: only the needed columns are read from each Parquet partition
+and from the hot table, each chunk is reduced to partial aggregates
+and the partials are merged, so memory grows with the number of
+groups, not rows. Results stream out as CSV or Arrow IPC chunks.
+
+    python -m app.analytics query.json --format csv > blocked_users.csv
+"""
+import argparse
+import importlib.util
+import io
+import json
+import sqlite3
+import sys
+from app.migrations import AUDIT_COLUMNS, migrate
+from app.archive import init_archive, read_archived
+from app.config import DB_PATH
+
+CHUNK_SIZE = 50_000
+MERGE_EVERY = 16
+
+# exportable audit columns (the JSON blob is superseded by the typed columns)
+EXPORT_COLUMNS = [col for col, _ in AUDIT_COLUMNS if col != "event"]
+
+COLUMN_TYPES = {
+    col: "int" if decl.startswith("INTEGER") else "float" if decl.startswith("REAL") else "str"
+    for col, decl in AUDIT_COLUMNS
+}
+
+# derived dimensions: (source column, timestamp prefix length)
+TIME_DIMENSIONS = {
+    "day": 10,
+    "hour": 13,
+    "month": 7,
+}
+
+DIMENSIONS = ["user", "ip", "session_id", "device", "location", "role", "model_version", "band"] + list(TIME_DIMENSIONS)
+
+# equality filters; risk has min_risk / max_risk instead
+FILTER_COLUMNS = ["user", "ip", "session_id", "device", "location", "role", "model_version",
+                  "blocked", "verified", "credentials_rotated"]
+
+# metric -> how it is computed from the merged partials
+METRICS = ["count", "blocked", "rotated", "verified", "sum_risk", "mean_risk", "max_risk", "min_risk"]
+
+# partial aggregate -> (source column, reduction within a chunk, reduction across chunks)
+PARTIALS = {
+    "count": ("id", "size", "sum"),
+    "blocked": ("blocked", "sum", "sum"),
+    "rotated": ("credentials_rotated", "sum", "sum"),
+    "verified": ("verified", "sum", "sum"),
+    "risk_n": ("risk", "count", "sum"),
+    "sum_risk": ("risk", "sum", "sum"),
+    "max_risk": ("risk", "max", "max"),
+    "min_risk": ("risk", "min", "min"),
+}
+
+
+# =========================================
+# QUERY
+# =========================================
+class Query:
+    """
+    Validated analytics query; raises ValueError on bad input.
+    """
+
+    def __init__(self, start=None, end=None, filters=None, group_by=None, metrics=None,
+                 order_by=None, descending=True, limit=None, columns=None):
+        self.start = start
+        self.end = end
+        self.filters = dict(filters or {})
+        self.group_by = list(group_by or [])
+        self.metrics = list(metrics or [])
+        self.limit = int(limit) if limit is not None else None
+        self.descending = bool(descending)
+
+        for key in self.filters:
+            if key not in FILTER_COLUMNS and key not in ("min_risk", "max_risk"):
+                raise ValueError(f"Unknown filter: {key}")
+        for dim in self.group_by:
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown group_by dimension: {dim} (choose from {DIMENSIONS})")
+        for metric in self.metrics:
+            if metric not in METRICS:
+                raise ValueError(f"Unknown metric: {metric} (choose from {METRICS})")
+        if self.limit is not None and self.limit < 0:
+            raise ValueError("limit must be >= 0")
+
+        self.aggregate = bool(self.group_by or self.metrics)
+        if self.aggregate and not self.metrics:
+            self.metrics = ["count"]
+
+        if self.aggregate:
+            self.columns = self.group_by + self.metrics
+            self.order_by = order_by or self.metrics[0]
+            if self.order_by not in self.columns:
+                raise ValueError(f"order_by must be one of {self.columns}")
+        else:
+            self.columns = list(columns or EXPORT_COLUMNS)
+            for col in self.columns:
+                if col not in EXPORT_COLUMNS:
+                    raise ValueError(f"Unknown column: {col}")
+            self.order_by = None
+
+    @classmethod
+    def from_dict(cls, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("Query must be a JSON object")
+        known = {"start", "end", "filters", "group_by", "metrics", "order_by", "descending", "limit", "columns"}
+        unknown = set(spec) - known
+        if unknown:
+            raise ValueError(f"Unknown query keys: {sorted(unknown)}")
+        return cls(**spec)
+
+    def source_columns(self):
+        """
+        Audit columns the scan has to read.
+        """
+        needed = {"id", "timestamp"}
+        needed.update(col for col in self.filters if col in FILTER_COLUMNS)
+        if "min_risk" in self.filters or "max_risk" in self.filters:
+            needed.add("risk")
+
+        if not self.aggregate:
+            needed.update(self.columns)
+            return [col for col in EXPORT_COLUMNS if col in needed]
+
+        for dim in self.group_by:
+            needed.add("risk" if dim == "band" else "timestamp" if dim in TIME_DIMENSIONS else dim)
+        for metric in self.metrics:
+            for name, (source, _, _) in PARTIALS.items():
+                if name == metric or (metric == "mean_risk" and name in ("sum_risk", "risk_n")):
+                    needed.add(source)
+        return [col for col in EXPORT_COLUMNS if col in needed]
+
+
+# =========================================
+# COLUMNAR SCAN
+# =========================================
+def connect(path=DB_PATH):
+    # dedicated read connection: streaming responses resume the scan
+    # on whichever thread serves the next chunk
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout=5000")
+    # databases the server never opened (db_init.py's, a new tenant's)
+    # may lack the typed columns or the archive manifest
+    migrate(conn)
+    init_archive(conn)
+    return conn
+
+
+def hot_sql(query, columns):
+    clauses, params = [], []
+    if query.start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(query.start)
+    if query.end is not None:
+        clauses.append("timestamp < ?")
+        params.append(query.end)
+    for col, value in query.filters.items():
+        if col == "min_risk":
+            clauses.append("risk >= ?")
+        elif col == "max_risk":
+            clauses.append("risk <= ?")
+        else:
+            clauses.append(f'"{col}" = ?')
+        params.append(value)
+
+    select = ", ".join(f'"{col}"' for col in columns)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"SELECT {select} FROM audit{where} ORDER BY id", params
+
+
+def apply_filters(df, query):
+    mask = None
+    for col, value in query.filters.items():
+        if col == "min_risk":
+            cond = df["risk"] >= value
+        elif col == "max_risk":
+            cond = df["risk"] <= value
+        else:
+            cond = df[col] == value
+        mask = cond if mask is None else mask & cond
+    return df if mask is None else df[mask]
+
+
+def scan(conn, query, chunk_size=CHUNK_SIZE):
+    """
+    DataFrame chunks of the matching rows (source columns only):
+    archived partitions first (days outside [start, end) are skipped
+    unread), then the hot table with the filters pushed into SQL.
+    """
+    import pandas as pd
+
+    columns = query.source_columns()
+
+    for df in read_archived(conn, columns, start=query.start, end=query.end):
+        df = apply_filters(df, query)
+        for offset in range(0, len(df), chunk_size):
+            yield df.iloc[offset:offset + chunk_size]
+
+    sql, params = hot_sql(query, columns)
+    for df in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_size):
+        if not df.empty:
+            yield df
+
+
+# =========================================
+# AGGREGATION
+# =========================================
+def group_keys(query):
+    # totals (no group_by) are a single group
+    return query.group_by or ["_all"]
+
+
+def add_dimensions(df, query):
+    for dim in query.group_by:
+        if dim in TIME_DIMENSIONS:
+            df[dim] = df["timestamp"].str.slice(0, TIME_DIMENSIONS[dim])
+        elif dim == "band":
+            # same thresholds as rollups.risk_band()
+            df[dim] = "low"
+            df.loc[df["risk"] >= 40, dim] = "medium"
+            df.loc[df["risk"] >= 70, dim] = "high"
+    if not query.group_by:
+        df["_all"] = 0
+    return df
+
+
+def partial_aggregate(df, query):
+    df = add_dimensions(df.copy(), query)
+    spec = {
+        name: (source, chunk_reduce)
+        for name, (source, chunk_reduce, _) in PARTIALS.items()
+        if source in df.columns
+    }
+    return df.groupby(group_keys(query), dropna=False, sort=False).agg(**spec)
+
+
+def merge_partials(partials, query):
+    import pandas as pd
+
+    merged = pd.concat(partials)
+    reducers = {name: PARTIALS[name][2] for name in merged.columns}
+    keys = group_keys(query)
+    return merged.groupby(level=list(range(len(keys))), dropna=False, sort=False).agg(reducers)
+
+
+def finalize(merged, query):
+    if "mean_risk" in query.metrics:
+        merged["mean_risk"] = merged["sum_risk"] / merged["risk_n"].where(merged["risk_n"] > 0)
+
+    result = merged.reset_index()[query.columns]
+    result = result.sort_values(query.order_by, ascending=not query.descending, kind="stable")
+    if query.limit is not None:
+        result = result.head(query.limit)
+    return result.reset_index(drop=True)
+
+
+def run(conn, query, chunk_size=CHUNK_SIZE):
+    """
+    DataFrame chunks of the query result.
+    """
+    import pandas as pd
+
+    if not query.aggregate:
+        remaining = query.limit
+        for df in scan(conn, query, chunk_size):
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                df = df.head(remaining)
+                remaining -= len(df)
+            yield df[query.columns]
+        return
+
+    partials = []
+    for df in scan(conn, query, chunk_size):
+        partials.append(partial_aggregate(df, query))
+        if len(partials) >= MERGE_EVERY:
+            # fold as we go: memory stays bounded by the number of groups
+            partials = [merge_partials(partials, query)]
+
+    if not partials:
+        if not query.group_by:
+            yield pd.DataFrame([{m: None if m.endswith("_risk") else 0 for m in query.metrics}])
+        return
+
+    result = finalize(merge_partials(partials, query), query)
+    for offset in range(0, len(result), chunk_size):
+        yield result.iloc[offset:offset + chunk_size]
+
+
+# =========================================
+# OUTPUT FORMATS
+# =========================================
+def csv_chunks(frames):
+    header = True
+    for df in frames:
+        yield df.to_csv(index=False, header=header)
+        header = False
+
+
+def arrow_schema(query):
+    import pyarrow as pa
+
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+    fields = []
+    for col in query.columns:
+        if col in METRICS:
+            kind = "float" if col.endswith("_risk") else "int"
+        elif col in TIME_DIMENSIONS or col == "band":
+            kind = "str"
+        else:
+            kind = COLUMN_TYPES[col]
+        fields.append(pa.field(col, types[kind]))
+    return pa.schema(fields)
+
+
+def arrow_chunks(frames, query):
+    """
+    Arrow IPC stream: the schema, then one record batch per chunk.
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema(query)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    for df in frames:
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        for batch in table.to_batches():
+            writer.write_batch(batch)
+        yield drain()
+
+    writer.close()
+    yield drain()
+
+
+def records(frames):
+    """
+    JSON-ready rows (NaN -> None); materializes the result.
+    """
+    rows = []
+    for df in frames:
+        df = df.astype(object)
+        rows += df.where(df.notna(), None).to_dict(orient="records")
+    return rows
+
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def stream(query, fmt, path=DB_PATH, chunk_size=CHUNK_SIZE):
+    """
+    Encoded result chunks (str for CSV, bytes for Arrow) for one query,
+    on a dedicated read connection closed when the stream ends.
+    Bad formats fail here, before anything is streamed.
+    """
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown format: {fmt} (choose from {list(MEDIA_TYPES)})")
+    if fmt == "arrow" and importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("Arrow output needs pyarrow")
+    return _stream(query, fmt, path, chunk_size)
+
+
+def _stream(query, fmt, path, chunk_size):
+    conn = connect(path)
+    try:
+        frames = run(conn, query, chunk_size)
+        encoded = csv_chunks(frames) if fmt == "csv" else arrow_chunks(frames, query)
+        for chunk in encoded:
+            yield chunk
+    finally:
+        conn.close()
+
+
+def query_records(query, path=DB_PATH):
+    conn = connect(path)
+    try:
+        return records(run(conn, query))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an analytics query over the audit history")
+    parser.add_argument("query", help="query JSON file, or - for stdin")
+    parser.add_argument("--format", choices=["json"] + list(MEDIA_TYPES), default="csv")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    source = sys.stdin if args.query == "-" else open(args.query, encoding="utf-8")
+    with source:
+        query = Query.from_dict(json.load(source))
+
+    if args.format == "json":
+        json.dump(query_records(query, args.db), sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif args.format == "csv":
+        for chunk in stream(query, "csv", args.db):
+            sys.stdout.write(chunk)
+    else:
+        for chunk in stream(query, "arrow", args.db):
+            sys.stdout.buffer.write(chunk)
@@ -0,0 +1,334 @@
+"""
+Day partitions, compaction and retention for the audit table.
+
+The audit table is the hot partition: it keeps the last
+AUDIT_HOT_DAYS days, so inserts, the live feed, the dashboard and
+admin updates work as before. Older days are compacted into one
+compressed columnar file per day under AUDIT_ARCHIVE_DIR (Parquet when
+pyarrow is installed, gzip JSON lines otherwise) and removed from the
+table. Archives older than AUDIT_RETENTION_DAYS are deleted.
+
+The audit_archive table lists the archived partitions (day, file, row
+and id range), so storage queries can read hot and archived rows
+together. Ids keep increasing (AUTOINCREMENT), so id cursors stay valid
+across compaction. Compaction leaves the rollup tables alone, so risk
+trends keep covering archived days; maintenance drops minute and hour
+buckets once they are older than any window they serve
+(ROLLUP_MINUTE_DAYS / ROLLUP_HOUR_DAYS) and day buckets with the
+archives they summarize.
+
+    python -m app.archive                 # compact + retention, config defaults
+    python -m app.archive --hot-days 3 --retention-days 90 --vacuum
+"""
+import argparse
+import importlib.util
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from app.migrations import AUDIT_COLUMNS
+from app.rollups import prune_rollups
+from app.config import (
+    DB_PATH, AUDIT_HOT_DAYS, AUDIT_RETENTION_DAYS, AUDIT_ARCHIVE_DIR, AUDIT_ARCHIVE_FORMAT,
+    ROLLUP_MINUTE_DAYS, ROLLUP_HOUR_DAYS,
+)
+
+ARCHIVE_COLUMNS = [col for col, _ in AUDIT_COLUMNS]
+
+ARCHIVE_TABLE = """
+CREATE TABLE IF NOT EXISTS audit_archive (
+    day TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    format TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    min_id INTEGER,
+    max_id INTEGER,
+    created TEXT
+)
+"""
+
+EXTENSIONS = {
+    "parquet": ".parquet",
+    "jsonl.gz": ".jsonl.gz",
+}
+
+# rows whose timestamp starts with a date; anything else stays hot
+DAY_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*"
+
+# pandas is imported on first use only: servers that never read or
+# compact archives do not pay for it at startup
+
+
+def init_archive(conn):
+    with conn:
+        conn.execute(ARCHIVE_TABLE)
+
+
+# =========================================
+# FILE FORMATS
+# =========================================
+def resolve_format(fmt=AUDIT_ARCHIVE_FORMAT):
+    """
+    "auto" picks Parquet when pyarrow is importable.
+    """
+    if fmt == "auto":
+        return "parquet" if importlib.util.find_spec("pyarrow") else "jsonl.gz"
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown archive format: {fmt}")
+    return fmt
+
+
+def write_partition(df, path, fmt):
+    """
+    Write atomically: a crash never leaves a half-written archive.
+    """
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp_path, index=False, compression="zstd")
+    else:
+        df.to_json(tmp_path, orient="records", lines=True, compression="gzip")
+    os.replace(tmp_path, path)
+
+
+def read_partition(path, fmt, columns=None):
+    import pandas as pd
+
+    if fmt == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_json(path, lines=True, compression="gzip", dtype=False, convert_dates=False)
+        if columns is not None:
+            df = df.reindex(columns=columns)
+    return df
+
+
+def to_tuples(df, columns):
+    """
+    DataFrame rows as plain tuples (NaN -> None), like sqlite rows.
+    """
+    df = df.reindex(columns=columns).astype(object)
+    df = df.where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+# =========================================
+# MANIFEST
+# =========================================
+def partitions(conn, after_id=None, start=None, end=None, newest_first=False):
+    """
+    Archived partitions as (day, path, format, rows, min_id, max_id),
+    optionally only those with ids above after_id or days in [start, end).
+    start/end: "YYYY-MM-DD" strings (or longer ISO timestamps).
+    """
+    clauses, params = [], []
+    if after_id is not None:
+        clauses.append("max_id > ?")
+        params.append(after_id)
+    if start is not None:
+        clauses.append("day >= ?")
+        params.append(start[:10])
+    if end is not None:
+        clauses.append("day <= ?")
+        params.append(end[:10])
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = "DESC" if newest_first else "ASC"
+    return conn.execute(
+        f"SELECT day, path, format, rows, min_id, max_id FROM audit_archive {where} ORDER BY day {order}",
+        params
+    ).fetchall()
+
+
+def archived_max_id(conn):
+    return conn.execute("SELECT MAX(max_id) FROM audit_archive").fetchone()[0] or 0
+
+
+def read_archived(conn, columns, after_id=None, start=None, end=None, newest_first=False):
+    """
+    Archived rows as one DataFrame per partition (id order within
+    each), filtered to id > after_id and start <= timestamp < end.
+    """
+    for _, path, fmt, _, _, _ in partitions(conn, after_id, start, end, newest_first):
+        if not os.path.exists(path):
+            continue
+
+        wanted = list(dict.fromkeys(["id", "timestamp"] + list(columns)))
+        df = read_partition(path, fmt, wanted)
+
+        mask = None
+        if after_id is not None:
+            mask = df["id"] > after_id
+        if start is not None:
+            mask = (df["timestamp"] >= start) if mask is None else mask & (df["timestamp"] >= start)
+        if end is not None:
+            mask = (df["timestamp"] < end) if mask is None else mask & (df["timestamp"] < end)
+        if mask is not None:
+            df = df[mask]
+
+        if newest_first:
+            df = df.iloc[::-1]
+
+        if not df.empty:
+            yield df[list(columns)]
+
+
+def update_archived(conn, row_id, values):
+    """
+    Set columns of one archived row (admin corrections such as an
+    unblock) by rewriting the file of the partition holding it.
+    Returns: True when the row was found.
+    """
+    candidates = conn.execute(
+        "SELECT path, format FROM audit_archive WHERE min_id <= ? AND max_id >= ?", (row_id, row_id)
+    ).fetchall()
+
+    for path, fmt in candidates:
+        if not os.path.exists(path):
+            continue
+        df = read_partition(path, fmt, ARCHIVE_COLUMNS)
+        match = df["id"] == row_id
+        if not match.any():
+            continue
+        for col, value in values.items():
+            df.loc[match, col] = value
+        write_partition(df, path, fmt)
+        return True
+
+    return False
+
+
+# =========================================
+# COMPACTION
+# =========================================
+def compact(conn, hot_days=AUDIT_HOT_DAYS, archive_dir=AUDIT_ARCHIVE_DIR, fmt=AUDIT_ARCHIVE_FORMAT, now=None):
+    """
+    Move every full day older than hot_days from the audit table into
+    its archive file. Rows that arrive late for an already archived day
+    (e.g. backfills) are merged into that day's file.
+    Returns: list of (day, rows moved).
+    """
+    fmt = resolve_format(fmt)
+    now = now or datetime.utcnow()
+    cutoff = (now - timedelta(days=hot_days)).strftime("%Y-%m-%d")
+    os.makedirs(archive_dir, exist_ok=True)
+
+    days = [row[0] for row in conn.execute(
+        "SELECT DISTINCT substr(timestamp, 1, 10) FROM audit "
+        "WHERE timestamp < ? AND timestamp GLOB ? ORDER BY 1",
+        (cutoff, DAY_GLOB)
+    )]
+
+    moved = []
+    for day in days:
+        moved.append((day, _compact_day(conn, day, archive_dir, fmt)))
+    return moved
+
+
+def _compact_day(conn, day, archive_dir, fmt):
+    import pandas as pd
+
+    next_day = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    select = ", ".join(f'"{col}"' for col in ARCHIVE_COLUMNS)
+    df = pd.read_sql_query(
+        f"SELECT {select} FROM audit WHERE timestamp >= ? AND timestamp < ? ORDER BY id",
+        conn, params=(day, next_day)
+    )
+    if df.empty:
+        return 0
+
+    existing = conn.execute("SELECT path, format FROM audit_archive WHERE day = ?", (day,)).fetchone()
+    path = os.path.join(archive_dir, f"audit-{day}{EXTENSIONS[fmt]}")
+
+    if existing is not None and os.path.exists(existing[0]):
+        # late rows, or a rerun after a crash between write and delete
+        old = read_partition(existing[0], existing[1], ARCHIVE_COLUMNS)
+        merged = pd.concat([old, df], ignore_index=True)
+        merged = merged.drop_duplicates("id", keep="last").sort_values("id")
+    else:
+        merged = df
+
+    # file first, then the manifest and the delete in one transaction
+    write_partition(merged, path, fmt)
+
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO audit_archive (day, path, format, rows, min_id, max_id, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (day, path, fmt, len(merged), int(merged["id"].min()), int(merged["id"].max()),
+             datetime.utcnow().isoformat())
+        )
+        conn.execute("DELETE FROM audit WHERE timestamp >= ? AND timestamp < ? AND id <= ?",
+                     (day, next_day, int(df["id"].max())))
+
+    if existing is not None and existing[0] != path and os.path.exists(existing[0]):
+        os.remove(existing[0])
+
+    return len(df)
+
+
+# =========================================
+# RETENTION
+# =========================================
+def apply_retention(conn, retention_days=AUDIT_RETENTION_DAYS, now=None):
+    """
+    Delete archived partitions older than retention_days (None/0 keeps
+    everything). Returns: list of removed days.
+    """
+    if not retention_days:
+        return []
+
+    now = now or datetime.utcnow()
+    cutoff = (now - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+
+    expired = conn.execute("SELECT day, path FROM audit_archive WHERE day < ? ORDER BY day", (cutoff,)).fetchall()
+    for day, path in expired:
+        if os.path.exists(path):
+            os.remove(path)
+        with conn:
+            conn.execute("DELETE FROM audit_archive WHERE day = ?", (day,))
+
+    return [day for day, _ in expired]
+
+
+def maintain(conn, hot_days=AUDIT_HOT_DAYS, retention_days=AUDIT_RETENTION_DAYS,
+             archive_dir=AUDIT_ARCHIVE_DIR, fmt=AUDIT_ARCHIVE_FORMAT, now=None):
+    """
+    Compaction, retention, then rollup pruning.
+    Returns: {"compacted": [(day, rows)], "expired": [day],
+              "pruned": {granularity: rollup rows deleted}}
+    """
+    init_archive(conn)
+    keep_days = {"minute": ROLLUP_MINUTE_DAYS, "hour": ROLLUP_HOUR_DAYS, "day": retention_days}
+    return {
+        "compacted": compact(conn, hot_days, archive_dir, fmt, now),
+        "expired": apply_retention(conn, retention_days, now),
+        "pruned": prune_rollups(conn, keep_days, now),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact old audit days into archives and apply retention")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--hot-days", type=int, default=AUDIT_HOT_DAYS)
+    parser.add_argument("--retention-days", type=int, default=AUDIT_RETENTION_DAYS)
+    parser.add_argument("--archive-dir", default=AUDIT_ARCHIVE_DIR)
+    parser.add_argument("--format", default=AUDIT_ARCHIVE_FORMAT, choices=["auto"] + list(EXTENSIONS))
+    parser.add_argument("--vacuum", action="store_true", help="reclaim the freed space in the database file")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute("PRAGMA busy_timeout=30000")
+    report = maintain(conn, args.hot_days, args.retention_days, args.archive_dir, args.format)
+
+    for day, rows in report["compacted"]:
+        print(f"Archived {day}: {rows} rows")
+    for day in report["expired"]:
+        print(f"Expired {day}")
+    for granularity, rows in report["pruned"].items():
+        if rows:
+            print(f"Pruned {rows} {granularity} rollup rows")
+    if not report["compacted"] and not report["expired"] and not any(report["pruned"].values()):
+        print("Nothing to do")
+
+    if args.vacuum:
+        conn.execute("VACUUM")
+    conn.close()
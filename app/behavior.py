@@ -0,0 +1,330 @@
+import logging
+import math
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from app.config import BEHAVIOR_TTL, BEHAVIOR_SNAPSHOT_PATH, BEHAVIOR_SNAPSHOT_INTERVAL
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file locks, every process may write
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60.0
+HOUR = 3600.0
+
+# distinct IPs/devices remembered per user; bounds memory per principal
+MAX_DISTINCT = 32
+
+UNKNOWN_KEYS = (None, "", "Unknown", "Unknown Device")
+
+FEATURES = [
+    "logins_per_minute",
+    "distinct_ips_hour",
+    "distinct_devices_hour",
+    "ip_logins_per_minute",
+    "ip_distinct_users_hour",
+]
+
+
+class DecayCounter:
+    """
+    Exponentially decaying event count. With tau = 60 s the value
+    tracks "events in the last minute" in O(1) time and space.
+    """
+
+    __slots__ = ("value", "last")
+
+    def __init__(self):
+        self.value = 0.0
+        self.last = None
+
+    def add(self, now, tau):
+        if self.last is not None and now > self.last:
+            self.value *= math.exp(-(now - self.last) / tau)
+        self.value += 1.0
+        self.last = now if self.last is None else max(self.last, now)
+        return self.value
+
+
+class DistinctWindow:
+    """
+    Distinct keys seen within a sliding window, oldest first.
+    Expired keys are evicted from the front, so add() is amortized O(1).
+    """
+
+    __slots__ = ("seen",)
+
+    def __init__(self):
+        self.seen = OrderedDict()
+
+    def add(self, key, now, window):
+        self.seen[key] = now
+        self.seen.move_to_end(key)
+
+        while self.seen:
+            oldest_key, oldest = next(iter(self.seen.items()))
+            if oldest >= now - window and len(self.seen) <= MAX_DISTINCT:
+                break
+            del self.seen[oldest_key]
+
+        return len(self.seen)
+
+
+class PrincipalState:
+    __slots__ = ("logins", "peers", "devices")
+
+    def __init__(self):
+        self.logins = DecayCounter()
+        self.peers = DistinctWindow()    # IPs for a user, users for an IP
+        self.devices = DistinctWindow()
+
+
+class BehaviorStore:
+    """
+    In-process sliding-window state keyed by user and by IP.
+
+    observe() updates both principals and returns velocity features:
+    logins per minute and distinct IPs/devices per hour for the user,
+    logins per minute and distinct users per hour for the IP.
+    Principals idle for longer than the TTL are evicted.
+
+    Serving processes call start_snapshots(): a background thread then
+    writes the store to disk every snapshot interval (and once more on
+    stop_snapshots()), so a restart keeps recent history. Only one
+    process at a time holds the snapshot file; the others, and batch
+    jobs that never start the thread, only read it.
+    """
+
+    def __init__(self, ttl=BEHAVIOR_TTL, snapshot_path=BEHAVIOR_SNAPSHOT_PATH,
+                 snapshot_interval=BEHAVIOR_SNAPSHOT_INTERVAL):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        # principal -> state, least recently seen first (for TTL eviction)
+        self.users = OrderedDict()
+        self.ips = OrderedDict()
+
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        self._writer_lock = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def clear(self):
+        """
+        Forget every principal (and don't load the snapshot later),
+        e.g. between benchmark runs.
+        """
+        with self._lock:
+            self.users.clear()
+            self.ips.clear()
+            self._loaded = True
+
+    # ---------------------------------
+    # UPDATE
+    # ---------------------------------
+    def _state(self, table, key):
+        state = table.get(key)
+        if state is None:
+            state = table[key] = PrincipalState()
+        else:
+            table.move_to_end(key)
+        return state
+
+    def _evict(self, table, now):
+        while table:
+            key = next(iter(table))
+            last_seen = table[key].logins.last or 0.0
+            if now - last_seen <= self.ttl:
+                break
+            del table[key]
+
+    def observe(self, user, ip, device, now=None):
+        now = time.time() if now is None else now
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            features = dict.fromkeys(FEATURES, 0)
+
+            # placeholder identities would lump unrelated events together
+            if user not in UNKNOWN_KEYS:
+                user_state = self._state(self.users, user)
+                features["logins_per_minute"] = user_state.logins.add(now, MINUTE)
+                if ip not in UNKNOWN_KEYS:
+                    features["distinct_ips_hour"] = user_state.peers.add(ip, now, HOUR)
+                if device not in UNKNOWN_KEYS:
+                    features["distinct_devices_hour"] = user_state.devices.add(device, now, HOUR)
+
+            if ip not in UNKNOWN_KEYS:
+                ip_state = self._state(self.ips, ip)
+                features["ip_logins_per_minute"] = ip_state.logins.add(now, MINUTE)
+                if user not in UNKNOWN_KEYS:
+                    features["ip_distinct_users_hour"] = ip_state.peers.add(user, now, HOUR)
+
+            self._evict(self.users, now)
+            self._evict(self.ips, now)
+
+        return features
+
+    # ---------------------------------
+    # PERSISTENCE
+    # ---------------------------------
+    # rows exported per lock acquisition while snapshotting
+    export_chunk = 1000
+
+    def _load(self):
+        self._loaded = True
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                users, ips = pickle.load(f)
+            self.users, self.ips = _import_table(users), _import_table(ips)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError):
+            pass  # unreadable snapshot: start empty
+
+    def _export(self, table):
+        # copying the key list is one C-level pass; the per-principal
+        # work runs in short chunks so observe() never waits long
+        with self._lock:
+            items = list(table.items())
+        rows = []
+        for start in range(0, len(items), self.export_chunk):
+            with self._lock:
+                rows += [(key, _export_state(state)) for key, state in items[start:start + self.export_chunk]]
+        return rows
+
+    def snapshot(self):
+        """
+        Write the store to snapshot_path (pickled outside the lock).
+        """
+        if not self._loaded or not self.snapshot_path:
+            return
+        data = (self._export(self.users), self._export(self.ips))
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _claim_snapshot_file(self):
+        if fcntl is None:
+            return True
+        lock_file = open(f"{self.snapshot_path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._writer_lock = lock_file
+        return True
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except Exception:
+                logger.exception("Behavior snapshot failed")
+
+    def start_snapshots(self):
+        """
+        Snapshot periodically from a background thread. A no-op when
+        another process already writes the snapshot file.
+        """
+        if not self.snapshot_path or self._thread is not None:
+            return
+        if not self._claim_snapshot_file():
+            logger.info("Behavior snapshots are written by another process")
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._snapshot_loop, name="behavior-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop_snapshots(self):
+        """
+        Stop the background thread and write a final snapshot.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            self.snapshot()
+        finally:
+            if self._writer_lock is not None:
+                self._writer_lock.close()
+                self._writer_lock = None
+
+
+def _export_state(state):
+    return (
+        state.logins.value, state.logins.last,
+        list(state.peers.seen.items()), list(state.devices.seen.items()),
+    )
+
+
+def _import_table(rows):
+    table = OrderedDict()
+    for key, (value, last, peers, devices) in rows:
+        state = table[key] = PrincipalState()
+        state.logins.value, state.logins.last = value, last
+        state.peers.seen.update(peers)
+        state.devices.seen.update(devices)
+    return table
+
+
+class ReplayClock:
+    """
+    Behavior clock for replaying history (app/ingest.py): the time of
+    each event is its own timestamp, never earlier than the previous
+    event's and never later than now. Live scoring uses server time.
+    """
+
+    def __init__(self):
+        self.last = None
+
+    def __call__(self, value):
+        when = event_time(value)
+        if when is None:
+            # no usable timestamp: no time passes
+            when = self.last if self.last is not None else time.time()
+        when = min(when, time.time())
+        if self.last is not None:
+            when = max(when, self.last)
+        self.last = when
+        return when
+
+
+def event_time(value):
+    """
+    Epoch seconds from an ISO timestamp or epoch number (backfills
+    replay their own clock); None when missing or unparseable.
+    """
+    if not value or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        when = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    # audit timestamps are naive UTC
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+store = BehaviorStore()
@@ -0,0 +1,159 @@
+import threading
+import time
+from app.config import DB_PATH, BLOCKLIST_SYNC_INTERVAL
+from app.storage import get_connection
+
+KINDS = ("session", "user", "ip")
+
+
+class BlockList:
+    """
+    Blocked sessions, users and IPs.
+
+    Lookups hit an in-memory dict ((kind, value) -> expiry), so /event
+    can reject a blocked principal before any model work. The blocklist
+    table is the shared source of truth: every change bumps a version
+    row, and each process re-reads the table when it sees a new version,
+    checked at most once per sync interval. A block or unblock made by
+    one worker therefore reaches all workers within that interval.
+    The process making a change patches its own dict in place, and only
+    re-reads the table if another process changed it in the meantime.
+    """
+
+    def __init__(self, path=DB_PATH, sync_interval=BLOCKLIST_SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._entries = {}
+        self._version = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    # ---------------------------------
+    # TABLE
+    # ---------------------------------
+    def _conn(self):
+        conn = get_connection(self.path)
+        if self._version is None:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS blocklist (
+                        kind TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        expires_at REAL,
+                        created_at REAL NOT NULL,
+                        reason TEXT,
+                        PRIMARY KEY (kind, value)
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS blocklist_version (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        version INTEGER NOT NULL
+                    )
+                """)
+                conn.execute("INSERT OR IGNORE INTO blocklist_version VALUES (1, 0)")
+                conn.execute("CREATE INDEX IF NOT EXISTS blocklist_expiry ON blocklist (expires_at)")
+        return conn
+
+    def _load(self, conn, version):
+        rows = conn.execute(
+            "SELECT kind, value, expires_at FROM blocklist WHERE expires_at IS NULL OR expires_at > ?",
+            (time.time(),)
+        ).fetchall()
+        self._entries = {(kind, value): expires_at for kind, value, expires_at in rows}
+        self._version = version
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+
+        with self._lock:
+            if not force and now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+
+            conn = self._conn()
+            version = conn.execute("SELECT version FROM blocklist_version").fetchone()[0]
+            if version != self._version:
+                self._load(conn, version)
+
+    def _change(self, sql, params, key, expires_at=None, removed=False):
+        with self._lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(sql, params)
+                conn.execute("DELETE FROM blocklist WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+                conn.execute("UPDATE blocklist_version SET version = version + 1")
+                version = conn.execute("SELECT version FROM blocklist_version").fetchone()[0]
+
+            if self._version is None or version != self._version + 1:
+                # another process changed the table too: take its state
+                self._load(conn, version)
+                return
+
+            if removed:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = expires_at
+            self._version = version
+
+    # ---------------------------------
+    # CHANGES
+    # ---------------------------------
+    def block(self, kind, value, ttl=None, reason=""):
+        """
+        Block a principal; ttl in seconds, None blocks until released.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown block kind: {kind}")
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        self._change(
+            "INSERT OR REPLACE INTO blocklist (kind, value, expires_at, created_at, reason) VALUES (?, ?, ?, ?, ?)",
+            (kind, str(value), expires_at, now, reason),
+            (kind, str(value)), expires_at
+        )
+
+    def unblock(self, kind, value):
+        self._change(
+            "DELETE FROM blocklist WHERE kind = ? AND value = ?", (kind, str(value)),
+            (kind, str(value)), removed=True
+        )
+
+    # ---------------------------------
+    # LOOKUP
+    # ---------------------------------
+    def match(self, session_id=None, user=None, ip=None):
+        """
+        First active block covering any of the principals, as (kind, value),
+        or None.
+        """
+        self.sync()
+
+        entries = self._entries
+        if not entries:
+            return None
+
+        now = time.time()
+        for key in (("session", session_id), ("user", user), ("ip", ip)):
+            if key[1] is None:
+                continue
+            # entries may change under us (block/unblock patch it in place)
+            expires_at = entries.get(key, 0.0)
+            if expires_at is None or expires_at > now:
+                return key
+
+        return None
+
+    def active(self):
+        self.sync()
+        now = time.time()
+        return [
+            {"kind": kind, "value": value, "expires_at": expires_at}
+            for (kind, value), expires_at in list(self._entries.items())
+            if expires_at is None or expires_at > now
+        ]
+
+
+blocklist = BlockList()
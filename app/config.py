@@ -1,3 +1,111 @@
 MODEL_PATH = "models/isolation_forest.joblib"
 RULES_PATH = "models/baseline_rules.json"
 DB_PATH = "data/trustlens.db"
+
+# Audit writes: max rows per transaction
+AUDIT_FLUSH_SIZE = 500
+
+# Async write-behind audit queue (api_server)
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_QUEUE_POLICY = "block"  # "block" waits for space, "drop" discards the row
+AUDIT_WRITE_RETRIES = 3        # retries of a failed batch before its rows count as failed
+AUDIT_RETRY_DELAY = 0.1        # seconds before the first retry, doubled each time
+SCORING_THREADS = 4
+
+# Registered users (admin-managed)
+USERS_DB_PATH = "trustlensai.db"
+USERS_POLL_INTERVAL = 2.0  # seconds between PRAGMA data_version checks
+
+# Scoring backend: "sklearn" (IsolationForest.decision_function)
+# or "compiled" (flat array evaluator in app/forest.py, same scores).
+# Use "compiled" when running several uvicorn or scoring workers: only
+# its arrays are shared between processes (see MODEL_MMAP_MODE).
+ENGINE_MODE = "sklearn"
+
+# Precomputed anomaly scores over the discrete feature grid,
+# cached next to the model and rebuilt when the model file changes
+SCORE_TABLE_ENABLED = False
+SCORE_TABLE_PATH = "models/isolation_forest.scores.npz"
+SCORE_TABLE_MAX_ACCESS = 64
+SCORE_TABLE_MAX_ROLE = 4
+
+# Model loading: memory-map the compiled arrays so workers share their
+# pages. Has no effect on sharing in "sklearn" mode: unpickling its
+# trees copies the node arrays into private memory in every process.
+MODEL_MMAP_MODE = "r"  # None loads private copies
+COMPILED_MODEL_PATH = "models/isolation_forest.compiled.joblib"
+
+# Hot reload: seconds between mtime checks of the model and rules files
+MODEL_POLL_INTERVAL = 5.0
+
+# Multi-process scoring service (api_server); 0 keeps scoring on threads
+SCORING_WORKERS = 0
+SCORING_MAX_BATCH = 64      # events per decision_function call
+SCORING_MAX_WAIT_MS = 2.0   # how long a batch waits to fill up
+
+# Streaming per-user / per-IP behaviour state (velocity features)
+BEHAVIOR_TTL = 3600.0               # seconds of inactivity before a user/IP is forgotten
+BEHAVIOR_SNAPSHOT_PATH = "data/behavior_state.pkl"
+BEHAVIOR_SNAPSHOT_INTERVAL = 60.0   # seconds between snapshots to disk
+
+# Server-side block list
+BLOCK_TTL = 3600.0              # seconds an automatically blocked session stays blocked
+BLOCKLIST_SYNC_INTERVAL = 1.0   # max delay before other workers see a block/unblock
+
+# Deterministic scoring: same input, same score (no jitter, no random
+# soft-threat flags). Demos may turn it off; SCORING_SEED makes the
+# random mode reproducible.
+DETERMINISTIC = True
+SCORING_SEED = None
+
+# Result cache for repeated identical events (deterministic mode only).
+# Size 0 disables it.
+RESULT_CACHE_SIZE = 10000
+RESULT_CACHE_TTL = 60.0
+
+# Per-stage latency histograms and counters served at /metrics
+METRICS_ENABLED = True
+
+# Live result feed (SSE / WebSocket)
+FEED_REPLAY_SIZE = 1000     # recent results kept for reconnecting clients
+FEED_CLIENT_QUEUE = 256     # per-client buffer before it falls back to replay
+FEED_KEEPALIVE = 15.0       # seconds between keep-alive messages
+
+# Audit partitions: the table keeps the last AUDIT_HOT_DAYS days; older
+# days are compacted into per-day archive files ("auto" = Parquet when
+# pyarrow is installed, else gzip JSONL) and deleted after
+# AUDIT_RETENTION_DAYS (0 keeps them forever).
+AUDIT_HOT_DAYS = 7
+AUDIT_RETENTION_DAYS = 365
+AUDIT_ARCHIVE_DIR = "data/archive"
+AUDIT_ARCHIVE_FORMAT = "auto"
+AUDIT_MAINTENANCE_INTERVAL = 6 * 3600   # seconds between runs in api_server; 0 disables
+
+# Risk-trend rollups: maintenance drops minute / hour buckets older than
+# this many days (trends read minute buckets for windows up to 3 hours,
+# hour buckets up to 7 days). Day buckets follow AUDIT_RETENTION_DAYS.
+ROLLUP_MINUTE_DAYS = 2
+ROLLUP_HOUR_DAYS = 30
+
+# Retraining from the audit history (python -m app.retrain, or every
+# RETRAIN_INTERVAL seconds in api_server; 0 disables). A uniform sample
+# of recent unblocked rows trains a candidate, which replaces MODEL_PATH
+# only if it flags a similar share of traffic as the current model.
+RETRAIN_WINDOW_DAYS = 30
+RETRAIN_SAMPLE_SIZE = 20000     # reservoir size: bounds memory whatever the row count
+RETRAIN_MIN_ROWS = 1000         # don't train on less
+RETRAIN_HOLDOUT = 0.2           # share of the sample kept back for the comparison
+RETRAIN_N_ESTIMATORS = 200
+RETRAIN_CONTAMINATION = 0.15
+RETRAIN_N_JOBS = -1             # trees fitted in parallel (-1 = all cores)
+RETRAIN_MAX_FLAG_SHIFT = 0.10   # max change in the share of holdout rows flagged
+RETRAIN_INTERVAL = 0
+
+# Multi-tenant deployments: events may carry a "tenant" id. A tenant's
+# model, rules and audit database live in TENANTS_DIR/<tenant>/ (missing
+# model/rules files fall back to the shared ones above). Artifacts load
+# on first use; at most TENANT_CACHE_SIZE tenants stay in memory and each
+# thread keeps at most TENANT_CONNECTIONS tenant databases open.
+TENANTS_DIR = "tenants"
+TENANT_CACHE_SIZE = 256
+TENANT_CONNECTIONS = 32
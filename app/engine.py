@@ -1,18 +1,144 @@
-import json
-import joblib
-from app.config import MODEL_PATH, RULES_PATH
+import numpy as np
 import random
+from app.config import DETERMINISTIC, SCORING_SEED
+from app.tenants import tenant_registries
 
-# Load model and rules
-model = joblib.load(MODEL_PATH)
-rules = json.load(open(RULES_PATH))
+# =========================
+# MODEL / RULES REGISTRY
+# =========================
+# Nothing is loaded at import time. The registry loads the model and
+# rules on first use (or warm_up()) and hot-swaps them when the files
+# in models/ change. Pass one bundle through a request so every stage
+# sees the same version. Tenants with their own model/rules get their
+# own registry (app/tenants.py); tenant None is the shared one.
 
 
-def detect(event):
+def get_bundle(tenant=None):
+    return tenant_registries.get(tenant).current()
+
+
+def get_rules():
+    return get_bundle().rules
+
+
+def get_scorer():
+    return get_bundle().scorer
+
+
+def warm_up():
+    """
+    Load rules, scorer and score table now instead of on the first event.
+    """
+    return get_bundle()
+
+
+# =========================
+# SCORING MODE
+# =========================
+# Deterministic (default): no score jitter and no random soft-threat
+# flags. The random mode is kept for demos and draws from its own
+# seedable generator.
+mode = {"deterministic": DETERMINISTIC}
+_rng = random.Random(SCORING_SEED)
+
+
+def configure(deterministic=None, seed=None):
+    """
+    Switch scoring mode; seed (re)seeds the demo generator.
+    """
+    if deterministic is not None:
+        mode["deterministic"] = deterministic
+    if seed is not None:
+        _rng.seed(seed)
+
+
+def is_deterministic():
+    return mode["deterministic"]
+
+
+FEATURES = [
+    "login_hour",
+    "device_known",
+    "location_known",
+    "access_count",
+    "role_level"
+]
+
+FEATURE_DEFAULTS = {
+    "login_hour": 12,
+    "device_known": 1,
+    "location_known": 1,
+    "access_count": 1,
+    "role_level": 1
+}
+
+
+def score_features(X, bundle=None):
+    """
+    Anomaly scores for a feature matrix.
+    Grid rows come from the score table, the rest from the live model.
+    """
+    if bundle is None:
+        bundle = get_bundle()
+
+    scorer = bundle.scorer
+    score_table = bundle.score_table
+
+    if score_table is None:
+        return scorer.decision_function(X)
+
+    scores, hit = score_table.lookup(X)
+    if not hit.all():
+        scores[~hit] = scorer.decision_function(np.asarray(X)[~hit])
+    return scores
+
+
+# (event field, rules key, default limit, flag) for server-side velocity features
+VELOCITY_RULES = [
+    ("logins_per_minute", "max_logins_per_minute", 10, "Rapid repeated logins detected"),
+    ("distinct_ips_hour", "max_ips_per_hour", 3, "Logins from many IP addresses"),
+    ("distinct_devices_hour", "max_devices_per_hour", 3, "Logins from many devices"),
+    ("ip_distinct_users_hour", "max_users_per_ip", 5, "Many accounts from one IP address"),
+]
+
+SOFT_THREATS = [
+    "Suspicious rapid login attempts",
+    "Unusual access pattern detected",
+    "Abnormal role behavior observed"
+]
+
+
+def result_key(event, bundle):
+    """
+    Canonical cache key for the detection result of a sanitized event:
+    everything detect() and the risk step read, plus the bundle version.
+    Velocity features enter as their rule outcomes, since their raw
+    values change on every event.
+    Returns None in random mode, where results must not be reused.
+    """
+    if not mode["deterministic"]:
+        return None
+
+    rules = bundle.rules
+    return (
+        bundle.version,
+        tuple(event.get(f, FEATURE_DEFAULTS[f]) for f in FEATURES),
+        event.get("device_name"),
+        event.get("location_name"),
+        event.get("role_name"),
+        event.get("role"),
+        tuple(event.get(field, 0) > rules.get(key, default) for field, key, default, _ in VELOCITY_RULES),
+    )
+
+
+def detect(event, bundle=None):
     """
     AI + rules anomaly detection.
     Returns: (score, rule_flags)
     """
+    if bundle is None:
+        bundle = get_bundle()
+
     # Extract features safely
     login_hour = event.get("login_hour", 12)
     device_known = event.get("device_known", 1)
@@ -28,12 +154,18 @@ def detect(event):
         role_level
     ]
 
+    deterministic = mode["deterministic"]
+
     # AI anomaly score
-    score = model.decision_function([features])[0] + random.uniform(-0.1, 0.1)
+    score = score_features([features], bundle)[0]
+    if not deterministic:
+        score += _rng.uniform(-0.1, 0.1)
 
     # Rule flags
     rule_flags = []
 
+    rules = bundle.rules
+
     # Working hours
     allowed_hours = rules.get("allowed_hours", [6, 20])
     if not allowed_hours[0] <= login_hour <= allowed_hours[1]:
@@ -56,12 +188,99 @@ def detect(event):
     if role_level >= 3 and (device_known == 0 or location_known == 0):
         rule_flags.append(f"Privileged role misuse ({event.get('role_name')})")
 
-    # Add occasional soft threat for realism
-    if random.random() < 0.05:
-        rule_flags.append(random.choice([
-            "Suspicious rapid login attempts",
-            "Unusual access pattern detected",
-            "Abnormal role behavior observed"
-        ]))
+    # Velocity (from the behaviour store)
+    for field, key, default, flag in VELOCITY_RULES:
+        if event.get(field, 0) > rules.get(key, default):
+            rule_flags.append(flag)
+
+    # Add occasional soft threat for realism (demo mode only)
+    if not deterministic and _rng.random() < 0.05:
+        rule_flags.append(_rng.choice(SOFT_THREATS))
+
+    return score, rule_flags
+
+
+def detect_many(events, bundle=None):
+    """
+    Vectorized version of detect() for a batch of events.
+
+    Builds one feature matrix, scores it with a single
+    decision_function call and evaluates the baseline rules
+    as array masks.
+    Returns: list of (score, rule_flags), one per event, in order.
+    """
+    if not events:
+        return []
+
+    if bundle is None:
+        bundle = get_bundle()
+
+    # Feature matrix (n_events x 5)
+    X = np.array(
+        [[e.get(f, FEATURE_DEFAULTS[f]) for f in FEATURES] for e in events]
+    )
+
+    login_hour = X[:, 0]
+    device_known = X[:, 1]
+    location_known = X[:, 2]
+    access_count = X[:, 3]
+    role_level = X[:, 4]
+
+    # AI anomaly scores in one call
+    scores = score_features(X, bundle)
+
+    # Rule masks
+    rules = bundle.rules
+    allowed_hours = rules.get("allowed_hours", [6, 20])
+    max_access = rules.get("max_access", 50)
+
+    off_hours = ~((allowed_hours[0] <= login_hour) & (login_hour <= allowed_hours[1]))
+    unknown_device = device_known == 0
+    unknown_location = location_known == 0
+    excessive = access_count > max_access
+    privileged = (role_level >= 3) & (unknown_device | unknown_location)
+
+    velocity = [
+        (np.array([e.get(field, 0) for e in events]) > rules.get(key, default), flag)
+        for field, key, default, flag in VELOCITY_RULES
+    ]
+
+    deterministic = mode["deterministic"]
+
+    results = []
+
+    for i, event in enumerate(events):
+
+        score = scores[i]
+
+        # same random draws, in the same order, as detect()
+        if not deterministic:
+            score += _rng.uniform(-0.1, 0.1)
+
+        rule_flags = []
+
+        if off_hours[i]:
+            rule_flags.append("Login outside working hours")
+
+        if unknown_device[i]:
+            rule_flags.append(f"Unknown device used ({event.get('device_name')})")
+
+        if unknown_location[i]:
+            rule_flags.append(f"Unrecognized location ({event.get('location_name')})")
+
+        if excessive[i]:
+            rule_flags.append("Excessive access attempts detected")
+
+        if privileged[i]:
+            rule_flags.append(f"Privileged role misuse ({event.get('role_name')})")
+
+        for mask, flag in velocity:
+            if mask[i]:
+                rule_flags.append(flag)
+
+        if not deterministic and _rng.random() < 0.05:
+            rule_flags.append(_rng.choice(SOFT_THREATS))
+
+        results.append((score, rule_flags))
 
-    return score, rule_flags
\ No newline at end of file
+    return results
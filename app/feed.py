@@ -0,0 +1,262 @@
+import asyncio
+import json
+from collections import deque
+from app.config import FEED_REPLAY_SIZE, FEED_CLIENT_QUEUE, FEED_KEEPALIVE
+
+
+def feed_message(result, audit):
+    """
+    What live clients see for one scored event.
+    """
+    event = audit[0]
+    return {
+        "tenant": event.get("tenant"),
+        "timestamp": event.get("timestamp"),
+        "user": event.get("user"),
+        "ip": event.get("ip"),
+        "session_id": event.get("session_id"),
+        "device": event.get("device"),
+        "location": event.get("location"),
+        "role": event.get("role"),
+        "model_version": event.get("model_version"),
+        "risk": result["risk"],
+        "reasons": result["reasons"],
+        "verified": result["verified"],
+        "blocked": result["blocked"],
+        "credentials_rotated": result["credentials_rotated"],
+    }
+
+
+class Subscriber:
+    """
+    One connected client: a bounded queue the publisher never waits on.
+    tenant: the only tenant whose results it receives (None = shared
+    deployment).
+    """
+
+    def __init__(self, maxsize, tenant=None):
+        self.queue = asyncio.Queue(maxsize)
+        self.tenant = tenant
+        self.lagged = False
+        self.dropped = 0
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # slow client: it catches up from the replay buffer later
+            self.lagged = True
+            self.dropped += 1
+
+
+class LiveFeed:
+    """
+    In-process fan-out of scored results to live clients (SSE / WebSocket).
+
+    Every result gets a sequence number and goes into a replay ring
+    buffer and each subscriber's bounded queue. Publishing never
+    blocks: when a client's queue is full its copy is dropped, and once
+    the client drains its queue the missed results are replayed from
+    the ring buffer. A reconnecting client passes the last sequence
+    number it saw and gets everything after it the same way. When the
+    ring buffer no longer reaches back that far the client receives a
+    "gap" message and should reload from the audit table.
+
+    Each client sees one tenant's results only (the shared deployment's
+    when it names none).
+
+    Sequence numbers are per process and restart with the server.
+    """
+
+    def __init__(self, replay_size=FEED_REPLAY_SIZE, client_queue=FEED_CLIENT_QUEUE, keepalive=FEED_KEEPALIVE):
+        self.client_queue = client_queue
+        self.keepalive = keepalive
+
+        self.seq = 0
+        self.published = 0
+        self.dropped = 0
+
+        self._buffer = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self._loop = None
+
+    def start(self):
+        """
+        Bind to the running event loop (call from the app lifespan).
+        """
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        self._loop = None
+
+    # ---------------------------------
+    # PUBLISHING
+    # ---------------------------------
+    def publish(self, message):
+        """
+        Broadcast one message. Safe to call from the event loop or
+        from worker threads; a no-op while the feed is not started.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            self._publish(message)
+        else:
+            loop.call_soon_threadsafe(self._publish, message)
+
+    def _publish(self, message):
+        self.seq += 1
+        self.published += 1
+        item = (self.seq, message)
+        self._buffer.append(item)
+        tenant = message.get("tenant")
+        for subscriber in self._subscribers:
+            if subscriber.tenant == tenant:
+                subscriber.offer(item)
+
+    # ---------------------------------
+    # SUBSCRIBING
+    # ---------------------------------
+    def replay(self, cursor, tenant=None):
+        """
+        Buffered items of one tenant after cursor.
+        Returns: (items, gap) where gap is True if some were lost.
+        """
+        items = [item for item in self._buffer if item[0] > cursor]
+        # lost items of any tenant may have been this tenant's
+        oldest = items[0][0] if items else self.seq + 1
+        return [item for item in items if item[1].get("tenant") == tenant], oldest > cursor + 1
+
+    async def stream(self, since=None, tenant=None):
+        """
+        Async iterator of (kind, seq, message) for one client:
+        kind is "result", "gap" or "ping" (keep-alive, no payload).
+        since: last sequence number the client saw (None = live only).
+        tenant: whose results to send (None = shared deployment).
+        """
+        subscriber = Subscriber(self.client_queue, tenant)
+        self._subscribers.add(subscriber)
+        getter = None
+
+        try:
+            if since is not None and since > self.seq:
+                # sequence numbers restarted with the server
+                yield ("gap", None, {"after": since, "resume": 1})
+                since = 0
+
+            # live only: anything queued from here on is new
+            cursor = self.seq if since is None else since
+
+            if since is not None:
+                for message in self._catch_up(cursor, tenant):
+                    yield message
+                    cursor = max(cursor, message[1] or cursor)
+
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(subscriber.queue.get())
+
+                # keep the same pending get across keep-alives: nothing is lost
+                done, _ = await asyncio.wait({getter}, timeout=self.keepalive)
+                if not done:
+                    yield ("ping", None, None)
+                    continue
+
+                seq, message = getter.result()
+                getter = None
+
+                if seq > cursor:
+                    yield ("result", seq, message)
+                    cursor = seq
+
+                if subscriber.lagged and subscriber.queue.empty():
+                    subscriber.lagged = False
+                    for message in self._catch_up(cursor, tenant):
+                        yield message
+                        cursor = max(cursor, message[1] or cursor)
+        finally:
+            if getter is not None:
+                getter.cancel()
+            self._subscribers.discard(subscriber)
+            self.dropped += subscriber.dropped
+
+    def _catch_up(self, cursor, tenant):
+        items, gap = self.replay(cursor, tenant)
+        messages = []
+        if gap:
+            resume = self._buffer[0][0] if self._buffer else self.seq + 1
+            messages.append(("gap", None, {"after": cursor, "resume": resume}))
+        messages += [("result", seq, message) for seq, message in items]
+        return messages
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "seq": self.seq,
+            "published": self.published,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped + sum(s.dropped for s in self._subscribers),
+        }
+
+
+def sse_format(kind, seq, message):
+    """
+    One Server-Sent Events frame; the sequence number is the event id,
+    so browsers resume with Last-Event-ID automatically.
+    """
+    if kind == "ping":
+        return ": ping\n\n"
+    lines = []
+    if seq is not None:
+        lines.append(f"id: {seq}")
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {json.dumps(message)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(feed, since=None, tenant=None):
+    async for kind, seq, message in feed.stream(since, tenant):
+        yield sse_format(kind, seq, message)
+
+
+def parse_cursor(since=None, last_event_id=None):
+    """
+    Replay cursor from ?since= or the SSE Last-Event-ID header.
+    """
+    if since is not None:
+        return since
+    try:
+        return int(last_event_id) if last_event_id else None
+    except ValueError:
+        return None
+
+
+# Process-wide feed used by the API apps
+live_feed = LiveFeed()
+
+
+def publish_result(result, audit):
+    live_feed.publish(feed_message(result, audit))
+
+
+def publish_audit(audit):
+    """
+    publish_result() for a saved audit tuple alone, e.g. from the
+    write-behind queue once the row is committed.
+    """
+    event, risk, reasons, blocked, rotated, verified = audit
+    result = {
+        "risk": int(risk),
+        "verified": verified,
+        "blocked": blocked,
+        "credentials_rotated": rotated,
+        "reasons": list(reasons),
+    }
+    publish_result(result, audit)
@@ -0,0 +1,189 @@
+import os
+import joblib
+import numpy as np
+
+
+def average_path_length(n_samples):
+    """
+    Average path length of an unsuccessful BST search over n samples,
+    c(n) in the Isolation Forest paper (same as sklearn's helper).
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n)
+
+    result[n == 2] = 1.0
+    big = n > 2
+    result[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+
+    return result
+
+
+class CompiledForest:
+    """
+    Flat, array-backed copy of a fitted sklearn IsolationForest.
+
+    All trees are packed into contiguous arrays (feature, threshold,
+    left/right children and per-node path length). Scoring walks every
+    tree for every row at once, one depth level per NumPy step, which
+    avoids sklearn's input validation and per-tree Python dispatch.
+    decision_function() matches IsolationForest.decision_function to
+    floating-point tolerance.
+    """
+
+    ARRAYS = ["feature", "threshold", "children", "path_length", "roots"]
+
+    def __init__(self, arrays, max_depth, n_features_in, denominator, offset):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features_in
+        self.denominator = denominator
+        self.offset_ = offset
+
+    @classmethod
+    def from_model(cls, model):
+        features, thresholds, lefts, rights, path_lengths, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        n_features = model.n_features_in_
+
+        for estimator, tree_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            is_leaf = left == -1
+
+            # map the tree's feature ids back to input columns
+            feature = tree.feature.astype(np.int64)
+            if len(tree_features) != n_features:
+                feature = np.where(is_leaf, 0, np.asarray(tree_features)[np.maximum(feature, 0)])
+            feature = np.where(is_leaf, 0, feature)
+
+            # leaves loop on themselves so a fixed number of steps is safe
+            own = np.arange(n_nodes)
+            left = np.where(is_leaf, own, left) + offset
+            right = np.where(is_leaf, own, right) + offset
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[tree.children_left[node]] = depth[node] + 1
+                    depth[tree.children_right[node]] = depth[node] + 1
+
+            # path length contributed when a row ends in this leaf
+            path_length = depth + average_path_length(tree.n_node_samples)
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            path_lengths.append(path_length)
+            roots.append(offset)
+
+            max_depth = max(max_depth, int(depth.max()))
+            offset += n_nodes
+
+        # interleaved children: children[2 * node + went_right]
+        children = np.empty(2 * offset, dtype=np.intp)
+        children[0::2] = np.concatenate(lefts)
+        children[1::2] = np.concatenate(rights)
+
+        arrays = {
+            "feature": np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            "threshold": np.ascontiguousarray(np.concatenate(thresholds)),
+            "children": children,
+            "path_length": np.ascontiguousarray(np.concatenate(path_lengths)),
+            "roots": np.asarray(roots, dtype=np.intp),
+        }
+
+        return cls(
+            arrays,
+            max_depth,
+            n_features,
+            len(model.estimators_) * average_path_length([model.max_samples_])[0],
+            model.offset_
+        )
+
+    # ---------------------------------
+    # PERSISTENCE
+    # ---------------------------------
+    def save(self, path, model_hash):
+        """
+        Uncompressed joblib dump, so load(mmap_mode="r") can map the
+        arrays and several worker processes share one copy in the page cache.
+        """
+        state = {name: getattr(self, name) for name in self.ARRAYS}
+        state.update({
+            "max_depth": self.max_depth,
+            "n_features_in": self.n_features_in_,
+            "denominator": float(self.denominator),
+            "offset": float(self.offset_),
+            "model_hash": model_hash,
+        })
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, model_hash, mmap_mode=None):
+        """
+        Returns None when the file is missing or was built from another model.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            state = joblib.load(path, mmap_mode=mmap_mode)
+        except (OSError, EOFError, ValueError):
+            return None
+        if state.get("model_hash") != model_hash:
+            return None
+        return cls(
+            state,
+            state["max_depth"],
+            state["n_features_in"],
+            state["denominator"],
+            state["offset"]
+        )
+
+    # rows per traversal step; keeps the (rows x trees) node table in cache
+    chunk_size = 256
+
+    def _depths(self, X):
+        n_rows, n_features = X.shape
+        row_base = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        flat = X.ravel()
+
+        node = np.tile(self.roots, (n_rows, 1))
+
+        for _ in range(self.max_depth):
+            went_right = flat[row_base + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + went_right]
+
+        return self.path_length[node].sum(axis=1)
+
+    def decision_function(self, X):
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if X.shape[0] <= self.chunk_size:
+            depths = self._depths(X)
+        else:
+            depths = np.concatenate([
+                self._depths(X[start:start + self.chunk_size])
+                for start in range(0, X.shape[0], self.chunk_size)
+            ])
+
+        if self.denominator == 0:
+            # single training sample: sklearn uses an exponent of -1
+            scores = np.full_like(depths, 0.5)
+        else:
+            scores = 2.0 ** (-depths / self.denominator)
+
+        return -scores - self.offset_
@@ -0,0 +1,190 @@
+"""
+Bulk backfill of historical SME login logs.
+
+Streams a JSON-lines file (or stdin), scores events in chunks through
+the normal sanitize/detect/calculate/explain chain and writes each
+chunk to the audit table in one transaction. Memory use is bounded by
+the chunk size. Lines that are not JSON objects and events that fail
+to score (or whose timestamp cannot be read) are counted and skipped.
+Event timestamps (ISO, with or without an offset, or epoch seconds)
+are stored as naive UTC, like live audit rows.
+
+    python -m app.ingest logs.jsonl --checkpoint logs-2024
+    cat logs.jsonl | python -m app.ingest -
+
+With --checkpoint NAME, the byte offset after each chunk is stored
+under NAME in the audit database, in the same transaction as the
+chunk's rows, and a rerun resumes from there. A chunk spread over
+several tenant databases commits once per database; each database
+keeps its own offset, so a rerun after a crash between those commits
+skips the rows a database already has.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from app.behavior import ReplayClock, event_time
+from app.main import score_events
+from app.storage import audit_row, write_rows, save_events, read_checkpoint
+
+
+# =========================
+# CHECKPOINT
+# =========================
+def save_chunk(audits, checkpoint, offset):
+    """
+    Write a chunk's audit tuples with the checkpoint offset.
+    Tenant databases go first and the shared database last, so the
+    shared database's offset (where a rerun starts) only moves once
+    the whole chunk is stored.
+    """
+    if not checkpoint:
+        save_events(audits)
+        return
+
+    by_tenant = {}
+    for audit in audits:
+        by_tenant.setdefault(audit[0].get("tenant"), []).append(audit_row(*audit))
+
+    for tenant, rows in by_tenant.items():
+        if tenant is not None and read_checkpoint(checkpoint, tenant) < offset:
+            write_rows(rows, tenant, (checkpoint, offset))
+    write_rows(by_tenant.get(None, []), None, (checkpoint, offset))
+
+
+def row_timestamp(value):
+    """
+    A log timestamp as audit rows store it (naive UTC isoformat),
+    or None when it cannot be read.
+    """
+    when = event_time(value)
+    if when is None:
+        return None
+    try:
+        return datetime.fromtimestamp(when, timezone.utc).replace(tzinfo=None).isoformat()
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+# =========================
+# STREAMING READER
+# =========================
+def iter_chunks(stream, chunk_size, offset=0):
+    """
+    Yields (events, end_offset, bad_lines) for each chunk of parsed lines.
+    end_offset is the byte position just after the chunk's last line.
+    """
+    events = []
+    bad_lines = 0
+
+    for line in stream:
+        offset += len(line)
+
+        if not line.strip():
+            continue
+
+        try:
+            event = json.loads(line)
+        except ValueError:
+            bad_lines += 1
+            continue
+
+        if not isinstance(event, dict):
+            bad_lines += 1
+            continue
+
+        events.append(event)
+
+        if len(events) >= chunk_size:
+            yield events, offset, bad_lines
+            events = []
+            bad_lines = 0
+
+    if events or bad_lines:
+        yield events, offset, bad_lines
+
+
+# =========================
+# INGEST
+# =========================
+def ingest(stream, chunk_size=5000, offset=0, checkpoint=None, keep_timestamps=True, report_every=5.0):
+    """
+    Score and store every event in stream.
+    Returns: (events ingested, bad lines and events, final byte offset)
+    """
+    total = 0
+    total_bad = 0
+    # velocity windows follow the log's own (monotonic) timeline
+    clock = ReplayClock()
+    start = time.perf_counter()
+    last_report = start
+
+    for events, offset, bad_lines in iter_chunks(stream, chunk_size, offset):
+        # a malformed value fails its own event, not the chunk
+        evaluated = score_events(events, clock, skip_errors=True)
+
+        if keep_timestamps:
+            # audit rows keep the original event time when the log has one
+            for i, (event, item) in enumerate(zip(events, evaluated)):
+                if item is None or not event.get("timestamp"):
+                    continue
+                timestamp = row_timestamp(event["timestamp"])
+                if timestamp is None:
+                    evaluated[i] = None
+                else:
+                    item[1][0]["timestamp"] = timestamp
+
+        audits = [item[1] for item in evaluated if item is not None]
+        bad_lines += len(evaluated) - len(audits)
+
+        # one transaction per chunk, with the checkpoint in it
+        save_chunk(audits, checkpoint, offset)
+
+        total += len(audits)
+        total_bad += bad_lines
+
+        now = time.perf_counter()
+        if now - last_report >= report_every:
+            last_report = now
+            rate = total / (now - start)
+            print(f"{total} events  {rate:,.0f} events/s  offset {offset}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Ingested {total} events in {elapsed:.1f}s ({rate:,.0f} events/s), "
+        f"{total_bad} bad lines or events, offset {offset}",
+        file=sys.stderr
+    )
+
+    return total, total_bad, offset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score and load historical JSONL login events into the audit table")
+    parser.add_argument("source", help="JSON-lines file, or - for stdin")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="events per scoring batch and transaction")
+    parser.add_argument("--checkpoint", help="name under which the byte offset of the last committed chunk is stored")
+    parser.add_argument("--offset", type=int, help="start at this byte offset (overrides the checkpoint)")
+    parser.add_argument("--no-keep-timestamps", action="store_true", help="stamp rows with ingestion time instead of the event's timestamp")
+    args = parser.parse_args(argv)
+
+    offset = args.offset
+    if offset is None:
+        offset = read_checkpoint(args.checkpoint) if args.checkpoint else 0
+
+    if args.source == "-":
+        if offset:
+            parser.error("stdin cannot be resumed from an offset")
+        stream = sys.stdin.buffer
+        ingest(stream, args.chunk_size, 0, args.checkpoint, not args.no_keep_timestamps)
+        return
+
+    with open(args.source, "rb") as stream:
+        stream.seek(offset)
+        ingest(stream, args.chunk_size, offset, args.checkpoint, not args.no_keep_timestamps)
+
+
+if __name__ == "__main__":
+    main()
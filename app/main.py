@@ -1,24 +1,33 @@
 from datetime import datetime
-import sqlite3
+from time import perf_counter
 from app.privacy import sanitize
-from app.engine import detect
+from app.engine import detect, detect_many, get_bundle, result_key, warm_up as warm_up_engine
 from app.risk import calculate
 from app.explain import explain
-from app.storage import save_event
+from app.storage import save_event, save_events, init_db
+from app.users import registry as user_registry
+from app.behavior import store as behavior_store
+from app.tenants import tenant_id, scoped
+from app.blocklist import blocklist
+from app.cache import result_cache
+from app.metrics import lap, count_result
+from app.config import BLOCK_TTL
 
 # =========================
-# DATABASE
+# USERS
 # =========================
-DB = "trustlensai.db"
-
 def is_valid_user(username: str) -> bool:
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS users(username TEXT PRIMARY KEY)")  # ensure table exists
-    cur.execute("SELECT 1 FROM users WHERE username=?", (username,))
-    result = cur.fetchone()
-    conn.close()
-    return result is not None
+    # in-memory index, no database I/O per event
+    return user_registry.contains(username)
+
+def warm_up():
+    """
+    Server startup hook: load model, rules, users and the audit
+    schema before the first request instead of during it.
+    """
+    warm_up_engine()
+    init_db()
+    user_registry.reload()
 
 # =========================
 # ACTIONS
@@ -39,10 +48,19 @@ def execute_actions(risk: float):
 # =========================
 # MAIN PROCESSOR
 # =========================
-def process_event(event: dict):
+def prepare_event(event: dict, clock=None):
+    """
+    Sanitize an event and add the role and velocity features.
+    clock: maps the event's timestamp to the behavior clock when
+    replaying history (behavior.ReplayClock); live events use server time.
+    """
+    t = perf_counter()
+
     # sanitize input
     clean_event = sanitize(event)
     clean_event["timestamp"] = datetime.utcnow().isoformat()
+    clean_event["tenant"] = tenant_id(event)
+    t = lap("sanitize", t)
 
     # Get real fields from incoming event
     username = event.get("user", "Unknown")
@@ -56,6 +74,7 @@ def process_event(event: dict):
         role = "unknown"
     else:
         role = "user"
+    t = lap("is_valid_user", t)
 
     # store the real values
     clean_event["user"] = username
@@ -64,25 +83,369 @@ def process_event(event: dict):
     clean_event["location"] = location
     clean_event["role"] = role
 
-    # Detect AI risk
-    score, rule_flags = detect(clean_event)
+    # server-side velocity features; a client timestamp never moves the live clock
+    tenant = clean_event["tenant"]
+    clean_event.update(behavior_store.observe(
+        scoped(tenant, clean_event["username"]),
+        scoped(tenant, clean_event["ip_address"]),
+        clean_event["device_name"],
+        now=clock(event.get("timestamp")) if clock is not None else None
+    ))
+    lap("behavior", t)
+
+    return clean_event
+
 
+def evaluate_event(clean_event: dict, score, rule_flags):
+    """
+    Turn detection output into the API result.
+    Returns: (result, audit) where audit is the save_event() argument tuple.
+    """
     # increase risk if unknown user
-    if role == "unknown":
+    if clean_event["role"] == "unknown":
         score += 70
         rule_flags.append("Unknown user / not registered by admin")
 
     risk = calculate(score, len(rule_flags))
     reasons = explain(score, rule_flags)
-    verified, blocked, rotated = execute_actions(risk)
 
-    # Save to database
-    save_event(clean_event, risk, reasons, blocked, rotated, verified)
+    return build_result(clean_event, risk, reasons)
 
-    return {
+
+def build_result(clean_event: dict, risk, reasons):
+    """
+    Actions, API result and audit tuple for a final risk and reasons.
+    """
+    reasons = list(reasons)
+    verified, blocked, rotated = execute_actions(risk)
+
+    result = {
         "risk": int(risk),
         "verified": verified,
         "blocked": blocked,
         "credentials_rotated": rotated,
         "reasons": reasons
-    }
\ No newline at end of file
+    }
+
+    return result, (clean_event, risk, reasons, blocked, rotated, verified)
+
+
+# =========================
+# RESULT CACHE
+# =========================
+def cached_result(clean_event: dict, bundle):
+    """
+    Look up a repeated event in the result cache.
+    Returns: (key, (result, audit) or None); key is None when the
+    result must not be cached (random scoring mode).
+    """
+    key = result_key(clean_event, bundle)
+    if key is None:
+        return None, None
+
+    outcome = result_cache.get(key)
+    if outcome is None:
+        return key, None
+
+    return key, build_result(clean_event, *outcome)
+
+
+def cache_result(key, audit):
+    if key is not None:
+        # risk and reasons are all build_result() needs
+        result_cache.put(key, (audit[1], tuple(audit[2])))
+
+
+def check_blocklist(clean_event: dict):
+    """
+    Short-circuit for blocked sessions/users/IPs: no model work.
+    Returns: (result, audit) or None when nothing matches.
+    """
+    # blocks are per tenant: keys carry the tenant prefix, as in velocity
+    tenant = clean_event["tenant"]
+    principals = {
+        "session": clean_event["session_id"],
+        "user": clean_event["user"],
+        "ip": clean_event["ip"],
+    }
+    blocked_by = blocklist.match(
+        scoped(tenant, principals["session"]),
+        scoped(tenant, principals["user"]),
+        scoped(tenant, principals["ip"])
+    )
+    if blocked_by is None:
+        return None
+
+    kind = blocked_by[0]
+    value = principals[kind]
+    reasons = [f"Blocked {kind} ({value}) – awaiting admin release"]
+    clean_event["model_version"] = "blocklist"
+
+    result = {
+        "risk": 100,
+        "verified": 0,
+        "blocked": 1,
+        "credentials_rotated": 0,
+        "reasons": reasons
+    }
+
+    return result, (clean_event, 100, reasons, 1, 0, 0)
+
+
+def block_session(event: dict, clean_event: dict, result: dict):
+    # only sessions the client named; generated ids never come back
+    if result["blocked"] and (event.get("session_id") or event.get("session")):
+        session = scoped(clean_event["tenant"], clean_event["session_id"])
+        blocklist.block("session", session, ttl=BLOCK_TTL, reason="; ".join(result["reasons"]))
+
+
+def score_event(event: dict):
+    """
+    Score one event without touching the audit table.
+    Returns: (result, audit)
+    """
+    start = perf_counter()
+    clean_event = prepare_event(event)
+
+    t = perf_counter()
+    short_circuit = check_blocklist(clean_event)
+    t = lap("blocklist", t)
+    if short_circuit is not None:
+        count_result(short_circuit[0], "blocklist")
+        lap("score", start)
+        return short_circuit
+
+    # one model/rules version for the whole event
+    bundle = get_bundle(clean_event["tenant"])
+    clean_event["model_version"] = bundle.version
+    t = lap("bundle", t)
+
+    key, evaluated = cached_result(clean_event, bundle)
+    t = lap("cache", t)
+
+    if evaluated is None:
+        # Detect AI risk
+        score, rule_flags = detect(clean_event, bundle)
+        t = lap("detect", t)
+        evaluated = evaluate_event(clean_event, score, rule_flags)
+        cache_result(key, evaluated[1])
+        lap("evaluate", t)
+
+    result, audit = evaluated
+    block_session(event, clean_event, result)
+    count_result(result, "model")
+    lap("score", start)
+
+    return result, audit
+
+
+class StagedEvents:
+    """
+    A batch between stage_events() and finish_events(). Events that
+    still need the model are listed per tenant in `misses`; events that
+    raised are kept in `failed` (index -> exception).
+    """
+
+    def __init__(self, events, clock=None):
+        self.events = events
+        self.replay = clock is not None
+        self.clean_events = [None] * len(events)
+        self.evaluated = [None] * len(events)
+        self.keys = {}
+        self.scored = set()     # model results (cached or not), not blocklist hits
+        self.bundles = {}
+        self.misses = {}
+        self.failed = {}
+
+    def requests(self):
+        """
+        The model work left: {tenant: [clean events]}, for detect_groups().
+        """
+        return {
+            tenant: [self.clean_events[i] for i in indexes]
+            for tenant, indexes in self.misses.items()
+        }
+
+    def versions(self):
+        """
+        {tenant: bundle version} the model work must be done with: the
+        version already in the events' audit rows and cache keys.
+        """
+        return {tenant: self.bundles[tenant].version for tenant in self.misses}
+
+
+def stage_events(events: list, clock=None, skip_errors=False):
+    """
+    First half of score_events(): sanitize, velocity features,
+    blocklist and result cache. Runs in the process that owns the
+    behavior store and the cache. clock: see prepare_event().
+    skip_errors: record failing events in `failed` instead of raising.
+    Returns: StagedEvents
+    """
+    staged = StagedEvents(events, clock)
+
+    for i, event in enumerate(events):
+        try:
+            clean_event = staged.clean_events[i] = prepare_event(event, clock)
+
+            staged.evaluated[i] = check_blocklist(clean_event)
+            if staged.evaluated[i] is not None:
+                continue
+
+            # one bundle (and one detect_many call) per tenant in the batch
+            tenant = clean_event["tenant"]
+            bundle = staged.bundles.get(tenant)
+            if bundle is None:
+                bundle = staged.bundles[tenant] = get_bundle(tenant)
+            clean_event["model_version"] = bundle.version
+
+            staged.keys[i], staged.evaluated[i] = cached_result(clean_event, bundle)
+            staged.scored.add(i)
+            if staged.evaluated[i] is None:
+                staged.misses.setdefault(tenant, []).append(i)
+        except Exception as exc:
+            if not skip_errors:
+                raise
+            staged.failed[i] = exc
+
+    return staged
+
+
+def detect_groups(requests: dict, bundles=None):
+    """
+    The model work of a batch: one vectorized detect_many() call per
+    tenant. Touches no shared state, so scoring workers can run it.
+    requests: {tenant: [clean events]}; bundles: {tenant: bundle},
+    default: this process's current bundles.
+    Returns: {tenant: [(score, rule_flags)]}
+    """
+    return {
+        tenant: detect_many(clean_events, bundles[tenant] if bundles else get_bundle(tenant))
+        for tenant, clean_events in requests.items()
+    }
+
+
+def detect_separately(requests: dict, bundles=None):
+    """
+    detect_groups() one event at a time, after the batch call failed,
+    so one bad event (e.g. a non-numeric feature) fails alone.
+    Returns: {tenant: [(score, rule_flags) or the exception raised]}
+    """
+    detections = {}
+    for tenant, clean_events in requests.items():
+        bundle = bundles[tenant] if bundles else get_bundle(tenant)
+        out = detections[tenant] = []
+        for clean_event in clean_events:
+            try:
+                out.append(detect_many([clean_event], bundle)[0])
+            except Exception as exc:
+                out.append(exc)
+    return detections
+
+
+def detect_batch(requests: dict, bundles=None, skip_errors=False):
+    """
+    detect_groups(); with skip_errors, a failing batch is retried with
+    detect_separately() so only the bad events fail.
+    """
+    try:
+        return detect_groups(requests, bundles)
+    except Exception:
+        if not skip_errors:
+            raise
+        return detect_separately(requests, bundles)
+
+
+def finish_events(staged: StagedEvents, detections: dict):
+    """
+    Second half of score_events(): risk, reasons and actions for the
+    detections, cache fill, session blocks and metrics.
+    Returns: list of (result, audit), in order; None for failed events.
+    """
+    t = perf_counter()
+    for tenant, indexes in staged.misses.items():
+        for i, detection in zip(indexes, detections[tenant]):
+            if isinstance(detection, Exception):
+                staged.failed[i] = detection
+                staged.scored.discard(i)
+                continue
+            score, rule_flags = detection
+            staged.evaluated[i] = evaluate_event(staged.clean_events[i], score, rule_flags)
+            cache_result(staged.keys[i], staged.evaluated[i][1])
+    if staged.misses:
+        lap("evaluate_batch", t)
+
+    for i, item in enumerate(staged.evaluated):
+        if item is None:
+            continue
+        result = item[0]
+        if i in staged.scored:
+            # replayed history is scored but never blocks sessions
+            if not staged.replay:
+                block_session(staged.events[i], staged.clean_events[i], result)
+            count_result(result, "model")
+        else:
+            count_result(result, "blocklist")
+
+    return staged.evaluated
+
+
+def score_events(events: list, clock=None, skip_errors=False):
+    """
+    Batch version of score_event().
+    Scores all non-blocked, non-cached events with one vectorized
+    detect_many() call per tenant. clock: see prepare_event().
+    skip_errors: a failing event gets None instead of failing the batch.
+    Returns: list of (result, audit), in order.
+    """
+    staged = stage_events(events, clock, skip_errors)
+    if not staged.misses:
+        return finish_events(staged, {})
+
+    t = perf_counter()
+    detections = detect_batch(staged.requests(), staged.bundles, skip_errors)
+    lap("detect_batch", t)
+
+    return finish_events(staged, detections)
+
+
+# =========================
+# RESULT LISTENERS
+# =========================
+# Called with (result, audit) once process_event()/process_events()
+# have saved an event, e.g. to push it to live dashboards.
+result_listeners = []
+
+
+def notify(result, audit):
+    for listener in result_listeners:
+        listener(result, audit)
+
+
+def process_event(event: dict):
+    start = perf_counter()
+    result, audit = score_event(event)
+
+    # Save to database
+    save_event(*audit)
+    lap("process_event", start)
+
+    notify(result, audit)
+
+    return result
+
+
+def process_events(events: list):
+    """
+    Batch version of process_event().
+    Returns one result per event, in order.
+    """
+    evaluated = score_events(events)
+
+    # Save the whole batch in one transaction
+    save_events([audit for _, audit in evaluated])
+
+    for result, audit in evaluated:
+        notify(result, audit)
+
+    return [result for result, _ in evaluated]
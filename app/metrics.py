@@ -0,0 +1,213 @@
+import threading
+from time import perf_counter
+from app.config import METRICS_ENABLED
+from app.rollups import risk_band
+
+# =========================================
+# LATENCY HISTOGRAM
+# =========================================
+# HDR-style log-linear buckets over whole microseconds: exact below
+# 2**SUB_BITS us, then 2**(SUB_BITS-1) buckets per power of two, i.e.
+# about 3% relative error at any magnitude with a fixed, small array.
+SUB_BITS = 5
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+MAX_EXPONENT = 37  # ~38 hours; slower values land in the last bucket
+BUCKETS = (MAX_EXPONENT - SUB_BITS + 2) * HALF_COUNT
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(micros):
+    if micros < SUB_COUNT:
+        return micros
+    shift = micros.bit_length() - SUB_BITS
+    return min(shift * HALF_COUNT + (micros >> shift), BUCKETS - 1)
+
+
+def bucket_bounds(index):
+    """
+    [lower, upper) in microseconds for a bucket index.
+    """
+    if index < SUB_COUNT:
+        return index, index + 1
+    shift = index // HALF_COUNT - 1
+    mantissa = index - shift * HALF_COUNT
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    """
+    Fixed-memory latency histogram; record() is O(1).
+    Values are seconds, quantiles are bucket midpoints.
+
+    record() takes no lock: a lock would cost more than the rest of
+    the call, and a rare lost increment under thread contention is
+    acceptable for monitoring.
+    """
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0.0
+
+    def record(self, seconds):
+        micros = int(seconds * 1e6)
+        self.counts[micros if micros < SUB_COUNT else bucket_index(micros)] += 1
+        self.total += seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantiles(self, qs=QUANTILES):
+        """
+        {q: seconds} for each quantile in qs (ascending).
+        """
+        counts = list(self.counts)
+        count = sum(counts)
+
+        result = {}
+        if not count:
+            return {q: 0.0 for q in qs}
+
+        targets = iter(qs)
+        q = next(targets)
+        seen = 0
+        for index, n in enumerate(counts):
+            if not n:
+                continue
+            seen += n
+            while q is not None and seen >= q * count:
+                lower, upper = bucket_bounds(index)
+                result[q] = (lower + upper) / 2e6
+                q = next(targets, None)
+            if q is None:
+                break
+        return result
+
+
+# =========================================
+# METRIC FAMILIES
+# =========================================
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class HistogramFamily:
+    """
+    One histogram per label value, exported as a Prometheus summary.
+    """
+
+    def __init__(self, name, help, label):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def get(self, value):
+        histogram = self._histograms.get(value)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(value, Histogram())
+        return histogram
+
+    def observe(self, value, seconds):
+        histogram = self._histograms.get(value) or self.get(value)
+        histogram.record(seconds)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} summary"]
+        for value, histogram in sorted(list(self._histograms.items())):
+            base = ((self.label, value),)
+            for q, seconds in histogram.quantiles().items():
+                lines.append(f"{self.name}{format_labels(base + (('quantile', q),))} {seconds:.9f}")
+            lines.append(f"{self.name}_sum{format_labels(base)} {histogram.total:.9f}")
+            lines.append(f"{self.name}_count{format_labels(base)} {histogram.count}")
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter with one label (lock-free, like Histogram).
+    """
+
+    def __init__(self, name, help, label):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+
+    def inc(self, value, amount=1):
+        self.values[value] = self.values.get(value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for value, n in sorted(list(self.values.items())):
+            lines.append(f"{self.name}{format_labels(((self.label, value),))} {n}")
+        return lines
+
+
+def gauges(prefix, stats, help):
+    """
+    Prometheus lines for the numeric values of a stats() dict.
+    """
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines += [f"# HELP {name} {help} ({key})", f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+# =========================================
+# HOT-PATH METRICS
+# =========================================
+# Per-process; with SCORING_WORKERS > 0 the server still stages and
+# counts every event, and times the workers' model calls as detect_batch.
+stage_seconds = HistogramFamily("trustlens_stage_seconds", "Hot-path latency per processing stage", "stage")
+events_total = Counter("trustlens_events_total", "Scored events by risk band", "band")
+blocks_total = Counter("trustlens_blocks_total", "Blocked events by source", "source")
+
+enabled = METRICS_ENABLED
+
+
+def configure(on):
+    global enabled
+    enabled = on
+
+
+def lap(stage, start):
+    """
+    Record the time since start for stage; returns the new start.
+
+        t = perf_counter()
+        clean = sanitize(event)
+        t = lap("sanitize", t)
+    """
+    now = perf_counter()
+    if enabled:
+        stage_seconds.observe(stage, now - start)
+    return now
+
+
+def count_result(result, source):
+    if not enabled:
+        return
+    events_total.inc(risk_band(result["risk"]))
+    if result["blocked"]:
+        blocks_total.inc(source)
+
+
+def render(*extra):
+    """
+    Prometheus text exposition of the hot-path metrics plus any
+    extra pre-rendered line lists.
+    """
+    lines = stage_seconds.render() + events_total.render() + blocks_total.render()
+    for block in extra:
+        lines += block
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,218 @@
+import ast
+import json
+import sqlite3
+from app.rollups import rebuild_rollups
+
+
+# =========================================
+# AUDIT SCHEMA
+# =========================================
+# Typed columns for everything the dashboard and analytics filter on.
+# The JSON `event` column is kept for compatibility.
+AUDIT_COLUMNS = [
+    ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    ("timestamp", "TEXT"),
+    ("event", "TEXT"),
+    ("risk", "REAL"),
+    ("reasons", "TEXT"),
+    ("verified", "INTEGER DEFAULT 0"),
+    ("blocked", "INTEGER DEFAULT 0"),
+    ("credentials_rotated", "INTEGER DEFAULT 0"),
+    ("model_version", "TEXT"),
+    ("user", "TEXT"),
+    ("ip", "TEXT"),
+    ("session_id", "TEXT"),
+    ("device", "TEXT"),
+    ("location", "TEXT"),
+    ("lat", "REAL"),
+    ("lon", "REAL"),
+    ("role", "TEXT"),
+    ("login_hour", "INTEGER"),
+    ("device_known", "INTEGER"),
+    ("location_known", "INTEGER"),
+    ("access_count", "INTEGER"),
+    ("role_level", "INTEGER"),
+]
+
+AUDIT_INDEXES = {
+    "idx_audit_timestamp": "timestamp",
+    "idx_audit_user": "user",
+    "idx_audit_ip": "ip",
+    "idx_audit_risk": "risk",
+}
+
+# columns filled from the JSON blob of rows written before the typed schema
+EVENT_FIELDS = [
+    "user", "ip", "session_id", "device", "location", "lat", "lon", "role",
+    "login_hour", "device_known", "location_known", "access_count", "role_level",
+]
+
+# blobs written after privacy.sanitize() use its key names; picked in
+# the same order it picks them
+EVENT_ALIASES = {
+    "user": ("username", "user", "email"),
+    "ip": ("ip_address", "ip", "client_ip"),
+    "session_id": ("session_id", "session"),
+    "device": ("device_name", "device", "machine"),
+    "location": ("location_name", "location", "office"),
+    "role": ("role_name", "role"),
+}
+
+# v3: rows backfilled by v2 from sanitize()-style blobs are read again
+SCHEMA_VERSION = 3
+
+# what v2 left for a sanitize()-style blob: no typed row ever looks like this
+MISSED_ALIASES = "user = 'Unknown' AND ip IS NULL AND device IS NULL AND location IS NULL"
+
+BACKFILL_CHUNK = 5000
+
+
+def audit_table_sql(name="audit"):
+    columns = ",\n    ".join(f'"{col}" {decl}' for col, decl in AUDIT_COLUMNS)
+    return f"CREATE TABLE IF NOT EXISTS {name} (\n    {columns}\n)"
+
+
+def parse_event(raw):
+    """
+    JSON first, then Python-literal rows written by early versions.
+    """
+    if not raw:
+        return {}
+    try:
+        event = json.loads(raw)
+    except (TypeError, ValueError):
+        try:
+            event = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            return {}
+    return event if isinstance(event, dict) else {}
+
+
+def table_columns(conn, table="audit"):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# =========================================
+# MIGRATION
+# =========================================
+def migrate(conn):
+    """
+    Bring any audit table to the typed schema:
+
+    - db_init.py layout (no id/timestamp/reasons): rebuilt with ids
+      taken from rowid
+    - storage.init_db layout: missing columns added
+    - structured columns backfilled from the JSON `event` blob
+      (both the raw and the privacy.sanitize() key names)
+    - indexes created
+
+    Idempotent; PRAGMA user_version records the schema version.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    columns = table_columns(conn)
+
+    if version >= SCHEMA_VERSION and columns:
+        return
+
+    with conn:
+        if columns and "id" not in columns:
+            _rebuild_with_ids(conn, columns)
+            columns = table_columns(conn)
+
+        conn.execute(audit_table_sql())
+        columns = table_columns(conn)
+
+        for col, decl in AUDIT_COLUMNS:
+            if col not in columns:
+                conn.execute(f'ALTER TABLE audit ADD COLUMN "{col}" {decl}')
+
+    _backfill(conn)
+    if 0 < version < 3 and _backfill(conn, MISSED_ALIASES) and _has_rollups(conn):
+        # their rollups were counted under "Unknown"
+        rebuild_rollups(conn)
+
+    with conn:
+        for name, col in AUDIT_INDEXES.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON audit("{col}")')
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _rebuild_with_ids(conn, columns):
+    shared = [col for col, _ in AUDIT_COLUMNS if col in columns and col != "id"]
+    shared_sql = ", ".join(f'"{col}"' for col in shared)
+
+    conn.execute("DROP TABLE IF EXISTS audit_migrating")
+    conn.execute(audit_table_sql("audit_migrating"))
+    conn.execute(
+        f"INSERT INTO audit_migrating (id, {shared_sql}) "
+        f"SELECT rowid, {shared_sql} FROM audit ORDER BY rowid"
+    )
+    conn.execute("DROP TABLE audit")
+    conn.execute("ALTER TABLE audit_migrating RENAME TO audit")
+
+
+def _scalar(value):
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value)
+    return value
+
+
+def _field(event, col):
+    # like sanitize(): the first key with a real value, else any value
+    values = [event.get(key) for key in EVENT_ALIASES.get(col, (col,))]
+    for value in values:
+        if value not in (None, "", "Unknown"):
+            return _scalar(value)
+    return _scalar(next((value for value in values if value is not None), None))
+
+
+def _has_rollups(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='audit_rollup'"
+    ).fetchone() is not None
+
+
+def _backfill(conn, condition="user IS NULL"):
+    """
+    Fill the typed columns of the rows matching condition from their
+    blobs. Returns: rows updated.
+    """
+    assignments = ", ".join(f'"{col}" = ?' for col in EVENT_FIELDS)
+    last_id = 0
+    updated = 0
+
+    while True:
+        rows = conn.execute(
+            f"SELECT id, event FROM audit WHERE id > ? AND {condition} ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_CHUNK)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row_id, raw in rows:
+            event = parse_event(raw)
+            values = [_field(event, col) for col in EVENT_FIELDS]
+            # keep the row out of the next scan even when the blob had no user
+            values[0] = values[0] or "Unknown"
+            updates.append(values + [row_id])
+
+        with conn:
+            conn.executemany(f"UPDATE audit SET {assignments} WHERE id = ?", updates)
+
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+    return updated
+
+
+if __name__ == "__main__":
+    import sys
+    from app.config import DB_PATH
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    count = conn.execute("SELECT COUNT(*) FROM audit").fetchone()[0]
+    conn.close()
+    print(f"Audit schema v{SCHEMA_VERSION} ready at {path} ({count} rows)")
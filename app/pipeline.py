@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from app.config import AUDIT_QUEUE_SIZE, AUDIT_QUEUE_POLICY, AUDIT_FLUSH_SIZE, SCORING_THREADS
+from app.config import AUDIT_WRITE_RETRIES, AUDIT_RETRY_DELAY, AUDIT_MAINTENANCE_INTERVAL, RETRAIN_INTERVAL
+from app.storage import save_events, maintain_audit
+from app.tenants import known_tenants
+
+logger = logging.getLogger(__name__)
+
+
+class AuditQueue:
+    """
+    Bounded write-behind queue for audit rows.
+
+    Request handlers put save_event() argument tuples on the queue and
+    return immediately. One background task drains the queue in batches
+    and writes each batch in a single transaction on a dedicated thread,
+    so SQLite never blocks the event loop.
+
+    When the queue is full:
+    - "block": the handler waits for space (counted in `blocked`)
+    - "drop":  the row is discarded (counted in `dropped`)
+
+    A failed write is logged and retried with backoff; rows still not
+    written after `retries` retries are logged and counted in `failed`.
+    on_saved(audit) is called on the event loop for every row once its
+    transaction has committed (e.g. to push it to live dashboards).
+    """
+
+    def __init__(self, maxsize=AUDIT_QUEUE_SIZE, policy=AUDIT_QUEUE_POLICY, batch_size=AUDIT_FLUSH_SIZE,
+                 retries=AUDIT_WRITE_RETRIES, on_saved=None):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown audit queue policy: {policy}")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.batch_size = batch_size
+        self.retries = retries
+        self.on_saved = on_saved
+
+        self.written = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.failed = 0
+
+        self._queue = None
+        self._task = None
+        # single writer thread keeps one pooled SQLite connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit-writer")
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._writer())
+
+    async def put(self, audit):
+        if self._queue.full():
+            if self.policy == "drop":
+                self.dropped += 1
+                return False
+            self.blocked += 1
+
+        await self._queue.put(audit)
+        return True
+
+    async def put_many(self, audits):
+        for audit in audits:
+            await self.put(audit)
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._save(loop, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _save(self, loop, batch):
+        # one transaction per tenant database, so a retry never
+        # rewrites rows another database already committed
+        groups = {}
+        for audit in batch:
+            groups.setdefault(audit[0].get("tenant"), []).append(audit)
+
+        for rows in groups.values():
+            error = None
+            # transient errors (e.g. a locked database) get a few retries
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    logger.warning("Audit write of %d rows failed, retrying", len(rows), exc_info=error)
+                    await asyncio.sleep(AUDIT_RETRY_DELAY * 2 ** (attempt - 1))
+                try:
+                    await loop.run_in_executor(self._executor, save_events, rows)
+                    self.written += len(rows)
+                    break
+                except Exception as exc:
+                    error = exc
+            else:
+                logger.error("Dropping %d audit rows after %d attempts", len(rows), self.retries + 1, exc_info=error)
+                self.failed += len(rows)
+                continue
+
+            if self.on_saved is not None:
+                for audit in rows:
+                    try:
+                        self.on_saved(audit)
+                    except Exception:
+                        logger.exception("Audit on_saved callback failed")
+
+    async def stop(self):
+        """
+        Flush everything still queued, then stop the writer.
+        """
+        if self._task is None:
+            return
+
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "written": self.written,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "failed": self.failed,
+        }
+
+
+# Scoring is CPU-bound; keep it off the event loop
+scoring_executor = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix="scoring")
+
+
+async def run_scoring(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(scoring_executor, fn, *args)
+
+
+async def audit_maintenance(interval=AUDIT_MAINTENANCE_INTERVAL):
+    """
+    Background task: compact old audit days into archives and apply
+    retention every `interval` seconds (first run at startup), for the
+    shared database and every tenant database.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        for tenant in [None] + known_tenants():
+            try:
+                report = await loop.run_in_executor(None, maintain_audit, tenant)
+                for day, rows in report["compacted"]:
+                    logger.info("Archived audit day %s (%d rows, tenant %s)", day, rows, tenant)
+                for day in report["expired"]:
+                    logger.info("Expired audit archive %s (tenant %s)", day, tenant)
+                for granularity, rows in report["pruned"].items():
+                    if rows:
+                        logger.info("Pruned %d %s rollup rows (tenant %s)", rows, granularity, tenant)
+            except Exception:
+                logger.exception("Audit maintenance failed (tenant %s)", tenant)
+        await asyncio.sleep(interval)
+
+
+async def model_retraining(interval=RETRAIN_INTERVAL):
+    """
+    Background task: retrain the model from the audit history every
+    `interval` seconds (first run after one interval). A promoted model
+    is picked up by the registry's hot reload.
+    """
+    from app.retrain import retrain  # deferred: pulls in pandas / sklearn
+
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report = await loop.run_in_executor(None, retrain)
+            logger.info("Model retraining: %s (%d rows sampled)", report["status"], report["sampled"])
+        except Exception:
+            logger.exception("Model retraining failed")
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from app.config import (
+    MODEL_PATH,
+    RULES_PATH,
+    ENGINE_MODE,
+    MODEL_MMAP_MODE,
+    COMPILED_MODEL_PATH,
+    SCORE_TABLE_ENABLED,
+    SCORE_TABLE_PATH,
+    SCORE_TABLE_MAX_ACCESS,
+    SCORE_TABLE_MAX_ROLE,
+    MODEL_POLL_INTERVAL
+)
+from app.forest import CompiledForest
+from app.score_table import ScoreTable, file_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ModelBundle:
+    """
+    One immutable, versioned set of scoring artifacts:
+    rules, scorer (sklearn model or compiled forest) and optional score table.
+
+    A request keeps the bundle it started with, so a reload never
+    changes the model half-way through scoring an event.
+    """
+
+    def __init__(self, version, model_hash, rules, scorer, score_table, model=None):
+        self.version = version
+        self.model_hash = model_hash
+        self.rules = rules
+        self.scorer = scorer
+        self.score_table = score_table
+        self.model = model
+
+
+def load_model(model_path):
+    # sklearn trees copy mapped arrays into their own buffers on
+    # unpickling: only CompiledForest.load() keeps pages shared
+    import joblib  # deferred: unpickling pulls in sklearn
+    return joblib.load(model_path, mmap_mode=MODEL_MMAP_MODE)
+
+
+def load_rules(rules_path):
+    """
+    Returns: (rules dict, sha256 of the file)
+    """
+    with open(rules_path, "rb") as f:
+        raw_rules = f.read()
+    return json.loads(raw_rules), hashlib.sha256(raw_rules).hexdigest()
+
+
+def bundle_version(model_hash, rules_hash):
+    return f"{model_hash[:12]}-{rules_hash[:8]}"
+
+
+def load_bundle(model_path=MODEL_PATH, rules_path=RULES_PATH,
+                compiled_path=COMPILED_MODEL_PATH, score_table_path=SCORE_TABLE_PATH):
+    rules, rules_hash = load_rules(rules_path)
+    model_hash = file_hash(model_path)
+
+    model = None
+
+    if ENGINE_MODE == "sklearn":
+        model = load_model(model_path)
+        scorer = model
+    elif ENGINE_MODE == "compiled":
+        # reuse the exported arrays when they match the model file,
+        # so sklearn is never imported in compiled mode
+        scorer = CompiledForest.load(compiled_path, model_hash, mmap_mode=MODEL_MMAP_MODE)
+        if scorer is None:
+            CompiledForest.from_model(load_model(model_path)).save(compiled_path, model_hash)
+            scorer = CompiledForest.load(compiled_path, model_hash, mmap_mode=MODEL_MMAP_MODE)
+    else:
+        raise ValueError(f"Unknown ENGINE_MODE: {ENGINE_MODE}")
+
+    score_table = None
+    if SCORE_TABLE_ENABLED:
+        score_table = ScoreTable.load_or_build(
+            scorer, model_path, score_table_path, SCORE_TABLE_MAX_ACCESS, SCORE_TABLE_MAX_ROLE,
+            model_hash=model_hash
+        )
+
+    return ModelBundle(bundle_version(model_hash, rules_hash), model_hash, rules, scorer, score_table, model)
+
+
+class ModelRegistry:
+    """
+    Holds the current ModelBundle and swaps in a new one when the
+    model or rules file changes.
+
+    current() costs one clock read per call. At most once per poll
+    interval it stats both files; on a change the new bundle is loaded
+    on a background thread and swapped in with a single reference
+    assignment. Until then, callers keep getting the old bundle.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, rules_path=RULES_PATH, poll_interval=MODEL_POLL_INTERVAL,
+                 compiled_path=COMPILED_MODEL_PATH, score_table_path=SCORE_TABLE_PATH):
+        self.model_path = model_path
+        self.rules_path = rules_path
+        self.poll_interval = poll_interval
+        self.compiled_path = compiled_path
+        self.score_table_path = score_table_path
+
+        self._bundle = None
+        self._stamp = None
+        self._next_check = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        stamp = []
+        for path in (self.model_path, self.rules_path):
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        return tuple(stamp)
+
+    def current(self):
+        bundle = self._bundle
+
+        if bundle is None:
+            return self._first_load()
+
+        if time.monotonic() >= self._next_check:
+            self._check()
+
+        return bundle
+
+    def _check(self):
+        with self._lock:
+            if self._loading or time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + self.poll_interval
+
+            try:
+                stamp = self._file_stamp()
+            except OSError:
+                return  # file being replaced; try again next interval
+
+            if stamp == self._stamp:
+                return
+
+            self._loading = True
+
+        threading.Thread(target=self._background_reload, args=(stamp,), daemon=True).start()
+
+    def _background_reload(self, stamp):
+        try:
+            bundle = load_bundle(self.model_path, self.rules_path, self.compiled_path, self.score_table_path)
+        except Exception:
+            logger.exception("Model/rules reload failed; keeping version %s", self._bundle.version)
+            with self._lock:
+                # don't retry the same broken files every interval
+                self._stamp = stamp
+                self._loading = False
+            return
+
+        with self._lock:
+            self._swap(bundle, stamp)
+            self._loading = False
+
+    def _swap(self, bundle, stamp):
+        if self._bundle is None or bundle.version != self._bundle.version:
+            logger.info("Scoring with model/rules version %s", bundle.version)
+        self._bundle = bundle
+        self._stamp = stamp
+        self._next_check = time.monotonic() + self.poll_interval
+
+    def _first_load(self):
+        with self._lock:
+            # threads that waited here find the bundle already loaded
+            if self._bundle is None:
+                self._load()
+            return self._bundle
+
+    def _load(self):
+        stamp = self._file_stamp()
+        bundle = load_bundle(self.model_path, self.rules_path, self.compiled_path, self.score_table_path)
+        self._swap(bundle, stamp)
+        return bundle
+
+    def reload(self):
+        """
+        Synchronous reload, e.g. after replacing the files.
+        """
+        with self._lock:
+            return self._load()
+
+
+class RulesRegistry:
+    """
+    Registry for a tenant with its own rules but the shared model.
+
+    Its bundles reuse the base registry's scorer and score table and
+    only swap the rules, so the model is loaded once however many
+    tenants have their own rules. The rules file is polled like
+    ModelRegistry polls its files; a new base bundle is picked up on
+    the next call.
+    """
+
+    def __init__(self, base, rules_path, poll_interval=MODEL_POLL_INTERVAL):
+        self.base = base
+        self.rules_path = rules_path
+        self.poll_interval = poll_interval
+
+        self._bundle = None
+        self._base_bundle = None
+        self._rules = None
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        base = self.base.current()
+        bundle = self._bundle
+
+        if bundle is None or base is not self._base_bundle or time.monotonic() >= self._next_check:
+            with self._lock:
+                self._refresh(base)
+                bundle = self._bundle
+
+        return bundle
+
+    def _refresh(self, base, force=False):
+        if force or self._rules is None or time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.poll_interval
+            self._load_rules(force or self._rules is None)
+
+        if self._bundle is None or base is not self._base_bundle or self._bundle.rules is not self._rules[0]:
+            rules, rules_hash = self._rules
+            self._bundle = ModelBundle(
+                bundle_version(base.model_hash, rules_hash), base.model_hash,
+                rules, base.scorer, base.score_table, base.model
+            )
+            self._base_bundle = base
+
+    def _load_rules(self, required):
+        try:
+            st = os.stat(self.rules_path)
+        except OSError:
+            if required:
+                raise
+            return  # file being replaced; try again next interval
+
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp and not required:
+            return
+
+        try:
+            self._rules = load_rules(self.rules_path)
+        except (OSError, ValueError):
+            if required:
+                raise
+            logger.exception("Rules reload failed; keeping the previous rules (%s)", self.rules_path)
+        # don't retry the same broken file every interval
+        self._stamp = stamp
+
+    def reload(self):
+        """
+        Re-read the rules file now (the model is the base registry's).
+        """
+        base = self.base.current()
+        with self._lock:
+            self._refresh(base, force=True)
+            return self._bundle
+
+
+registry = ModelRegistry()
@@ -0,0 +1,259 @@
+"""
+Retrain the IsolationForest on real traffic from the audit history.
+
+1. Sample: stream the feature columns of the last RETRAIN_WINDOW_DAYS
+   of unblocked audit rows (hot table and archives) through a
+   reservoir, so memory stays at RETRAIN_SAMPLE_SIZE rows.
+2. Train: fit a candidate in a separate process with n_jobs trees in
+   parallel; the serving process only waits on it.
+3. Compare: score a held-back part of the sample with the current and
+   the candidate model (quantiles, share flagged, KS distance).
+4. Promote: if the share flagged moved by at most
+   RETRAIN_MAX_FLAG_SHIFT (or with --force), keep a copy of the current
+   model and os.replace() the candidate over MODEL_PATH. The model
+   registry notices the new file and hot-reloads it.
+
+    python -m app.retrain --dry-run       # sample, train and compare only
+    python -m app.retrain --window-days 14 --sample-size 50000
+    python -m app.retrain --tenant bakery   # a tenant's own model
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from app.analytics import Query, connect, scan
+from app.engine import FEATURES, get_bundle, score_features
+from app.tenants import db_path, own_path
+from app.config import (
+    DB_PATH, MODEL_PATH,
+    RETRAIN_WINDOW_DAYS, RETRAIN_SAMPLE_SIZE, RETRAIN_MIN_ROWS, RETRAIN_HOLDOUT,
+    RETRAIN_N_ESTIMATORS, RETRAIN_CONTAMINATION, RETRAIN_N_JOBS, RETRAIN_MAX_FLAG_SHIFT,
+)
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+# =========================================
+# SAMPLING
+# =========================================
+class Reservoir:
+    """
+    Uniform sample of fixed size over a stream of unknown length
+    (Algorithm R, one chunk at a time).
+    """
+
+    def __init__(self, size, width, seed=None):
+        self.size = size
+        self.seen = 0
+        self.rows = np.empty((size, width))
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, chunk):
+        chunk = np.asarray(chunk, dtype=float)
+
+        # fill phase
+        free = min(self.size - min(self.seen, self.size), len(chunk))
+        if free:
+            self.rows[self.seen:self.seen + free] = chunk[:free]
+            self.seen += free
+            chunk = chunk[free:]
+        if not len(chunk):
+            return
+
+        # row i of the stream replaces a random slot with probability size / (i + 1)
+        positions = np.arange(self.seen, self.seen + len(chunk))
+        slots = self._rng.integers(0, positions + 1)
+        keep = slots < self.size
+        for slot, row in zip(slots[keep], chunk[keep]):
+            self.rows[slot] = row
+        self.seen += len(chunk)
+
+    def sample(self):
+        return self.rows[:min(self.seen, self.size)].copy()
+
+
+def sample_audit(path=DB_PATH, window_days=RETRAIN_WINDOW_DAYS, size=RETRAIN_SAMPLE_SIZE, seed=None, now=None):
+    """
+    Reservoir sample of feature rows from recent unblocked audit rows.
+    Returns: (sample array, rows seen)
+    """
+    now = now or datetime.utcnow()
+    start = (now - timedelta(days=window_days)).isoformat() if window_days else None
+    query = Query(start=start, filters={"blocked": 0}, columns=FEATURES)
+
+    reservoir = Reservoir(size, len(FEATURES), seed)
+    conn = connect(path)
+    try:
+        for df in scan(conn, query):
+            # rows from before the typed feature columns have no features
+            reservoir.add(df[FEATURES].dropna().to_numpy())
+    finally:
+        conn.close()
+    return reservoir.sample(), reservoir.seen
+
+
+# =========================================
+# TRAINING (runs in a child process)
+# =========================================
+def train_candidate(X, out_path, n_estimators=RETRAIN_N_ESTIMATORS, contamination=RETRAIN_CONTAMINATION,
+                    n_jobs=RETRAIN_N_JOBS, seed=None):
+    import joblib
+    from sklearn.ensemble import IsolationForest
+
+    model = IsolationForest(
+        n_estimators=n_estimators,
+        contamination=contamination,
+        n_jobs=n_jobs,
+        random_state=seed
+    )
+    model.fit(X)
+
+    tmp_path = out_path + ".tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def train_in_background(X, out_path, **params):
+    # spawn: the parent may be a threaded server, which fork does not mix with
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(train_candidate, X, out_path, **params).result()
+
+
+# =========================================
+# COMPARISON
+# =========================================
+def ks_distance(a, b):
+    """
+    Two-sample Kolmogorov-Smirnov statistic: max gap between the CDFs.
+    """
+    values = np.concatenate([a, b])
+    cdf_a = np.searchsorted(np.sort(a), values, side="right") / len(a)
+    cdf_b = np.searchsorted(np.sort(b), values, side="right") / len(b)
+    return float(np.max(np.abs(cdf_a - cdf_b)))
+
+
+def score_summary(scores):
+    return {
+        "mean": float(np.mean(scores)),
+        "quantiles": {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, np.quantile(scores, QUANTILES))},
+        # only negative scores add risk (risk.calculate)
+        "flagged": float(np.mean(scores < 0)),
+    }
+
+
+def compare_models(current_scores, candidate_scores):
+    current = score_summary(current_scores)
+    candidate = score_summary(candidate_scores)
+    return {
+        "rows": len(current_scores),
+        "current": current,
+        "candidate": candidate,
+        "flag_shift": candidate["flagged"] - current["flagged"],
+        "agreement": float(np.mean((current_scores < 0) == (candidate_scores < 0))),
+        "ks": ks_distance(current_scores, candidate_scores),
+    }
+
+
+# =========================================
+# PIPELINE
+# =========================================
+def candidate_path(model_path=MODEL_PATH):
+    # same directory as the model, so os.replace() is atomic
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.candidate{ext}"
+
+
+def previous_path(model_path=MODEL_PATH):
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.previous{ext}"
+
+
+def promote(candidate, model_path=MODEL_PATH):
+    """
+    Keep the current model as *.previous and move the candidate in.
+    Scorers polling the file see either the old or the new model.
+    """
+    if os.path.exists(model_path):
+        shutil.copy2(model_path, previous_path(model_path))
+    os.replace(candidate, model_path)
+
+
+def retrain(path=DB_PATH, model_path=MODEL_PATH, window_days=RETRAIN_WINDOW_DAYS, sample_size=RETRAIN_SAMPLE_SIZE,
+            min_rows=RETRAIN_MIN_ROWS, holdout=RETRAIN_HOLDOUT, n_jobs=RETRAIN_N_JOBS,
+            max_flag_shift=RETRAIN_MAX_FLAG_SHIFT, seed=None, force=False, dry_run=False, tenant=None):
+    """
+    Sample, train, compare and (if it passes) promote.
+    tenant: whose model scores the comparison (path / model_path must
+    be that tenant's files).
+    Returns: report dict; report["status"] is "promoted", "rejected",
+    "dry_run" or "skipped" (not enough rows).
+    """
+    sample, seen = sample_audit(path, window_days, sample_size, seed)
+    report = {"rows_seen": seen, "sampled": len(sample)}
+
+    if len(sample) < min_rows:
+        report["status"] = "skipped"
+        return report
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(sample))
+    n_holdout = max(1, int(len(sample) * holdout))
+    X_eval, X_train = sample[order[:n_holdout]], sample[order[n_holdout:]]
+
+    candidate = train_in_background(X_train, candidate_path(model_path), n_jobs=n_jobs, seed=seed)
+
+    import joblib
+    candidate_scores = joblib.load(candidate).decision_function(X_eval)
+    current_scores = score_features(X_eval, get_bundle(tenant))
+
+    report["comparison"] = compare_models(np.asarray(current_scores), candidate_scores)
+    passed = abs(report["comparison"]["flag_shift"]) <= max_flag_shift
+
+    if dry_run:
+        report["status"] = "dry_run"
+    elif passed or force:
+        promote(candidate, model_path)
+        report["status"] = "promoted"
+        logger.info("Promoted retrained model (%d rows sampled of %d)", len(sample), seen)
+    else:
+        report["status"] = "rejected"
+        logger.warning("Retrained model rejected: flagged share moved by %+.3f",
+                       report["comparison"]["flag_shift"])
+
+    if os.path.exists(candidate):
+        os.remove(candidate)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the anomaly model from the audit history")
+    parser.add_argument("--db", default=None, help="default: the shared or the tenant's database")
+    parser.add_argument("--tenant", default=None, help="retrain this tenant's own model")
+    parser.add_argument("--window-days", type=int, default=RETRAIN_WINDOW_DAYS, help="0 = all history")
+    parser.add_argument("--sample-size", type=int, default=RETRAIN_SAMPLE_SIZE)
+    parser.add_argument("--min-rows", type=int, default=RETRAIN_MIN_ROWS)
+    parser.add_argument("--n-jobs", type=int, default=RETRAIN_N_JOBS)
+    parser.add_argument("--max-flag-shift", type=float, default=RETRAIN_MAX_FLAG_SHIFT)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="promote even if the comparison fails")
+    parser.add_argument("--dry-run", action="store_true", help="compare only, keep the current model")
+    args = parser.parse_args()
+
+    # a promoted tenant model lands in the tenant's directory; running
+    # servers pick it up after POST /tenants/<tenant>/reload
+    model_path = MODEL_PATH if args.tenant is None else own_path(args.tenant, MODEL_PATH)
+    report = retrain(
+        args.db or db_path(args.tenant), model_path, args.window_days, args.sample_size, args.min_rows,
+        n_jobs=args.n_jobs, max_flag_shift=args.max_flag_shift, seed=args.seed,
+        force=args.force, dry_run=args.dry_run, tenant=args.tenant
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,272 @@
+from datetime import datetime, timedelta
+
+
+# =========================================
+# RISK ROLLUPS
+# =========================================
+# Minute / hour / day aggregates per (user, location, risk band),
+# updated in the same transaction as the audit insert. Trend queries
+# read at most a few hundred buckets whatever the window length.
+#
+# Each bucket also has all-users rows, per location and overall
+# (user and/or location = ALL), so unfiltered and location-only trends
+# read a handful of rows per bucket however many users there are.
+GRANULARITIES = {
+    # name: (timestamp prefix length, bucket length)
+    "minute": (16, timedelta(minutes=1)),
+    "hour": (13, timedelta(hours=1)),
+    "day": (10, timedelta(days=1)),
+}
+
+# the widest window each granularity serves, smallest first
+WINDOW_LIMITS = [
+    ("minute", timedelta(hours=3)),
+    ("hour", timedelta(days=7)),
+    ("day", None),
+]
+
+ROLLUP_TABLE = """
+    CREATE TABLE IF NOT EXISTS audit_rollup (
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        user TEXT NOT NULL,
+        location TEXT NOT NULL,
+        band TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        risk_sum REAL NOT NULL,
+        risk_max REAL NOT NULL,
+        blocked INTEGER NOT NULL,
+        rotated INTEGER NOT NULL,
+        PRIMARY KEY (granularity, bucket, user, location, band)
+    ) WITHOUT ROWID
+"""
+
+ROLLUP_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_rollup_principal
+    ON audit_rollup (granularity, user, location, bucket)
+"""
+
+# real rows never have an empty user or location (missing ones are "Unknown")
+ALL = ""
+
+UPSERT_ROLLUP = """
+    INSERT INTO audit_rollup
+        (granularity, bucket, user, location, band, count, risk_sum, risk_max, blocked, rotated)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (granularity, bucket, user, location, band) DO UPDATE SET
+        count = count + excluded.count,
+        risk_sum = risk_sum + excluded.risk_sum,
+        risk_max = MAX(risk_max, excluded.risk_max),
+        blocked = blocked + excluded.blocked,
+        rotated = rotated + excluded.rotated
+"""
+
+
+def risk_band(risk):
+    # same thresholds as execute_actions()
+    if risk >= 70:
+        return "high"
+    if risk >= 40:
+        return "medium"
+    return "low"
+
+
+def init_rollups(conn):
+    """
+    Create the rollup table; on first creation, build it from the
+    existing audit rows. Tables from before the all-users rows get
+    those derived from their per-user rows.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='audit_rollup'"
+    ).fetchone()
+    with conn:
+        conn.execute(ROLLUP_TABLE)
+        # trends seek to one (user, location) and scan its buckets
+        conn.execute(ROLLUP_INDEX)
+    if not exists:
+        rebuild_rollups(conn)
+    elif not _has_totals(conn):
+        with conn:
+            _add_totals(conn)
+
+
+def _has_totals(conn):
+    # the newest bucket has an all-users row once the table has them
+    newest = conn.execute(
+        "SELECT bucket FROM audit_rollup WHERE granularity = 'day' ORDER BY bucket DESC LIMIT 1"
+    ).fetchone()
+    if newest is None:
+        return True
+    return conn.execute(
+        "SELECT 1 FROM audit_rollup WHERE granularity = 'day' AND bucket = ? AND user = ? LIMIT 1",
+        (newest[0], ALL)
+    ).fetchone() is not None
+
+
+def _add_totals(conn):
+    # all-users rows from the per-user rows: per location, then overall
+    conn.execute("""
+        INSERT INTO audit_rollup
+        SELECT granularity, bucket, :all, location, band,
+               SUM(count), SUM(risk_sum), MAX(risk_max), SUM(blocked), SUM(rotated)
+        FROM audit_rollup
+        WHERE user != :all
+        GROUP BY granularity, bucket, location, band
+    """, {"all": ALL})
+    conn.execute("""
+        INSERT INTO audit_rollup
+        SELECT granularity, bucket, :all, :all, band,
+               SUM(count), SUM(risk_sum), MAX(risk_max), SUM(blocked), SUM(rotated)
+        FROM audit_rollup
+        WHERE user != :all
+        GROUP BY granularity, bucket, band
+    """, {"all": ALL})
+
+
+def rebuild_rollups(conn):
+    # from the hot audit table only: days already compacted into
+    # archives (app/archive.py) would drop out of the trends
+    with conn:
+        conn.execute("DELETE FROM audit_rollup")
+        for name, (prefix, _) in GRANULARITIES.items():
+            conn.execute(f"""
+                INSERT INTO audit_rollup
+                SELECT ?, substr(timestamp, 1, {prefix}),
+                       COALESCE(NULLIF(user, ''), 'Unknown'), COALESCE(NULLIF(location, ''), 'Unknown'),
+                       CASE WHEN risk >= 70 THEN 'high' WHEN risk >= 40 THEN 'medium' ELSE 'low' END AS band,
+                       COUNT(*), SUM(risk), MAX(risk),
+                       SUM(blocked), SUM(credentials_rotated)
+                FROM audit
+                WHERE timestamp IS NOT NULL AND risk IS NOT NULL
+                GROUP BY 2, 3, 4, 5
+            """, (name,))
+        _add_totals(conn)
+
+
+def update_rollups(conn, rows):
+    """
+    Fold a batch of audit rows (storage.audit_row dicts) into the rollups.
+    Call inside the insert's transaction.
+    """
+    totals = {}
+
+    for row in rows:
+        timestamp = row["timestamp"]
+        if not timestamp:
+            continue
+
+        risk = float(row["risk"])
+        band = risk_band(risk)
+        user = row["user"] or "Unknown"
+        location = row["location"] or "Unknown"
+
+        for name, (prefix, _) in GRANULARITIES.items():
+            bucket = timestamp[:prefix]
+            for key in (
+                (name, bucket, user, location, band),
+                (name, bucket, ALL, location, band),
+                (name, bucket, ALL, ALL, band),
+            ):
+                agg = totals.get(key)
+                if agg is None:
+                    totals[key] = [1, risk, risk, row["blocked"], row["credentials_rotated"]]
+                else:
+                    agg[0] += 1
+                    agg[1] += risk
+                    agg[2] = max(agg[2], risk)
+                    agg[3] += row["blocked"]
+                    agg[4] += row["credentials_rotated"]
+
+    conn.executemany(UPSERT_ROLLUP, [key + tuple(agg) for key, agg in totals.items()])
+
+
+def prune_rollups(conn, keep_days, now=None):
+    """
+    Drop buckets older than keep_days[granularity] days (None or 0
+    keeps that granularity forever).
+    Returns: {granularity: rows deleted}
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='audit_rollup'"
+    ).fetchone()
+    if not exists:
+        return {}
+
+    now = now or datetime.utcnow()
+    pruned = {}
+    with conn:
+        for granularity, days in keep_days.items():
+            if not days:
+                continue
+            cutoff = bucket_start(now - timedelta(days=days), granularity)
+            pruned[granularity] = conn.execute(
+                "DELETE FROM audit_rollup WHERE granularity = ? AND bucket < ?", (granularity, cutoff)
+            ).rowcount
+    return pruned
+
+
+# =========================================
+# QUERIES
+# =========================================
+def pick_granularity(window):
+    for name, limit in WINDOW_LIMITS:
+        if limit is None or window <= limit:
+            return name
+
+
+def bucket_start(when, granularity):
+    prefix, _ = GRANULARITIES[granularity]
+    return when.isoformat()[:prefix]
+
+
+def risk_trend(conn, window, now=None, granularity=None, user=None, location=None):
+    """
+    Per-bucket risk summary for the last `window` (a timedelta).
+    Returns (granularity, rows) with rows ordered by bucket:
+    {bucket, count, mean_risk, max_risk, blocked, rotated, high, medium, low}
+    """
+    now = now or datetime.utcnow()
+    granularity = granularity or pick_granularity(window)
+
+    where = ["granularity = ?", "bucket >= ?", "bucket <= ?"]
+    params = [granularity, bucket_start(now - window, granularity), bucket_start(now, granularity)]
+
+    # without a user filter, read the all-users rows
+    where.append("user = ?")
+    params.append(ALL if user is None else user)
+    if location is None and user is None:
+        location = ALL
+    if location is not None:
+        where.append("location = ?")
+        params.append(location)
+
+    # one (user, location): seek straight to its buckets
+    table = "audit_rollup INDEXED BY idx_rollup_principal" if location is not None else "audit_rollup"
+
+    rows = conn.execute(f"""
+        SELECT bucket, SUM(count), SUM(risk_sum), MAX(risk_max),
+               SUM(blocked), SUM(rotated),
+               SUM(CASE WHEN band = 'high' THEN count ELSE 0 END),
+               SUM(CASE WHEN band = 'medium' THEN count ELSE 0 END),
+               SUM(CASE WHEN band = 'low' THEN count ELSE 0 END)
+        FROM {table}
+        WHERE {" AND ".join(where)}
+        GROUP BY bucket
+        ORDER BY bucket
+    """, params).fetchall()
+
+    return granularity, [
+        {
+            "bucket": bucket,
+            "count": count,
+            "mean_risk": risk_sum / count if count else 0.0,
+            "max_risk": risk_max,
+            "blocked": blocked,
+            "rotated": rotated,
+            "high": high,
+            "medium": medium,
+            "low": low,
+        }
+        for bucket, count, risk_sum, risk_max, blocked, rotated, high, medium, low in rows
+    ]
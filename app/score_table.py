@@ -0,0 +1,82 @@
+import hashlib
+import os
+import numpy as np
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ScoreTable:
+    """
+    Anomaly scores precomputed over the bounded feature grid:
+
+        login_hour      0..23
+        device_known    0..1
+        location_known  0..1
+        access_count    0..max_access
+        role_level      0..max_role
+
+    Inside the grid a score is a single array index. Rows outside the
+    grid (or with non-integer features) are left to the live model.
+    """
+
+    def __init__(self, scores, model_hash):
+        self.scores = scores
+        self.shape = np.asarray(scores.shape)
+        self.model_hash = model_hash
+
+    @classmethod
+    def build(cls, scorer, model_hash, max_access, max_role):
+        shape = (24, 2, 2, max_access + 1, max_role + 1)
+        grid = np.indices(shape).reshape(len(shape), -1).T
+        scores = np.asarray(scorer.decision_function(grid)).reshape(shape)
+        return cls(scores, model_hash)
+
+    @classmethod
+    def load_or_build(cls, scorer, model_path, cache_path, max_access, max_role, model_hash=None):
+        """
+        Load the cached table if it was built from this exact model file
+        and grid, otherwise rebuild it and refresh the cache.
+        """
+        if model_hash is None:
+            model_hash = file_hash(model_path)
+        shape = (24, 2, 2, max_access + 1, max_role + 1)
+
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    if str(cached["model_hash"]) == model_hash and cached["scores"].shape == shape:
+                        return cls(cached["scores"], model_hash)
+            except (OSError, KeyError, ValueError):
+                pass  # unreadable cache: rebuild below
+
+        table = cls.build(scorer, model_hash, max_access, max_role)
+        table.save(cache_path)
+        return table
+
+    def save(self, path):
+        # write-then-rename so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, scores=self.scores, model_hash=np.array(self.model_hash))
+        os.replace(tmp_path, path)
+
+    def lookup(self, X):
+        """
+        Returns: (scores, hit_mask). scores is NaN where hit_mask is False.
+        """
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        ints = X.astype(np.int64)
+        hit = (ints == X).all(axis=1) & (ints >= 0).all(axis=1) & (ints < self.shape).all(axis=1)
+
+        scores = np.full(X.shape[0], np.nan)
+        scores[hit] = self.scores[tuple(ints[hit].T)]
+
+        return scores, hit
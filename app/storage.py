@@ -1,46 +1,137 @@
 import sqlite3
 import json
+import threading
+from time import perf_counter
+from collections import OrderedDict
 from datetime import datetime
-from app.config import DB_PATH
+from app.migrations import migrate
+from app.rollups import init_rollups, update_rollups, risk_trend as rollup_trend
+from app.archive import init_archive, archived_max_id, read_archived, to_tuples, update_archived, maintain
+from app.metrics import lap
+from app.tenants import db_path, archive_dir
+from app.config import DB_PATH, TENANT_CONNECTIONS
+
+
+# =========================================
+# CONNECTION POOL
+# =========================================
+# One long-lived connection per (thread, database file).
+# sqlite3 connections must not be shared across threads.
+# Tenant databases are kept in a per-thread LRU of TENANT_CONNECTIONS;
+# the shared database stays open.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+]
+
+_local = threading.local()
+_all_connections = []
+_pool_lock = threading.Lock()
+
+
+def get_connection(path=DB_PATH):
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = OrderedDict()
+
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conns[path] = conn
+        with _pool_lock:
+            _all_connections.append(conn)
+        if len(conns) > TENANT_CONNECTIONS + 1:
+            _close_oldest(conns)
+    else:
+        conns.move_to_end(path)
+
+    return conn
+
+
+def _close_oldest(conns):
+    for path in conns:
+        if path != DB_PATH:
+            conn = conns.pop(path)
+            with _pool_lock:
+                _all_connections.remove(conn)
+            conn.close()
+            return
+
+
+def close_connections():
+    """
+    Close every pooled connection (all threads).
+    Call on shutdown only.
+    """
+    with _pool_lock:
+        for conn in _all_connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _all_connections.clear()
+    _local.conns = OrderedDict()
 
 
 # =========================================
 # DATABASE INIT
 # =========================================
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
+_ready_paths = set()
 
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS audit (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            event TEXT,
-            risk REAL,
-            reasons TEXT,
-            verified INTEGER DEFAULT 0,
-            blocked INTEGER DEFAULT 0,
-            credentials_rotated INTEGER DEFAULT 0
-        )
-    """)
+# Backfill progress (app/ingest.py): the byte offset up to which a
+# named source is stored, written in the same transaction as its rows
+CHECKPOINT_TABLE = """
+    CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+        name TEXT PRIMARY KEY,
+        position INTEGER NOT NULL
+    )
+"""
 
-    conn.commit()
-    conn.close()
 
+def init_db(tenant=None):
+    """
+    Create or migrate the audit table to the typed schema
+    (see app/migrations.py). A tenant's directory must already exist
+    (tenants are provisioned by creating it, see app/tenants.py).
+    """
+    path = db_path(tenant)
+    conn = get_connection(path)
+    migrate(conn)
+    init_rollups(conn)
+    init_archive(conn)
+    with conn:
+        conn.execute(CHECKPOINT_TABLE)
+    _ready_paths.add(path)
 
-init_db()
+
+def audit_connection(tenant=None):
+    """
+    Pooled connection to the (tenant's) audit database.
+    The schema is created lazily on first use, not at import time.
+    """
+    path = db_path(tenant)
+    if path not in _ready_paths:
+        init_db(tenant)
+    return get_connection(path)
 
 
 # =========================================
-# SAFE EVENT SAVER
+# ROW BUILDER
 # =========================================
-def save_event(event, risk, reasons, blocked, rotated, verified):
+def audit_row(event, risk, reasons, blocked, rotated, verified):
     """
     Final trusted storage layer.
 
     Stores the REAL event exactly as received from SME systems.
     """
 
-    timestamp = datetime.utcnow().isoformat()
+    # event time set by the processor (or the original log time on backfill)
+    timestamp = event.get("timestamp") or datetime.utcnow().isoformat()
 
     # ---------------------------------
     # KEEP REAL EVENT DATA
@@ -48,6 +139,7 @@ def save_event(event, risk, reasons, blocked, rotated, verified):
     safe_event = {
         "user": event.get("user","Unknown"),
         "ip": event.get("ip","Unknown"),
+        "session_id": event.get("session_id"),
         "device": event.get("device","Unknown Device"),
         "location": event.get("location","Unknown"),
         "lat": event.get("lat"),
@@ -67,30 +159,198 @@ def save_event(event, risk, reasons, blocked, rotated, verified):
 
     reasons_text = "; ".join(reasons)
 
-    # ---------------------------------
-    # SAVE TO DATABASE
-    # ---------------------------------
-    conn = sqlite3.connect(DB_PATH)
-
-    conn.execute("""
-        INSERT INTO audit (
-            timestamp,
-            event,
-            risk,
-            reasons,
-            verified,
-            blocked,
-            credentials_rotated
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        timestamp,
-        json.dumps(safe_event),
-        risk,
-        reasons_text,
-        verified,
-        blocked,
-        rotated
-    ))
-
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    # typed columns + the JSON blob for older readers
+    row = dict(safe_event)
+    row["role_level"] = event.get("role_level")
+    row.update({
+        "timestamp": timestamp,
+        "event": json.dumps(safe_event),
+        "risk": risk,
+        "reasons": reasons_text,
+        "verified": verified,
+        "blocked": blocked,
+        "credentials_rotated": rotated,
+        "model_version": event.get("model_version"),
+    })
+
+    return row
+
+
+INSERT_COLUMNS = [
+    "timestamp", "event", "risk", "reasons", "verified", "blocked",
+    "credentials_rotated", "model_version", "user", "ip", "session_id",
+    "device", "location", "lat", "lon", "role", "login_hour",
+    "device_known", "location_known", "access_count", "role_level",
+]
+
+INSERT_AUDIT = "INSERT INTO audit ({}) VALUES ({})".format(
+    ", ".join(f'"{col}"' for col in INSERT_COLUMNS),
+    ", ".join(f":{col}" for col in INSERT_COLUMNS)
+)
+
+
+def write_rows(rows, tenant=None, checkpoint=None):
+    """
+    Insert prepared audit rows in ONE transaction.
+    checkpoint: optional (name, offset) stored in the same transaction.
+    """
+    if not rows and checkpoint is None:
+        return
+
+    t = perf_counter()
+    conn = audit_connection(tenant)
+    with conn:
+        conn.executemany(INSERT_AUDIT, rows)
+        update_rollups(conn, rows)
+        if checkpoint is not None:
+            conn.execute("INSERT OR REPLACE INTO ingest_checkpoint (name, position) VALUES (?, ?)", checkpoint)
+    # one sample per transaction (a single event or a whole batch)
+    lap("save", t)
+
+
+def read_checkpoint(name, tenant=None):
+    """
+    Offset stored with write_rows(checkpoint=(name, offset)), or 0.
+    """
+    row = audit_connection(tenant).execute(
+        "SELECT position FROM ingest_checkpoint WHERE name = ?", (name,)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+# =========================================
+# SAFE EVENT SAVER
+# =========================================
+def save_event(event, risk, reasons, blocked, rotated, verified):
+    write_rows([audit_row(event, risk, reasons, blocked, rotated, verified)], event.get("tenant"))
+
+
+def save_events(audits):
+    """
+    Save many events in a single transaction (one per tenant database).
+    audits: iterable of save_event() argument tuples.
+    """
+    write_tenant_rows((audit[0].get("tenant"), audit_row(*audit)) for audit in audits)
+
+
+def write_tenant_rows(items):
+    """
+    Write (tenant, row) pairs, one transaction per tenant database.
+    """
+    by_tenant = {}
+    for tenant, row in items:
+        by_tenant.setdefault(tenant, []).append(row)
+    for tenant, rows in by_tenant.items():
+        write_rows(rows, tenant)
+
+
+def release_audit_row(row_id, tenant=None):
+    """
+    Mark an audit row as no longer blocked, in the hot table or in its
+    archived partition. Returns: True when the row was found.
+    """
+    conn = audit_connection(tenant)
+    with conn:
+        if conn.execute("UPDATE audit SET blocked = 0 WHERE id = ?", (row_id,)).rowcount:
+            return True
+    return update_archived(conn, row_id, {"blocked": 0})
+
+
+# =========================================
+# INCREMENTAL FEED
+# =========================================
+FEED_COLUMNS = [
+    "id", "timestamp", "user", "ip", "session_id", "device", "location",
+    "lat", "lon", "role", "risk", "reasons", "verified", "blocked",
+    "credentials_rotated", "model_version",
+]
+
+FEED_SELECT = "SELECT {} FROM audit".format(", ".join(f'"{col}"' for col in FEED_COLUMNS))
+
+
+# Reads span the hot audit table and the archived day partitions
+# (app/archive.py); archives are only opened when a query reaches
+# back past the hot table.
+def fetch_audit_since(last_id=0, limit=1000, tenant=None):
+    """
+    Audit rows with id > last_id, oldest first, as tuples in FEED_COLUMNS order.
+    Callers keep the last id they saw and only pay for new rows.
+    """
+    conn = audit_connection(tenant)
+    rows = conn.execute(
+        FEED_SELECT + " WHERE id > ? ORDER BY id LIMIT ?",
+        (last_id, limit)
+    ).fetchall()
+
+    if last_id < archived_max_id(conn):
+        # backfilled days can archive ids above some hot ids, and days
+        # archived after a backfill interleave theirs: merge by id
+        archived = []
+        for df in read_archived(conn, FEED_COLUMNS, after_id=last_id):
+            archived += to_tuples(df.head(limit), FEED_COLUMNS)
+        rows = sorted(archived + rows, key=lambda row: row[0])[:limit]
+
+    return rows
+
+
+def fetch_audit_latest(limit=100, tenant=None):
+    """
+    The newest `limit` audit rows, oldest first (same shape as fetch_audit_since).
+    """
+    conn = audit_connection(tenant)
+    rows = conn.execute(
+        FEED_SELECT + " ORDER BY id DESC LIMIT ?",
+        (limit,)
+    ).fetchall()
+
+    # archived ids can be newer than hot ones (see fetch_audit_since)
+    oldest = rows[-1][0] if len(rows) >= limit else 0
+    if oldest < archived_max_id(conn):
+        archived = []
+        for df in read_archived(conn, FEED_COLUMNS, after_id=oldest):
+            archived += to_tuples(df.tail(limit), FEED_COLUMNS)
+        rows = sorted(archived + rows, key=lambda row: row[0], reverse=True)[:limit]
+
+    rows.reverse()
+    return rows
+
+
+def fetch_audit_range(start=None, end=None, columns=FEED_COLUMNS, tenant=None):
+    """
+    All audit rows with start <= timestamp < end (ISO strings, either
+    bound optional), oldest partition first, as tuples in `columns` order.
+    """
+    conn = audit_connection(tenant)
+    rows = []
+    for df in read_archived(conn, columns, start=start, end=end):
+        rows += to_tuples(df, columns)
+
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    select = ", ".join(f'"{col}"' for col in columns)
+
+    return rows + conn.execute(
+        f"SELECT {select} FROM audit{where} ORDER BY id", params
+    ).fetchall()
+
+
+def risk_trend(window, tenant=None, **filters):
+    """
+    Risk trend for the last `window` (timedelta) from the rollup tables;
+    see app.rollups.risk_trend for filters and row format.
+    """
+    return rollup_trend(audit_connection(tenant), window, **filters)
+
+
+def maintain_audit(tenant=None):
+    """
+    Compact old days into archives and apply retention
+    (see app/archive.py; config AUDIT_HOT_DAYS / AUDIT_RETENTION_DAYS).
+    """
+    return maintain(audit_connection(tenant), archive_dir=archive_dir(tenant))
@@ -0,0 +1,189 @@
+"""
+Per-tenant artifacts for multi-SME deployments.
+
+Events may carry a "tenant" id; events without one use the shared
+model, rules and audit database as before. A tenant exists once its
+directory does (create it to provision the tenant); events for any
+other tenant id are rejected. A tenant's files live in that directory:
+
+    tenants/<tenant>/isolation_forest.joblib   own model    (optional)
+    tenants/<tenant>/baseline_rules.json       own rules    (optional)
+    tenants/<tenant>/trustlens.db              own audit table
+    tenants/<tenant>/archive/                  own audit archives
+
+A tenant without its own model or rules scores with the shared ones;
+a tenant with only its own rules shares the shared model in memory.
+Registries are created on first use and kept in an LRU of
+TENANT_CACHE_SIZE tenants; an evicted tenant is reloaded from disk the
+next time one of its events arrives.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from app.behavior import UNKNOWN_KEYS
+from app.registry import ModelRegistry, RulesRegistry, registry as shared_registry
+from app.config import (
+    DB_PATH, MODEL_PATH, RULES_PATH, COMPILED_MODEL_PATH, SCORE_TABLE_PATH,
+    AUDIT_ARCHIVE_DIR, TENANTS_DIR, TENANT_CACHE_SIZE,
+)
+
+# letters, digits, "_", "-", "."; never a path
+TENANT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# tenants whose directory has been seen; directories are not removed live
+_provisioned = set()
+
+
+def tenant_id(event):
+    """
+    The event's tenant, or None for the shared deployment.
+    Raises ValueError for ids that are not safe directory names and
+    for tenants that have not been provisioned.
+    """
+    tenant = event.get("tenant")
+    if tenant in (None, ""):
+        return None
+    tenant = str(tenant)
+    if not TENANT_ID.match(tenant):
+        raise ValueError(f"Invalid tenant id: {tenant!r}")
+    if tenant not in _provisioned:
+        if not os.path.isdir(tenant_dir(tenant)):
+            raise ValueError(f"Unknown tenant: {tenant!r}")
+        _provisioned.add(tenant)
+    return tenant
+
+
+def scoped(tenant, key):
+    """
+    Key of a user, IP or session in state that all tenants share
+    (velocity windows, the blocklist), so one tenant's principals
+    never match another's.
+    """
+    if tenant is None or key in UNKNOWN_KEYS:
+        return key
+    return f"{tenant}:{key}"
+
+
+def tenant_dir(tenant):
+    return os.path.join(TENANTS_DIR, tenant)
+
+
+def own_path(tenant, shared_path):
+    """
+    The tenant's copy of a shared file (same file name, in its directory).
+    """
+    return os.path.join(tenant_dir(tenant), os.path.basename(shared_path))
+
+
+def db_path(tenant=None):
+    return DB_PATH if tenant is None else own_path(tenant, DB_PATH)
+
+
+def archive_dir(tenant=None):
+    return AUDIT_ARCHIVE_DIR if tenant is None else os.path.join(tenant_dir(tenant), "archive")
+
+
+def model_path(tenant=None):
+    if tenant is not None and os.path.exists(own_path(tenant, MODEL_PATH)):
+        return own_path(tenant, MODEL_PATH)
+    return MODEL_PATH
+
+
+def rules_path(tenant=None):
+    if tenant is not None and os.path.exists(own_path(tenant, RULES_PATH)):
+        return own_path(tenant, RULES_PATH)
+    return RULES_PATH
+
+
+def known_tenants():
+    """
+    Tenants with a directory under TENANTS_DIR.
+    """
+    if not os.path.isdir(TENANTS_DIR):
+        return []
+    return sorted(name for name in os.listdir(TENANTS_DIR)
+                  if TENANT_ID.match(name) and os.path.isdir(tenant_dir(name)))
+
+
+def new_registry(tenant):
+    model = model_path(tenant)
+    rules = rules_path(tenant)
+
+    if model == MODEL_PATH:
+        if rules == RULES_PATH:
+            return shared_registry
+        # own rules only: reuse the loaded shared model
+        return RulesRegistry(shared_registry, rules)
+
+    # compiled arrays / score table sit next to the model they came from
+    compiled, score_table = own_path(tenant, COMPILED_MODEL_PATH), own_path(tenant, SCORE_TABLE_PATH)
+    return ModelRegistry(model, rules, compiled_path=compiled, score_table_path=score_table)
+
+
+class TenantRegistries:
+    """
+    LRU of per-tenant registries (ModelRegistry, or RulesRegistry for
+    tenants with only their own rules).
+
+    get() is a dict lookup for tenants in the cache. A miss only builds
+    the registry; the model itself loads on its first current() call,
+    outside the lock. Which files a tenant uses is decided when its
+    registry is built: after adding or removing a tenant's model or
+    rules file, call forget() (or wait for the tenant to be evicted).
+    """
+
+    def __init__(self, maxsize=TENANT_CACHE_SIZE):
+        self.maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant=None):
+        if tenant is None:
+            return shared_registry
+
+        with self._lock:
+            registry = self._entries.get(tenant)
+            if registry is not None:
+                self._entries.move_to_end(tenant)
+                self.hits += 1
+                return registry
+
+            self.misses += 1
+            registry = self._entries[tenant] = new_registry(tenant)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return registry
+
+    def forget(self, tenant):
+        with self._lock:
+            self._entries.pop(tenant, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            own_models = sum(1 for registry in self._entries.values()
+                             if isinstance(registry, ModelRegistry) and registry is not shared_registry)
+            own_rules = sum(1 for registry in self._entries.values() if isinstance(registry, RulesRegistry))
+            return {
+                "size": len(self._entries),
+                "max_size": self.maxsize,
+                "own_models": own_models,
+                "own_rules": own_rules,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Process-wide tenant cache
+tenant_registries = TenantRegistries()
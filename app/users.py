@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import time
+from app.config import USERS_DB_PATH, USERS_POLL_INTERVAL
+
+
+class UserRegistry:
+    """
+    In-memory index of registered users.
+
+    The users table is loaded once into a set, so membership checks
+    cost no database I/O. Changes made by other processes (admin tools,
+    other workers) are picked up by polling PRAGMA data_version at most
+    once per poll interval; changes made through add_user()/remove_user()
+    apply immediately.
+    """
+
+    def __init__(self, path=USERS_DB_PATH, poll_interval=USERS_POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._users = frozenset()
+        self._conn = None
+        self._data_version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    # ---------------------------------
+    # CONNECTION
+    # ---------------------------------
+    def _connect(self):
+        if self._conn is None:
+            # data_version is per connection, so keep a dedicated one
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS users(username TEXT PRIMARY KEY)")
+            self._conn.commit()
+        return self._conn
+
+    # ---------------------------------
+    # LOADING
+    # ---------------------------------
+    def reload(self):
+        """
+        Explicit full reload of the users table.
+        """
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        conn = self._connect()
+        rows = conn.execute("SELECT username FROM users").fetchall()
+        self._users = frozenset(row[0] for row in rows)
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        self._next_check = time.monotonic() + self.poll_interval
+
+    def _maybe_refresh(self):
+        if time.monotonic() < self._next_check and self._data_version is not None:
+            return
+
+        with self._lock:
+            if self._data_version is None:
+                self._load()
+                return
+
+            if time.monotonic() < self._next_check:
+                return
+
+            version = self._connect().execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._load()
+            else:
+                self._next_check = time.monotonic() + self.poll_interval
+
+    # ---------------------------------
+    # LOOKUP
+    # ---------------------------------
+    def contains(self, username):
+        self._maybe_refresh()
+        return username in self._users
+
+    __contains__ = contains
+
+    def __len__(self):
+        self._maybe_refresh()
+        return len(self._users)
+
+    # ---------------------------------
+    # ADMIN CHANGES
+    # ---------------------------------
+    def add_user(self, username):
+        with self._lock:
+            if self._data_version is None:
+                self._load()
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO users(username) VALUES (?)", (username,))
+            self._users = self._users | {username}
+
+    def remove_user(self, username):
+        with self._lock:
+            if self._data_version is None:
+                self._load()
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM users WHERE username=?", (username,))
+            self._users = self._users - {username}
+
+
+registry = UserRegistry()
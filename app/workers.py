@@ -0,0 +1,250 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from app.config import SCORING_WORKERS, SCORING_MAX_BATCH, SCORING_MAX_WAIT_MS
+from app.engine import get_bundle, warm_up as warm_up_engine
+from app.main import stage_events, detect_groups, detect_separately, detect_batch, finish_events, warm_up
+from app.metrics import lap
+from app.pipeline import run_scoring
+from app.registry import RulesRegistry
+from app.tenants import tenant_registries
+
+
+class BundleMismatch(RuntimeError):
+    """
+    A worker could not load the model/rules version a batch was staged with.
+    """
+
+
+def _init_worker():
+    # workers only run the model: load it (in compiled mode the arrays
+    # are memory-mapped, so workers share them), but open no databases
+    warm_up_engine()
+
+
+# (tenant, version) a worker already reloaded for without reaching it
+_missed_versions = set()
+
+
+def _worker_bundle(tenant, version):
+    """
+    The tenant's bundle at the version the server staged with. The
+    server reloads (and re-resolves tenants' files) on its own, so on a
+    mismatch the worker rebuilds the tenant's registry and reloads it.
+    """
+    bundle = get_bundle(tenant)
+    if bundle.version == version:
+        return bundle
+
+    if (tenant, version) not in _missed_versions:
+        tenant_registries.forget(tenant)
+        registry = tenant_registries.get(tenant)
+        if isinstance(registry, RulesRegistry):
+            registry.base.reload()
+        bundle = registry.reload()
+        if bundle.version == version:
+            return bundle
+        # the server is behind the files: don't reload again for it
+        _missed_versions.add((tenant, version))
+
+    raise BundleMismatch(f"Worker has {bundle.version}, batch was staged with {version}")
+
+
+def _detect_groups(requests, versions):
+    return detect_groups(requests, {tenant: _worker_bundle(tenant, v) for tenant, v in versions.items()})
+
+
+def _detect_separately(requests, versions):
+    return detect_separately(requests, {tenant: _worker_bundle(tenant, v) for tenant, v in versions.items()})
+
+
+def _ping():
+    return os.getpid()
+
+
+def _context():
+    # fresh interpreters: a forked worker would inherit the server's
+    # SQLite connections, locks and background threads
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class ScoringPool:
+    """
+    Spreads CPU-bound scoring across worker processes.
+
+    Single events submitted from request handlers are collected into
+    micro-batches (up to max_batch events, or whatever arrived within
+    max_wait_ms). The server process stages each batch (velocity
+    features, blocklist, result cache), so that state and the metrics
+    stay in one place; a worker runs only the model, one
+    decision_function call per tenant. Several batches are in flight
+    at once, so every worker stays busy. When a micro-batch fails in
+    the model, its events are retried one by one and only the bad ones
+    fail.
+
+    Workers score with the bundle version the server staged with (the
+    one in the audit rows and cache keys), reloading to reach it; a
+    batch no worker can score that way is scored in the server.
+    """
+
+    def __init__(self, workers=SCORING_WORKERS, max_batch=SCORING_MAX_BATCH, max_wait_ms=SCORING_MAX_WAIT_MS):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.batches = 0
+        self.events = 0
+        self.mismatches = 0
+
+        self._pool = None
+        self._queue = None
+        self._collector = None
+        self._in_flight = None
+        self._tasks = set()
+
+    async def start(self):
+        # the server stages events: load model, rules and users here too
+        warm_up()
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=_context(),
+            initializer=_init_worker
+        )
+
+        # start every worker now, not on the first request
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)
+        ])
+
+        self._queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(self.workers * 2)
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    # ---------------------------------
+    # SUBMISSION
+    # ---------------------------------
+    async def submit(self, event):
+        """
+        Score one event. Returns: (result, audit)
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((event, future))
+        return await future
+
+    async def submit_batch(self, events):
+        """
+        Score a caller-built batch directly (one worker call per batch).
+        Raises like score_events() if any event fails.
+        Returns: list of (result, audit)
+        """
+        async with self._in_flight:
+            staged = await self._score(events, skip_errors=False)
+        self.batches += 1
+        self.events += len(events)
+        return staged.evaluated
+
+    async def _score(self, events, skip_errors):
+        staged = await run_scoring(stage_events, events, None, skip_errors)
+
+        detections = {}
+        if staged.misses:
+            t = perf_counter()
+            detections = await self._detect(staged, skip_errors)
+            lap("detect_batch", t)
+
+        await run_scoring(finish_events, staged, detections)
+        return staged
+
+    async def _detect(self, staged, skip_errors):
+        loop = asyncio.get_running_loop()
+        requests, versions = staged.requests(), staged.versions()
+        try:
+            try:
+                return await loop.run_in_executor(self._pool, _detect_groups, requests, versions)
+            except BundleMismatch:
+                raise
+            except Exception:
+                if not skip_errors:
+                    raise
+                return await loop.run_in_executor(self._pool, _detect_separately, requests, versions)
+        except BundleMismatch:
+            # the server's version is not the files' any more: score here
+            self.mismatches += 1
+            return await run_scoring(detect_batch, requests, staged.bundles, skip_errors)
+
+    # ---------------------------------
+    # MICRO-BATCHING
+    # ---------------------------------
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # give concurrent requests a moment to join the batch
+            if self._queue.empty() and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            await self._in_flight.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        events = [event for event, _ in batch]
+
+        try:
+            staged = await self._score(events, skip_errors=True)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            self._in_flight.release()
+
+        self.batches += 1
+        self.events += len(events)
+
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in staged.failed:
+                future.set_exception(staged.failed[i])
+            else:
+                future.set_result(staged.evaluated[i])
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "events": self.events,
+            "mismatches": self.mismatches,
+            "mean_batch": self.events / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,4 @@
+# Reproducible benchmarks for the scoring pipeline and storage layer.
+# Run from the project root:
+#   python -m benchmarks --events 1000 --save baseline.json
+#   python -m benchmarks --events 1000 --compare baseline.json
@@ -0,0 +1,172 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# ----------------------------
+# Project root on path (absolute: the benchmarks chdir into a workspace)
+# ----------------------------
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.harness import workspace, measure, environment, save_baseline, load_baseline, compare
+from benchmarks.workloads import build_events, load_demo_events, workload_users, batches, DEMO_EVENTS_PATH
+
+# ----------------------------
+# Scoring pipeline / storage / HTTP benchmarks
+# Run from the project root:
+#   python -m benchmarks [--events 1000] [--save baseline.json] [--compare baseline.json]
+# ----------------------------
+
+CASES = [
+    "sanitize",
+    "detect",
+    "detect_many",
+    "process_event",
+    "process_event_cached",
+    "process_events",
+    "save_event",
+    "http_analyze",
+    "http_analyze_batch",
+]
+
+# Every case starts from empty velocity state and an empty result
+# cache, which is off except in the *_cached cases (there it is filled
+# with the case's events first, so they measure cache hits).
+CACHED_CASES = {"process_event_cached"}
+
+
+def reset_state(case, events):
+    """
+    Same starting state for every case: no velocity history, and an
+    empty result cache (disabled unless the case is a cached one).
+    """
+    from app.behavior import store
+    from app.cache import result_cache
+    from app.config import RESULT_CACHE_SIZE
+    from app.main import score_event
+
+    store.clear()
+    result_cache.clear()
+    result_cache.maxsize = RESULT_CACHE_SIZE if case in CACHED_CASES else 0
+    if case in CACHED_CASES:
+        for event in events:
+            score_event(dict(event))
+        store.clear()
+
+
+def setup_cases(events, batch_size):
+    """
+    Build (fn, items, events_per_item) per case. Imported here, after
+    the workspace switch, so nothing touches the real databases.
+    """
+    from fastapi.testclient import TestClient
+    from app.privacy import sanitize
+    from app.engine import detect, detect_many, get_bundle
+    from app.main import prepare_event, score_event, process_event, process_events, warm_up
+    from app.storage import save_event
+    import api
+
+    warm_up()
+    bundle = get_bundle()
+
+    reset_state("setup", events)
+    prepared = [prepare_event(e) for e in events]
+    audits = [score_event(e)[1] for e in events]
+
+    client = TestClient(api.app)
+    client.__enter__()
+
+    def post(path):
+        def call(body):
+            response = client.post(path, json=body)
+            response.raise_for_status()
+        return call
+
+    return {
+        "sanitize": (sanitize, events, 1),
+        "detect": (lambda e: detect(e, bundle), prepared, 1),
+        "detect_many": (lambda b: detect_many(b, bundle), batches(prepared, batch_size), batch_size),
+        "process_event": (process_event, events, 1),
+        "process_event_cached": (process_event, events, 1),
+        "process_events": (process_events, batches(events, batch_size), batch_size),
+        "save_event": (lambda audit: save_event(*audit), audits, 1),
+        "http_analyze": (post("/analyze"), events, 1),
+        "http_analyze_batch": (post("/analyze/batch"), batches(events, batch_size), batch_size),
+    }, client
+
+
+def print_report(report):
+    print(f"{'case':<20} {'events/s':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'peak KiB':>9}")
+    for case, s in report["cases"].items():
+        print(
+            f"{case:<20} {s['throughput']:>10,.0f} {s['p50_ms']:>9.3f} {s['p90_ms']:>9.3f} "
+            f"{s['p99_ms']:>9.3f} {s['p99.9_ms']:>9.3f} {s['peak_kib']:>9,.0f}"
+        )
+
+
+def print_comparison(rows, threshold):
+    print(f"\nAgainst baseline (regression threshold {threshold:.0%}):")
+    print(f"{'case':<20} {'metric':<11} {'baseline':>12} {'current':>12} {'change':>8}")
+    for case, metric, old, new, change, regressed in rows:
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{case:<20} {metric:<11} {old:>12,.3f} {new:>12,.3f} {change:>+8.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scoring pipeline, storage and HTTP endpoints")
+    parser.add_argument("--events", type=int, default=1000, help="events per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--save", metavar="PATH", help="write the report as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed regression (fraction)")
+    args = parser.parse_args()
+
+    # resolve paths before leaving the caller's directory
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline = load_baseline(os.path.abspath(args.compare)) if args.compare else None
+    demo_events = load_demo_events(os.path.join(PROJECT_ROOT, DEMO_EVENTS_PATH))
+
+    workspace(PROJECT_ROOT, workload_users())
+
+    events = build_events(args.events, args.seed, demo_events=demo_events)
+    cases, client = setup_cases(events, args.batch_size)
+
+    report = {
+        "created": datetime.utcnow().isoformat(),
+        "config": {
+            "events": args.events,
+            "seed": args.seed,
+            "batch_size": args.batch_size,
+        },
+        "environment": environment(),
+        "cases": {},
+    }
+
+    for case in args.cases:
+        fn, items, weight = cases[case]
+        reset_state(case, events)
+        report["cases"][case] = measure(fn, items, weight=weight)
+
+    client.__exit__(None, None, None)
+
+    print_report(report)
+
+    if save_path:
+        save_baseline(save_path, report)
+        print(f"\nBaseline written to {save_path}")
+
+    if baseline is not None:
+        if baseline.get("config") != report["config"]:
+            print(f"\nWarning: baseline was run with {baseline.get('config')}, not {report['config']}")
+        rows = compare(baseline, report, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import atexit
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+# ----------------------------
+# Timing, memory and baselines
+# ----------------------------
+PERCENTILES = (50, 90, 99, 99.9)
+
+# peak memory is measured in a separate, shorter pass (tracemalloc
+# slows every allocation down, so it never runs during timing)
+MEMORY_SAMPLE = 200
+
+
+def workspace(project_root, users):
+    """
+    Switch into a throwaway working directory so the benchmarks never
+    touch the real audit, block list or users databases: models/ is
+    linked from the project, data/ starts empty and the users table
+    holds the workload users. Removed at interpreter exit.
+
+    Call before importing anything from app (their exit hooks must
+    run before the directory is removed).
+    """
+    path = tempfile.mkdtemp(prefix="trustlens-bench-")
+    atexit.register(shutil.rmtree, path, True)
+
+    models = os.path.join(project_root, "models")
+    try:
+        os.symlink(models, os.path.join(path, "models"), target_is_directory=True)
+    except OSError:
+        shutil.copytree(models, os.path.join(path, "models"))
+    os.makedirs(os.path.join(path, "data"))
+
+    conn = sqlite3.connect(os.path.join(path, "trustlensai.db"))
+    with conn:
+        conn.execute("CREATE TABLE users(username TEXT PRIMARY KEY)")
+        conn.executemany("INSERT INTO users VALUES (?)", [(u,) for u in users])
+    conn.close()
+
+    os.chdir(path)
+    return path
+
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, items, warmup=100, weight=1):
+    """
+    Call fn(item) for every item and time each call.
+    weight: events per item (batch size) for the throughput figure.
+    Returns: stats dict (latencies in ms, throughput in events/s).
+    """
+    for item in items[:warmup]:
+        fn(item)
+
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    stats = {
+        "calls": len(items),
+        "events_per_call": weight,
+        "throughput": len(items) * weight / elapsed,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+    for p in PERCENTILES:
+        stats[f"p{p:g}_ms"] = percentile(latencies, p) * 1000
+
+    stats["peak_kib"] = peak_memory(fn, items[:MEMORY_SAMPLE])
+    return stats
+
+
+def peak_memory(fn, items):
+    """
+    Peak traced Python allocation (KiB) while running fn over items.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        for item in items:
+            fn(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+# ----------------------------
+# Baselines
+# ----------------------------
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save_baseline(path, report):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.20):
+    """
+    Per-case changes against a baseline report.
+    A case regresses when throughput drops, or p50/p99 latency grows,
+    by more than threshold (a fraction).
+    Returns: list of (case, metric, old, new, change, regressed)
+    """
+    rows = []
+    for case, stats in current["cases"].items():
+        old_stats = baseline.get("cases", {}).get(case)
+        if old_stats is None:
+            continue
+        for metric, higher_is_better in (("throughput", True), ("p50_ms", False), ("p99_ms", False)):
+            old, new = old_stats.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = -change > threshold if higher_is_better else change > threshold
+            rows.append((case, metric, old, new, change, regressed))
+    return rows
@@ -0,0 +1,80 @@
+import json
+import random
+from dashboard.generators import (
+    KNOWN_DEVICES, KNOWN_LOCATIONS, USERNAMES,
+    generate_ip, normal_event, medium_event, high_event,
+)
+
+# ----------------------------
+# Synthetic workloads
+# ----------------------------
+# Same event shapes as the live demo, plus the sample event(s) in
+# data/demo_events.json. The same seed always yields the same events.
+
+DEMO_EVENTS_PATH = "data/demo_events.json"
+
+# (kind, weight)
+DEFAULT_MIX = [
+    ("normal", 0.50),
+    ("medium", 0.35),
+    ("high", 0.10),
+    ("demo", 0.05),
+]
+
+GENERATORS = {
+    "normal": normal_event,
+    "medium": medium_event,
+    "high": high_event,
+}
+
+# registered users in the benchmark workspace
+USER_COUNT = 200
+
+
+def load_demo_events(path=DEMO_EVENTS_PATH):
+    """
+    Events from the demo file (a single object or a list of objects).
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def workload_users():
+    return USERNAMES + [f"user{i:03d}" for i in range(USER_COUNT - len(USERNAMES))]
+
+
+def build_events(n, seed=0, mix=DEFAULT_MIX, demo_events=None):
+    """
+    n events drawn from the weighted mix, each with a registered user,
+    that user's usual IP, a known device and a known location.
+    """
+    rng = random.Random(seed)
+    users = workload_users()
+    home_ips = {user: generate_ip(rng) for user in users}
+    demo_events = demo_events or []
+
+    kinds = [kind for kind, _ in mix if kind != "demo" or demo_events]
+    weights = [weight for kind, weight in mix if kind in kinds]
+
+    events = []
+    for kind in rng.choices(kinds, weights, k=n):
+        if kind == "demo":
+            event = dict(rng.choice(demo_events))
+        else:
+            event = GENERATORS[kind](rng)
+
+        user = rng.choice(users)
+        event.update({
+            "user": user,
+            "ip": home_ips[user],
+            "device": rng.choice(KNOWN_DEVICES),
+            "location": rng.choice(KNOWN_LOCATIONS),
+        })
+        events.append(event)
+
+    return events
+
+
+def batches(events, size):
+    return [events[i:i + size] for i in range(0, len(events), size)]
@@ -1,11 +1,10 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
-import json
-import ast
 import sys
 import os
 import time
+from datetime import timedelta
 import pydeck as pdk
 
 # PATH FIX
@@ -13,9 +12,10 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from app.config import DB_PATH
-
-UNKNOWN = "Unknown"
+from app.storage import init_db, fetch_audit_latest, fetch_audit_since, risk_trend, release_audit_row, FEED_COLUMNS
+from app.blocklist import blocklist
+from dashboard.frames import build_display_frame, build_map_frame, explanations_markdown
+from dashboard.feed_client import FeedListener
 
 # ==========================
 # PAGE CONFIG
@@ -32,45 +32,99 @@ st.caption("AI-powered real-time cybersecurity protection for SMEs")
 # ==========================
 # HELPERS
 # ==========================
-def safe_parse_event(raw):
-    try:
-        return json.loads(raw)
-    except:
-        try:
-            return ast.literal_eval(raw)
-        except:
-            return {}
 
-def load_data():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        df = pd.read_sql(
-            "SELECT rowid AS id, * FROM audit ORDER BY rowid DESC LIMIT 100",
-            conn
-        )
-    except:
-        df = pd.DataFrame()
-    finally:
-        conn.close()
+FEED_DTYPES = {
+    "id": "int64",
+    "risk": "float64",
+    "lat": "float64",
+    "lon": "float64",
+    "verified": "int64",
+    "blocked": "int64",
+    "credentials_rotated": "int64",
+}
+
+def to_frame(rows):
+    df = pd.DataFrame.from_records(rows, columns=FEED_COLUMNS)
+    for col, dtype in FEED_DTYPES.items():
+        values = pd.to_numeric(df[col], errors="coerce")
+        if dtype == "int64":
+            values = values.fillna(0)
+        df[col] = values.astype(dtype)
     return df
 
-def safe_float(val):
+def load_data():
+    """
+    Incremental load: the first run reads the newest WINDOW rows,
+    later refreshes only fetch rows with a higher id and append them
+    to the cached frame in session state.
+    """
+    # typed audit columns; migrates older databases on first run
+    init_db()
+
+    cached = st.session_state.get("audit_df")
+
     try:
-        return float(val)
-    except:
-        return None
+        if cached is None or st.session_state.get("audit_window") != WINDOW:
+            cached = to_frame(fetch_audit_latest(WINDOW))
+        else:
+            last_id = int(cached["id"].iloc[-1]) if len(cached) else 0
+            new_rows = fetch_audit_since(last_id, WINDOW)
+            if len(new_rows) >= WINDOW:
+                # more new rows than the window holds: start over from the newest
+                cached = to_frame(fetch_audit_latest(WINDOW))
+            elif new_rows:
+                cached = pd.concat([cached, to_frame(new_rows)], ignore_index=True).tail(WINDOW)
+    except sqlite3.Error:
+        return pd.DataFrame()
+
+    st.session_state.audit_df = cached
+    st.session_state.audit_window = WINDOW
+
+    # newest first for display
+    return cached.iloc[::-1].reset_index(drop=True)
 
 # ==========================
-# AUTO REFRESH
+# LIVE UPDATES
 # ==========================
+# The API pushes every scored result on GET /feed (Server-Sent Events).
+# With the feed the page reruns only when new results arrive; without
+# it, it falls back to re-reading every `refresh` seconds.
+FEED_URL = os.getenv("TRUSTLENS_FEED_URL", "http://localhost:8000/feed")
+FEED_WAIT = 1.0   # seconds per wait; keeps widgets responsive
+
+rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+@st.cache_resource
+def feed_listener():
+    if not FEED_URL:
+        return None
+    listener = FeedListener(FEED_URL, api_key=os.getenv("TRUSTLENS_API_KEY"))
+    listener.start()
+    return listener
+
+def wait_for_updates(seen):
+    """
+    Block until the feed reports results newer than `seen`, then rerun.
+    """
+    status = st.sidebar.empty()
+    while True:
+        if listener is None or not listener.connected:
+            status.caption("🟡 Live feed unavailable – polling")
+            time.sleep(refresh)
+            rerun()
+
+        status.caption("🟢 Live feed connected")
+        if listener.wait(seen, FEED_WAIT) != seen:
+            rerun()
+
 refresh = st.sidebar.slider("Refresh interval (seconds)", 1, 10, 3)
+WINDOW = st.sidebar.select_slider("Rows shown", [100, 500, 1000, 5000, 20000], 100)
+MAX_UNBLOCK_BUTTONS = 50
 
-if "last_refresh" not in st.session_state:
-    st.session_state.last_refresh = time.time()
+listener = feed_listener()
 
-if time.time() - st.session_state.last_refresh > refresh:
-    st.session_state.last_refresh = time.time()
-    st.experimental_rerun()
+# taken before loading, so results arriving meanwhile trigger a rerun
+seen_version = listener.version if listener is not None else 0
 
 # ==========================
 # LOAD EVENTS
@@ -79,55 +133,13 @@ df = load_data()
 
 if df.empty:
     st.info("No events received yet from SME systems.")
-    st.stop()
+    wait_for_updates(seen_version)
 
 # ==========================
 # BUILD TABLE
 # ==========================
-rows = []
-map_points = []
-
-for _, r in df.iterrows():
-
-    e = safe_parse_event(r.get("event", "{}"))
-
-    username = e.get("user") or UNKNOWN
-    ip_address = e.get("ip") or UNKNOWN
-    device_name = e.get("device") or UNKNOWN
-    location_name = e.get("location") or UNKNOWN
-    role_name = e.get("role") or UNKNOWN
-    session_id = e.get("session_id") or UNKNOWN
-
-    lat = safe_float(e.get("lat"))
-    lon = safe_float(e.get("lon"))
-
-    risk_value = int(r.get("risk", 0))
-    reasons_text = r.get("reasons") or "Normal login activity detected"
-
-    if lat is not None and lon is not None:
-        map_points.append({
-            "lat": lat,
-            "lon": lon,
-            "risk": risk_value
-        })
-
-    rows.append({
-        "RowID": r["id"],
-        "Time": r.get("timestamp", UNKNOWN),
-        "User": username,
-        "IP": ip_address,
-        "Session": session_id,
-        "Device": device_name,
-        "Location": location_name,
-        "Role": role_name,
-        "Risk (%)": risk_value,
-        "Reasons": reasons_text,
-        "Verified": "✅" if r.get("verified", 0) else "❌",
-        "Blocked": "🔴 Yes" if r.get("blocked", 0) else "🟢 No",
-        "Rotated": "🔄 Yes" if r.get("credentials_rotated", 0) else "No"
-    })
-
-display_df = pd.DataFrame(rows)
+display_df = build_display_frame(df)
+map_df = build_map_frame(df)
 
 # ==========================
 # DISPLAY TABLE
@@ -150,23 +162,25 @@ if blocked_rows.empty:
     st.success("No active blocks. System secure.")
 else:
 
-    for row in blocked_rows.itertuples(index=False):
+    # one button per blocked row; keep the page responsive on big windows
+    for row in blocked_rows.head(MAX_UNBLOCK_BUTTONS).itertuples(index=False):
 
         rid = row.RowID
         sid = row.Session
 
         if st.button(f"🟡 Unblock session {sid}", key=f"unblock_{rid}"):
 
-            conn = sqlite3.connect(DB_PATH)
-            conn.execute(
-                "UPDATE audit SET blocked=0 WHERE rowid=?",
-                (rid,)
-            )
-            conn.commit()
-            conn.close()
+            release_audit_row(int(rid))
+
+            # release the session server-side; workers pick it up on their next sync
+            blocklist.unblock("session", sid)
+
+            # cached rows are not re-read; update the copy too
+            audit_df = st.session_state.audit_df
+            audit_df.loc[audit_df["id"] == rid, "blocked"] = 0
 
             st.success(f"Session {sid} released")
-            st.experimental_rerun()
+            rerun()
 
 # ==========================
 # RISK TREND
@@ -174,7 +188,25 @@ else:
 st.divider()
 st.subheader("📈 Risk Trend")
 
-st.line_chart(df["risk"])
+TREND_WINDOWS = {
+    "Last hour": timedelta(hours=1),
+    "Last 24 hours": timedelta(days=1),
+    "Last 7 days": timedelta(days=7),
+    "Last 30 days": timedelta(days=30),
+    "Last year": timedelta(days=365),
+}
+
+trend_label = st.selectbox("Window", list(TREND_WINDOWS), index=1)
+
+# pre-aggregated rollups: cost does not grow with the window
+granularity, trend = risk_trend(TREND_WINDOWS[trend_label])
+
+if trend:
+    trend_df = pd.DataFrame(trend).set_index("bucket")
+    st.caption(f"Per-{granularity} mean and max risk, {int(trend_df['count'].sum())} events")
+    st.line_chart(trend_df[["mean_risk", "max_risk"]])
+else:
+    st.info("No events in this window.")
 
 # ==========================
 # GLOBAL CYBER HEATMAP
@@ -182,9 +214,7 @@ st.line_chart(df["risk"])
 st.divider()
 st.subheader("🌍 Global Cyber Activity")
 
-if map_points:
-
-    map_df = pd.DataFrame(map_points)
+if not map_df.empty:
 
     if len(map_df) >= 3:
         # Heatmap for many events
@@ -229,9 +259,9 @@ else:
 st.divider()
 st.subheader("🧠 Risk Explanations")
 
-for _, r in display_df.iterrows():
+st.markdown(explanations_markdown(display_df))
 
-    st.markdown(
-        f"**{r['Time']} – User: {r['User']} – Risk: {r['Risk (%)']}%**  \n"
-        f"Reasons: {r['Reasons']}"
-    )
\ No newline at end of file
+# ==========================
+# WAIT FOR NEW EVENTS
+# ==========================
+wait_for_updates(seen_version)
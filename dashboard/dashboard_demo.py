@@ -4,8 +4,6 @@ import streamlit as st
 import pandas as pd
 import random
 import time
-import string
-from datetime import datetime
 
 # -------------------------------------------------
 # Ensure project root on path
@@ -15,6 +13,15 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from app.main import process_event
+from app.engine import configure
+from dashboard.generators import (
+    KNOWN_DEVICES, KNOWN_LOCATIONS, ROLE_MAP, USERNAMES, UNKNOWN,
+    generate_ip, generate_session, access_time,
+    normal_event, medium_event, high_event,
+)
+
+# demo keeps the score jitter and occasional soft-threat flags
+configure(deterministic=False)
 
 
 # -------------------------------------------------
@@ -37,87 +44,6 @@ num_events = st.sidebar.slider("Events per refresh", 5, 50, 10)
 refresh_rate = st.sidebar.slider("Refresh interval (seconds)", 1, 10, 5)
 
 
-# -------------------------------------------------
-# Known data pools (realistic)
-# -------------------------------------------------
-KNOWN_DEVICES = [
-    "Dell Latitude 7420",
-    "HP EliteBook 840",
-    "Lenovo ThinkPad X1",
-    "MacBook Pro 14”"
-]
-
-KNOWN_LOCATIONS = [
-    "Nairobi, Kenya",
-    "Mombasa, Kenya",
-    "Kisumu, Kenya",
-    "Kampala, Uganda"
-]
-
-ROLE_MAP = {
-    1: "Employee",
-    2: "Manager",
-    3: "Administrator"
-}
-
-USERNAMES = [
-    "alice.k", "bob.m", "charlie.t", "diana.s", "edward.l", "fiona.w"
-]
-
-UNKNOWN = "Unknown"
-
-
-# -------------------------------------------------
-# Helper functions
-# -------------------------------------------------
-def generate_ip():
-    return ".".join(str(random.randint(1, 254)) for _ in range(4))
-
-
-def generate_session():
-    return "".join(random.choices(string.ascii_letters + string.digits, k=16))
-
-
-def access_time(hour):
-    now = datetime.now()
-    return now.replace(hour=hour,
-                       minute=random.randint(0, 59),
-                       second=random.randint(0, 59)).strftime("%Y-%m-%d %H:%M:%S")
-
-
-# -------------------------------------------------
-# Event Types
-# -------------------------------------------------
-def normal_event():
-    return {
-        "login_hour": random.randint(8, 18),
-        "device_known": 1,
-        "location_known": 1,
-        "access_count": random.randint(1, 5),
-        "role_level": 1
-    }
-
-
-def medium_event():
-    return {
-        "login_hour": random.choice([6, 7, 19, 20]),
-        "device_known": 1,
-        "location_known": 1,
-        "access_count": random.randint(6, 12),
-        "role_level": random.choice([1, 2])
-    }
-
-
-def high_event():
-    return {
-        "login_hour": random.choice([0, 1, 2, 3, 22, 23]),
-        "device_known": 1,
-        "location_known": 1,
-        "access_count": random.randint(15, 30),
-        "role_level": 0
-    }
-
-
 # -------------------------------------------------
 # Session state
 # -------------------------------------------------
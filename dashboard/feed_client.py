@@ -0,0 +1,78 @@
+import threading
+import time
+import urllib.request
+
+# -------------------------------------------------
+# Live feed listener for the dashboard.
+# Follows the API's Server-Sent Events stream (GET /feed) in a
+# background thread and bumps a version counter for every new
+# result, so the page only reloads when something changed.
+# Reconnects with the last seen id, so nothing is missed.
+# -------------------------------------------------
+
+READ_TIMEOUT = 30.0   # longer than the server keep-alive interval
+
+
+class FeedListener(threading.Thread):
+
+    def __init__(self, url, api_key=None, retry=2.0):
+        super().__init__(name="feed-listener", daemon=True)
+        self.url = url
+        self.api_key = api_key
+        self.retry = retry
+
+        self.version = 0
+        self.last_id = None
+        self.connected = False
+        self.error = None
+
+        self._changed = threading.Condition()
+
+    def run(self):
+        while True:
+            try:
+                self._follow()
+            except OSError as exc:
+                self.error = str(exc)
+            self.connected = False
+            time.sleep(self.retry)
+
+    def _follow(self):
+        headers = {"Accept": "text/event-stream"}
+        if self.api_key:
+            headers["x-api-key"] = self.api_key
+        if self.last_id is not None:
+            headers["Last-Event-ID"] = str(self.last_id)
+
+        request = urllib.request.Request(self.url, headers=headers)
+        with urllib.request.urlopen(request, timeout=READ_TIMEOUT) as response:
+            self.connected = True
+            self.error = None
+
+            kind = None
+            for raw in response:
+                line = raw.decode("utf-8").rstrip("\r\n")
+
+                if line.startswith("id:"):
+                    self.last_id = int(line[3:].strip())
+                elif line.startswith("event:"):
+                    kind = line[6:].strip()
+                elif not line:
+                    # end of one event; "gap" also means reload
+                    if kind in ("result", "gap"):
+                        self._bump()
+                    kind = None
+
+    def _bump(self):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, seen, timeout):
+        """
+        Block until version differs from seen or timeout elapses.
+        Returns: the current version.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != seen, timeout)
+            return self.version
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+UNKNOWN = "Unknown"
+
+NORMAL_REASON = "Normal login activity detected"
+
+TEXT_COLUMNS = {
+    "User": "user",
+    "IP": "ip",
+    "Session": "session_id",
+    "Device": "device",
+    "Location": "location",
+    "Role": "role",
+}
+
+
+# ==========================
+# COLUMNAR TABLE BUILDERS
+# ==========================
+# Pure pandas (no Streamlit) so they can be benchmarked and reused.
+
+def text_or_unknown(series):
+    # None, NaN and "" all display as Unknown
+    return series.where(series.notna() & (series.astype(str) != ""), UNKNOWN).astype(str)
+
+
+def flag_column(series, yes, no):
+    return np.where(series.fillna(0).astype(bool), yes, no)
+
+
+def build_display_frame(df):
+    """
+    Audit frame (typed feed columns) -> dashboard table, in one pass per column.
+    """
+    out = pd.DataFrame({"RowID": df["id"].to_numpy()})
+
+    out["Time"] = text_or_unknown(df["timestamp"]).to_numpy()
+
+    for label, col in TEXT_COLUMNS.items():
+        out[label] = text_or_unknown(df[col]).to_numpy()
+
+    out["Risk (%)"] = df["risk"].fillna(0).astype(int).to_numpy()
+
+    reasons = df["reasons"]
+    out["Reasons"] = reasons.where(reasons.notna() & (reasons != ""), NORMAL_REASON).to_numpy()
+
+    out["Verified"] = flag_column(df["verified"], "✅", "❌")
+    out["Blocked"] = flag_column(df["blocked"], "🔴 Yes", "🟢 No")
+    out["Rotated"] = flag_column(df["credentials_rotated"], "🔄 Yes", "No")
+
+    return out
+
+
+def build_map_frame(df):
+    """
+    Rows with usable coordinates -> lat/lon/risk frame for pydeck.
+    """
+    lat = pd.to_numeric(df["lat"], errors="coerce")
+    lon = pd.to_numeric(df["lon"], errors="coerce")
+    valid = lat.notna() & lon.notna()
+
+    return pd.DataFrame({
+        "lat": lat[valid].to_numpy(),
+        "lon": lon[valid].to_numpy(),
+        "risk": df["risk"][valid].fillna(0).astype(int).to_numpy(),
+    })
+
+
+def explanations_markdown(display_df):
+    """
+    All risk explanations as one markdown string (one st.markdown call).
+    """
+    if display_df.empty:
+        return ""
+
+    lines = (
+        "**" + display_df["Time"] + " – User: " + display_df["User"]
+        + " – Risk: " + display_df["Risk (%)"].astype(str) + "%**  \n"
+        + "Reasons: " + display_df["Reasons"]
+    )
+    return "\n\n".join(lines)
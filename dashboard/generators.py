@@ -0,0 +1,89 @@
+import random
+import string
+from datetime import datetime
+
+# -------------------------------------------------
+# Synthetic SME events for the live demo and the benchmarks.
+# No streamlit here, so the generators can be imported anywhere.
+# Every generator takes an optional random.Random for seeded runs.
+# -------------------------------------------------
+
+# -------------------------------------------------
+# Known data pools (realistic)
+# -------------------------------------------------
+KNOWN_DEVICES = [
+    "Dell Latitude 7420",
+    "HP EliteBook 840",
+    "Lenovo ThinkPad X1",
+    "MacBook Pro 14”"
+]
+
+KNOWN_LOCATIONS = [
+    "Nairobi, Kenya",
+    "Mombasa, Kenya",
+    "Kisumu, Kenya",
+    "Kampala, Uganda"
+]
+
+ROLE_MAP = {
+    1: "Employee",
+    2: "Manager",
+    3: "Administrator"
+}
+
+USERNAMES = [
+    "alice.k", "bob.m", "charlie.t", "diana.s", "edward.l", "fiona.w"
+]
+
+UNKNOWN = "Unknown"
+
+
+# -------------------------------------------------
+# Helper functions
+# -------------------------------------------------
+def generate_ip(rng=random):
+    return ".".join(str(rng.randint(1, 254)) for _ in range(4))
+
+
+def generate_session(rng=random):
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=16))
+
+
+def access_time(hour, rng=random):
+    now = datetime.now()
+    return now.replace(hour=hour,
+                       minute=rng.randint(0, 59),
+                       second=rng.randint(0, 59)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# -------------------------------------------------
+# Event Types
+# -------------------------------------------------
+def normal_event(rng=random):
+    return {
+        "login_hour": rng.randint(8, 18),
+        "device_known": 1,
+        "location_known": 1,
+        "access_count": rng.randint(1, 5),
+        "role_level": 1
+    }
+
+
+def medium_event(rng=random):
+    return {
+        "login_hour": rng.choice([6, 7, 19, 20]),
+        "device_known": 1,
+        "location_known": 1,
+        "access_count": rng.randint(6, 12),
+        "role_level": rng.choice([1, 2])
+    }
+
+
+def high_event(rng=random):
+    return {
+        "login_hour": rng.choice([0, 1, 2, 3, 22, 23]),
+        "device_known": 1,
+        "location_known": 1,
+        "access_count": rng.randint(15, 30),
+        "role_level": 0
+    }
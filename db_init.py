@@ -1,23 +1,16 @@
 import sqlite3
 import os
 
+from app.migrations import migrate
+
 DB_PATH = os.path.join("data", "trustlens.db")
 
 conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
 
-# Create audit table with all needed columns if it doesn't exist
-cur.execute("""
-CREATE TABLE IF NOT EXISTS audit (
-    event TEXT,
-    risk REAL,
-    blocked INTEGER DEFAULT 0,
-    credentials_rotated INTEGER DEFAULT 0,
-    verified INTEGER DEFAULT 0
-)
-""")
+# Create the audit table, or migrate an older layout, to the typed
+# schema shared with app/storage.py (see app/migrations.py)
+migrate(conn)
 
-conn.commit()
 conn.close()
 
-print(f"Database initialized at {DB_PATH}")
\ No newline at end of file
+print(f"Database initialized at {DB_PATH}")
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import joblib
+import numpy as np
+
+# ----------------------------
+# Project root on path
+# ----------------------------
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.config import MODEL_PATH
+from app.forest import CompiledForest
+
+# ----------------------------
+# sklearn vs compiled forest
+# Run from the project root:
+#   python scripts/bench_forest.py
+# ----------------------------
+model = joblib.load(MODEL_PATH)
+
+start = time.perf_counter()
+compiled = CompiledForest.from_model(model)
+compile_ms = (time.perf_counter() - start) * 1000
+
+rng = np.random.default_rng(0)
+X = np.column_stack([
+    rng.integers(0, 24, 10000),   # login_hour
+    rng.integers(0, 2, 10000),    # device_known
+    rng.integers(0, 2, 10000),    # location_known
+    rng.integers(0, 60, 10000),   # access_count
+    rng.integers(0, 4, 10000)     # role_level
+])
+
+# ----------------------------
+# Correctness
+# ----------------------------
+max_diff = np.abs(model.decision_function(X) - compiled.decision_function(X)).max()
+
+
+def per_call_us(scorer, rows, repeat):
+    scorer.decision_function(rows)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        scorer.decision_function(rows)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+print(f"Trees: {len(model.estimators_)}  nodes: {len(compiled.feature)}  max depth: {compiled.max_depth}")
+print(f"Compile time: {compile_ms:.1f} ms")
+print(f"Max |sklearn - compiled|: {max_diff:.3e}")
+print()
+print(f"{'batch':>8} {'sklearn (us)':>14} {'compiled (us)':>14} {'speedup':>9}")
+
+for batch, repeat in [(1, 200), (10, 200), (100, 50), (1000, 10), (10000, 3)]:
+    rows = X[:batch]
+    sk = per_call_us(model, rows, repeat)
+    cf = per_call_us(compiled, rows, repeat)
+    print(f"{batch:>8} {sk:>14.1f} {cf:>14.1f} {sk / cf:>8.1f}x")
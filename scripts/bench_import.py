@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+# ----------------------------
+# Import / startup cost of the engine
+# Each case runs in a fresh interpreter from the project root:
+#   python scripts/bench_import.py
+# ----------------------------
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+RUNS = 5
+
+CASES = [
+    ("import app.main", "import app.main"),
+    ("import + warm_up()", "import app.main; app.main.warm_up()"),
+    ("import + first event", "import app.main; app.main.score_event({'user': 'bench'})"),
+]
+
+TEMPLATE = """
+import time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def run_case(code):
+    out = subprocess.run(
+        [sys.executable, "-c", TEMPLATE.format(code=code)],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def sklearn_imported(code):
+    out = subprocess.run(
+        [sys.executable, "-c", f"import sys, warnings; warnings.simplefilter('ignore'); {code}; print('sklearn' in sys.modules)"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return out.stdout.strip().splitlines()[-1]
+
+
+print(f"{'case':<24} {'best (ms)':>10} {'median (ms)':>12} {'sklearn loaded':>15}")
+
+for name, code in CASES:
+    times = sorted(run_case(code) * 1000 for _ in range(RUNS))
+    print(f"{name:<24} {times[0]:>10.1f} {times[len(times) // 2]:>12.1f} {sklearn_imported(code):>15}")
@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# ----------------------------
+# Project root on path
+# ----------------------------
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.main import score_event
+from app.pipeline import run_scoring
+from app.workers import ScoringPool
+
+# ----------------------------
+# Scoring throughput vs worker count
+# Run from the project root:
+#   python scripts/loadtest.py --workers 0 1 2 4 --requests 5000 --concurrency 64
+# 0 workers = the default thread-pool path.
+# ----------------------------
+
+
+def random_event():
+    return {
+        "user": random.choice(["alice.k", "bob.m", "charlie.t"]),
+        "login_hour": random.randint(0, 23),
+        "device_known": random.randint(0, 1),
+        "location_known": random.randint(0, 1),
+        "access_count": random.randint(1, 40),
+        "role_level": random.randint(0, 3),
+    }
+
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run(workers, requests, concurrency, max_batch, max_wait_ms):
+    pool = None
+    if workers > 0:
+        pool = ScoringPool(workers, max_batch, max_wait_ms)
+        await pool.start()
+
+    async def score(event):
+        if pool is not None:
+            return await pool.submit(event)
+        return await run_scoring(score_event, event)
+
+    events = [random_event() for _ in range(requests)]
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(event):
+        async with gate:
+            start = time.perf_counter()
+            await score(event)
+            latencies.append(time.perf_counter() - start)
+
+    # warm up
+    await asyncio.gather(*[one(e) for e in events[:concurrency]])
+    latencies.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(e) for e in events])
+    elapsed = time.perf_counter() - start
+
+    stats = pool.stats() if pool is not None else {}
+    if pool is not None:
+        await pool.stop()
+
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_batch": stats.get("mean_batch", 1.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the scoring path at several worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'events/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'mean batch':>11}")
+
+    for workers in args.workers:
+        result = asyncio.run(run(workers, args.requests, args.concurrency, args.max_batch, args.max_wait_ms))
+        print(
+            f"{workers:>8} {result['throughput']:>10,.0f} {result['p50_ms']:>10.2f} "
+            f"{result['p99_ms']:>10.2f} {result['mean_batch']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
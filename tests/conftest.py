@@ -0,0 +1,77 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# ----------------------------
+# Throwaway working directory
+# ----------------------------
+# Config paths are relative (models/, data/, trustlensai.db), so the
+# tests run in a temporary copy of models/ with empty databases and
+# never touch the real ones. This must happen before app is imported.
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+USERS = ["alice", "bob", "carol", "dave"]
+
+WORKSPACE = tempfile.mkdtemp(prefix="trustlens-tests-")
+shutil.copytree(
+    os.path.join(PROJECT_ROOT, "models"), os.path.join(WORKSPACE, "models"),
+    ignore=shutil.ignore_patterns("*.compiled.joblib", "*.scores.npz", "*.candidate.*", "*.previous.*")
+)
+os.makedirs(os.path.join(WORKSPACE, "data"))
+
+_conn = sqlite3.connect(os.path.join(WORKSPACE, "trustlensai.db"))
+with _conn:
+    _conn.execute("CREATE TABLE users(username TEXT PRIMARY KEY)")
+    _conn.executemany("INSERT INTO users VALUES (?)", [(u,) for u in USERS])
+_conn.close()
+
+os.chdir(WORKSPACE)
+
+
+def pytest_unconfigure(config):
+    os.chdir(PROJECT_ROOT)
+    shutil.rmtree(WORKSPACE, ignore_errors=True)
+
+
+def reset_state():
+    from app.behavior import store
+    from app.cache import result_cache
+
+    with store._lock:
+        store.users.clear()
+        store.ips.clear()
+    result_cache.clear()
+
+
+@pytest.fixture
+def fresh_state():
+    """
+    Empty velocity state and result cache, so each test scores from
+    scratch. Call the returned function to reset again mid-test.
+    """
+    reset_state()
+    yield reset_state
+    reset_state()
+
+
+@pytest.fixture
+def model_files(fresh_state):
+    """
+    Restore the shipped model and rules (and the registry) afterwards.
+    """
+    from app.config import MODEL_PATH, RULES_PATH
+    from app.registry import registry
+
+    saved = {path: path + ".saved" for path in (MODEL_PATH, RULES_PATH)}
+    for path, backup in saved.items():
+        shutil.copy2(path, backup)
+    yield
+    for path, backup in saved.items():
+        os.replace(backup, path)
+    registry.reload()
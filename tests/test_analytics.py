@@ -0,0 +1,131 @@
+import csv
+import io
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from app.analytics import Query, connect, query_records, records, run, stream
+from app.archive import compact, init_archive, partitions
+from app.migrations import migrate
+from app.rollups import init_rollups, update_rollups
+from app.storage import INSERT_AUDIT, audit_row
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+# two archived days and one hot day
+DAYS = [NOW - timedelta(days=9), NOW - timedelta(days=4), NOW]
+
+
+def make_rows(n=30):
+    return [
+        audit_row(
+            {"user": f"user{i % 4}", "location": ["Nairobi", "Lagos"][i % 2],
+             "timestamp": (DAYS[i % 3] + timedelta(minutes=i)).isoformat()},
+            (i * 17) % 100, [], int(i % 3 == 0), 0, 1
+        )
+        for i in range(n)
+    ]
+
+
+def make_audit_db(path, rows):
+    conn = sqlite3.connect(str(path))
+    migrate(conn)
+    init_rollups(conn)
+    with conn:
+        conn.executemany(INSERT_AUDIT, rows)
+        update_rollups(conn, rows)
+    return conn
+
+
+@pytest.fixture
+def history(tmp_path):
+    """
+    An audit database with days archived (gzip JSON lines) and a hot day.
+    """
+    rows = make_rows()
+    path = tmp_path / "audit.db"
+    conn = make_audit_db(path, rows)
+    init_archive(conn)
+    compact(conn, hot_days=3, archive_dir=str(tmp_path / "archive"), fmt="jsonl.gz", now=NOW)
+    assert len(partitions(conn)) == 2
+    conn.close()
+    return str(path), rows
+
+
+@pytest.mark.parametrize("spec", [
+    ["user"],
+    {"select": "*"},
+    {"filters": {"password": "x"}},
+    {"group_by": ["weekday"]},
+    {"metrics": ["median_risk"]},
+    {"group_by": ["user"], "order_by": "location"},
+    {"limit": -1},
+    {"columns": ["event"]},
+])
+def test_bad_queries_are_rejected(spec):
+    with pytest.raises(ValueError):
+        Query.from_dict(spec)
+
+
+def test_aggregates_span_hot_and_archived_rows_in_chunks(history):
+    path, rows = history
+    query = Query.from_dict({"group_by": ["user"], "metrics": ["count", "blocked", "max_risk", "mean_risk"]})
+
+    conn = connect(path)
+    try:
+        result = {r["user"]: r for r in records(run(conn, query, chunk_size=4))}
+    finally:
+        conn.close()
+
+    for user in {r["user"] for r in rows}:
+        mine = [r for r in rows if r["user"] == user]
+        assert result[user]["count"] == len(mine)
+        assert result[user]["blocked"] == sum(r["blocked"] for r in mine)
+        assert result[user]["max_risk"] == max(r["risk"] for r in mine)
+        assert result[user]["mean_risk"] == pytest.approx(sum(r["risk"] for r in mine) / len(mine))
+
+
+def test_top_k_with_filters(history):
+    path, rows = history
+    query = Query.from_dict({
+        "filters": {"location": "Lagos", "min_risk": 20},
+        "group_by": ["user"], "metrics": ["count"], "limit": 1,
+    })
+    picked = [r["user"] for r in rows if r["location"] == "Lagos" and r["risk"] >= 20]
+    top = max(set(picked), key=picked.count)
+
+    assert query_records(query, path) == [{"user": top, "count": picked.count(top)}]
+
+
+def test_csv_export_streams_every_row_once(history):
+    path, rows = history
+    query = Query.from_dict({"columns": ["user", "risk"], "start": DAYS[1].isoformat()})
+
+    chunks = list(stream(query, "csv", path, chunk_size=4))
+    exported = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert len(chunks) > 1
+    assert len(exported) == sum(1 for r in rows if r["timestamp"] >= DAYS[1].isoformat())
+
+
+def test_arrow_stream_matches_json(history):
+    pa = pytest.importorskip("pyarrow")
+    path, _ = history
+    query = Query.from_dict({"group_by": ["day"], "metrics": ["count", "sum_risk"]})
+
+    data = b"".join(stream(query, "arrow", path, chunk_size=2))
+    table = pa.ipc.open_stream(data).read_all()
+    assert table.to_pylist() == query_records(query, path)
+
+
+def test_databases_the_server_never_opened(tmp_path):
+    # db_init.py's layout: no archive manifest, no typed columns yet
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(str(path))
+    with conn:
+        conn.execute("CREATE TABLE audit (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, event TEXT, risk REAL)")
+        conn.execute("""INSERT INTO audit (timestamp, event, risk) VALUES ('2026-03-01', '{"user": "andrew"}', 50)""")
+    conn.close()
+
+    query = Query.from_dict({"group_by": ["user"]})
+    assert query_records(query, str(path)) == [{"user": "andrew", "count": 1}]
+    assert query_records(query, str(tmp_path / "new.db")) == []
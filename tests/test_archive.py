@@ -0,0 +1,105 @@
+import os
+from datetime import timedelta
+
+from app.archive import apply_retention, compact, init_archive, maintain, partitions, read_archived, update_archived
+from app.storage import (
+    FEED_COLUMNS, audit_connection, fetch_audit_latest, fetch_audit_range, fetch_audit_since, write_rows,
+)
+from app.tenants import archive_dir, tenant_dir
+from tests.test_analytics import DAYS, NOW, make_audit_db, make_rows
+
+
+def archived_db(tmp_path):
+    conn = make_audit_db(tmp_path / "audit.db", make_rows())
+    init_archive(conn)
+    moved = compact(conn, hot_days=3, archive_dir=str(tmp_path / "archive"), fmt="jsonl.gz", now=NOW)
+    return conn, moved
+
+
+def ids(conn, table="audit"):
+    return [row[0] for row in conn.execute(f"SELECT id FROM {table} ORDER BY id")]
+
+
+def archived_ids(conn):
+    return sorted(int(i) for df in read_archived(conn, ["id"]) for i in df["id"])
+
+
+def test_compaction_moves_old_days(tmp_path):
+    conn, moved = archived_db(tmp_path)
+
+    days = [DAYS[0].strftime("%Y-%m-%d"), DAYS[1].strftime("%Y-%m-%d")]
+    assert moved == [(days[0], 10), (days[1], 10)]
+    assert [p[0] for p in partitions(conn)] == days
+    assert all(os.path.exists(p[1]) for p in partitions(conn))
+
+    # every row is in exactly one place
+    hot = ids(conn)
+    assert len(hot) == 10 and sorted(hot + archived_ids(conn)) == list(range(1, 31))
+    # nothing left to do on a second run
+    assert compact(conn, hot_days=3, archive_dir=str(tmp_path / "archive"), fmt="jsonl.gz", now=NOW) == []
+
+
+def test_late_rows_are_merged_into_their_partition(tmp_path):
+    conn, _ = archived_db(tmp_path)
+    day, path, *_ = partitions(conn)[0]
+
+    late = make_rows(1)
+    late[0]["timestamp"] = (DAYS[0] + timedelta(hours=5)).isoformat()
+    with conn:
+        conn.executemany("INSERT INTO audit (timestamp, user, risk, blocked) VALUES (:timestamp, :user, :risk, :blocked)", late)
+    assert compact(conn, hot_days=3, archive_dir=str(tmp_path / "archive"), fmt="jsonl.gz", now=NOW) == [(day, 1)]
+
+    day, path, _, rows, min_id, max_id = partitions(conn)[0]
+    assert (rows, max_id) == (11, 31)
+    assert 31 in archived_ids(conn) and 31 not in ids(conn)
+
+
+def test_retention_deletes_old_partitions(tmp_path):
+    conn, _ = archived_db(tmp_path)
+    oldest, path, *_ = partitions(conn)[0]
+
+    assert apply_retention(conn, retention_days=7, now=NOW) == [oldest]
+    assert not os.path.exists(path)
+    assert len(partitions(conn)) == 1
+    assert apply_retention(conn, retention_days=None, now=NOW) == []
+
+
+def test_update_archived_row(tmp_path):
+    conn, _ = archived_db(tmp_path)
+    row_id = next(i for i in archived_ids(conn) if i % 3 == 1)    # blocked rows: i % 3 == 0, ids start at 1
+
+    assert update_archived(conn, row_id, {"blocked": 0})
+    blocked = {int(i): int(b) for df in read_archived(conn, ["id", "blocked"]) for i, b in zip(df["id"], df["blocked"])}
+    assert blocked[row_id] == 0
+    assert not update_archived(conn, 10_000, {"blocked": 0})
+
+
+def test_maintain_prunes_rollups(tmp_path):
+    conn = make_audit_db(tmp_path / "audit.db", make_rows())
+    report = maintain(conn, hot_days=3, retention_days=7, archive_dir=str(tmp_path / "archive"),
+                      fmt="jsonl.gz", now=NOW)
+
+    assert len(report["compacted"]) == 2 and len(report["expired"]) == 1
+    assert report["pruned"]["minute"] > 0 and report["pruned"]["day"] > 0
+    oldest = dict(conn.execute("SELECT granularity, MIN(bucket) FROM audit_rollup GROUP BY granularity").fetchall())
+    assert oldest["day"] >= (NOW - timedelta(days=7)).strftime("%Y-%m-%d")
+
+
+def test_feed_reads_span_compaction(tmp_path):
+    tenant = tmp_path.name.replace("_", "-")
+    os.makedirs(tenant_dir(tenant))
+    rows = make_rows()
+    write_rows(rows, tenant)
+    before = fetch_audit_since(0, limit=100, tenant=tenant)
+
+    compact(audit_connection(tenant), hot_days=3, archive_dir=archive_dir(tenant), fmt="jsonl.gz", now=NOW)
+
+    # the same rows, in id order, wherever they now live
+    assert fetch_audit_since(0, limit=100, tenant=tenant) == before
+    cursor = before[9][0]
+    assert fetch_audit_since(cursor, limit=5, tenant=tenant) == before[10:15]
+    assert fetch_audit_latest(12, tenant=tenant) == before[-12:]
+
+    timestamp = FEED_COLUMNS.index("timestamp")
+    in_range = fetch_audit_range(DAYS[0].isoformat(), DAYS[2].isoformat(), tenant=tenant)
+    assert sorted(in_range) == sorted(r for r in before if DAYS[0].isoformat() <= r[timestamp] < DAYS[2].isoformat())
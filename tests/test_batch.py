@@ -0,0 +1,52 @@
+from app.main import process_event, process_events, score_event, score_events
+from app.storage import fetch_audit_latest, FEED_COLUMNS
+
+USERS = ["alice", "bob", "carol", "dave", "mallory"]   # mallory is not registered
+
+# columns that differ between two runs by construction
+VOLATILE = {"id", "timestamp", "session_id"}
+
+
+def make_events(n=40):
+    return [
+        {
+            "user": USERS[i % len(USERS)],
+            "ip": f"10.0.0.{i}",
+            "device": ["Windows Laptop", "iPhone", "Linux Server"][i % 3],
+            "location": ["Nairobi, Kenya", "Lagos, Nigeria"][i % 2],
+            "login_hour": (i * 5) % 24,
+            "device_known": int(i % 3 != 2),
+            "location_known": int(i % 4 != 3),
+            "access_count": (i * 7) % 60,
+            "role_level": 1 + i % 3,
+        }
+        for i in range(n)
+    ]
+
+
+def audit_rows(n):
+    keep = [i for i, col in enumerate(FEED_COLUMNS) if col not in VOLATILE]
+    return [tuple(row[i] for i in keep) for row in fetch_audit_latest(n)]
+
+
+def test_score_events_matches_score_event(fresh_state):
+    events = make_events()
+
+    single = [score_event(dict(e))[0] for e in events]
+    fresh_state()
+    batch = [result for result, _ in score_events([dict(e) for e in events])]
+
+    assert batch == single
+
+
+def test_process_events_matches_process_event_row_for_row(fresh_state):
+    events = make_events()
+
+    single = [process_event(dict(e)) for e in events]
+    single_rows = audit_rows(len(events))
+    fresh_state()
+    batch = process_events([dict(e) for e in events])
+    batch_rows = audit_rows(len(events))
+
+    assert batch == single
+    assert batch_rows == single_rows
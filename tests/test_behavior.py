@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta
+
+from app.behavior import BehaviorStore, ReplayClock
+
+
+def test_replay_clock_is_monotonic_and_capped():
+    clock = ReplayClock()
+    start = datetime(2026, 1, 1, 12, 0)
+
+    first = clock(start.isoformat())
+    # out-of-order and missing timestamps never move the clock back
+    assert clock((start - timedelta(hours=1)).isoformat()) == first
+    assert clock("not a timestamp") == first
+    assert clock(None) == first
+    assert clock((start + timedelta(seconds=30)).isoformat()) == first + 30
+    # future timestamps stop at the current time
+    assert clock("2999-01-01T00:00:00") <= time.time()
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "behavior.pkl")
+    store = BehaviorStore(snapshot_path=path)
+    now = time.time()
+    for i in range(3):
+        store.observe("alice", f"10.0.0.{i}", "iPhone", now=now + i)
+    store.snapshot()
+
+    restored = BehaviorStore(snapshot_path=path)
+    features = restored.observe("alice", "10.0.0.9", "iPhone", now=now + 3)
+    expected = store.observe("alice", "10.0.0.9", "iPhone", now=now + 3)
+    assert features == expected
+    assert features["distinct_ips_hour"] == 4
+
+
+def test_only_one_store_writes_snapshots(tmp_path):
+    path = str(tmp_path / "behavior.pkl")
+    first, second = BehaviorStore(snapshot_path=path), BehaviorStore(snapshot_path=path)
+    first.start_snapshots()
+    second.start_snapshots()
+    try:
+        assert first._thread is not None
+        assert second._thread is None
+    finally:
+        first.stop_snapshots()
+    second.start_snapshots()
+    assert second._thread is not None
+    second.stop_snapshots()
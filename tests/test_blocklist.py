@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+from app import main
+from app.blocklist import BlockList, blocklist
+from app.main import score_event, score_events
+from app.tenants import scoped, tenant_dir
+from tests.test_cache import EVENT
+
+
+@pytest.fixture
+def no_model(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("blocked events must not reach the model")
+    monkeypatch.setattr(main, "detect", fail)
+    monkeypatch.setattr(main, "detect_many", fail)
+
+
+@pytest.fixture
+def blocked_user():
+    blocklist.block("user", "blocked-user", reason="test")
+    yield dict(EVENT, user="blocked-user", session_id=None)
+    blocklist.unblock("user", "blocked-user")
+
+
+def test_blocked_events_skip_the_model(fresh_state, blocked_user, no_model):
+    for result, audit in [score_event(dict(blocked_user)), score_events([dict(blocked_user)])[0]]:
+        assert (result["risk"], result["blocked"]) == (100, 1)
+        assert result["reasons"] == ["Blocked user (blocked-user) – awaiting admin release"]
+        assert audit[0]["model_version"] == "blocklist"
+
+
+def test_blocks_stay_within_their_tenant(fresh_state):
+    for tenant in ("blocks-a", "blocks-b"):
+        os.makedirs(tenant_dir(tenant), exist_ok=True)
+    blocklist.block("ip", scoped("blocks-a", EVENT["ip"]))
+    try:
+        assert score_event(dict(EVENT, tenant="blocks-a"))[0]["blocked"] == 1
+        for other in (None, "blocks-b"):
+            result, _ = score_event(dict(EVENT, tenant=other))
+            assert not result["reasons"][0].startswith("Blocked ip")
+    finally:
+        blocklist.unblock("ip", scoped("blocks-a", EVENT["ip"]))
+
+
+def test_blocks_expire(tmp_path):
+    blocks = BlockList(str(tmp_path / "blocks.db"), sync_interval=0)
+    blocks.block("session", "s1", ttl=0.05)
+    blocks.block("session", "s2")
+    assert blocks.match(session_id="s1") == ("session", "s1")
+
+    time.sleep(0.1)
+    assert blocks.match(session_id="s1") is None
+    assert [entry["value"] for entry in blocks.active()] == ["s2"]
+
+
+def test_changes_reach_other_processes(tmp_path):
+    # two processes' views of the same table
+    path = str(tmp_path / "blocks.db")
+    first, second = BlockList(path, sync_interval=0), BlockList(path, sync_interval=0)
+
+    first.block("user", "eve")
+    assert second.match(user="eve") == ("user", "eve")
+
+    second.unblock("user", "eve")
+    assert first.match(user="eve") is None
+
+    # a change made while another process also changed the table
+    # re-reads it instead of patching the local copy
+    second.block("ip", "10.9.9.9")
+    first.block("user", "mallory")
+    second.sync(force=True)
+    assert first._entries == second._entries == {("ip", "10.9.9.9"): None, ("user", "mallory"): None}
@@ -0,0 +1,74 @@
+import json
+
+import joblib
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from app.cache import result_cache
+from app.config import MODEL_PATH, RULES_PATH
+from app.main import score_event
+from app.registry import registry
+
+EVENT = {
+    "user": "alice",
+    "ip": "10.1.0.1",
+    "session_id": "cache-test",
+    "device": "Windows Laptop",
+    "location": "Nairobi, Kenya",
+    "login_hour": 10,
+    "device_known": 1,
+    "location_known": 1,
+    "access_count": 3,
+    "role_level": 1,
+}
+
+
+def score_twice():
+    before = result_cache.hits
+    first, _ = score_event(dict(EVENT))
+    second, _ = score_event(dict(EVENT))
+    assert result_cache.hits == before + 1
+    assert second == first
+    return first
+
+
+def test_repeated_event_is_served_from_cache(fresh_state):
+    score_twice()
+
+
+def test_rules_change_invalidates_cache(model_files):
+    old_version = registry.current().version
+    score_twice()
+
+    with open(RULES_PATH) as f:
+        rules = json.load(f)
+    # login_hour 10 is now off-hours
+    rules["allowed_hours"] = [0, 1]
+    with open(RULES_PATH, "w") as f:
+        json.dump(rules, f)
+    assert registry.reload().version != old_version
+
+    misses = result_cache.misses
+    changed = score_twice()
+    assert result_cache.misses == misses + 1
+
+    # what the cache serves is what an empty cache computes
+    result_cache.clear()
+    assert score_event(dict(EVENT))[0] == changed
+
+
+def test_model_change_invalidates_cache(model_files):
+    old_version = registry.current().version
+    score_twice()
+
+    model = joblib.load(MODEL_PATH)
+    X = np.random.default_rng(0).normal(size=(200, model.n_features_in_))
+    joblib.dump(IsolationForest(n_estimators=20, random_state=0).fit(X), MODEL_PATH)
+    bundle = registry.reload()
+    assert bundle.version != old_version
+
+    misses = result_cache.misses
+    score_twice()
+    assert result_cache.misses == misses + 1
+
+    _, audit = score_event(dict(EVENT))
+    assert audit[0]["model_version"] == bundle.version
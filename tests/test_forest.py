@@ -0,0 +1,50 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from app.config import MODEL_PATH
+from app.forest import CompiledForest
+
+TOLERANCE = 1e-9
+
+
+def sample_rows(n, n_features, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, n_features)) * rng.uniform(1, 50, size=n_features)
+
+
+def assert_same_scores(model, X):
+    expected = model.decision_function(X)
+    compiled = CompiledForest.from_model(model).decision_function(X)
+    np.testing.assert_allclose(compiled, expected, rtol=0, atol=TOLERANCE)
+
+
+def test_shipped_model_matches_sklearn():
+    model = joblib.load(MODEL_PATH)
+    # more rows than one chunk, so the chunked path is covered too
+    X = sample_rows(CompiledForest.chunk_size * 3 + 7, model.n_features_in_)
+    assert_same_scores(model, X)
+
+
+@pytest.mark.parametrize("params", [
+    {"n_estimators": 25, "random_state": 1},
+    {"n_estimators": 10, "max_samples": 16, "random_state": 2},
+    {"n_estimators": 10, "max_features": 0.5, "random_state": 3},
+])
+def test_fitted_models_match_sklearn(params):
+    X = sample_rows(300, 6, seed=params["random_state"])
+    model = IsolationForest(**params).fit(X)
+    assert_same_scores(model, sample_rows(100, 6, seed=42))
+
+
+def test_single_row_and_saved_copy(tmp_path):
+    model = IsolationForest(n_estimators=15, random_state=4).fit(sample_rows(200, 4))
+    row = sample_rows(1, 4, seed=5)[0]
+
+    path = str(tmp_path / "forest.joblib")
+    CompiledForest.from_model(model).save(path, "hash")
+    loaded = CompiledForest.load(path, "hash", mmap_mode="r")
+
+    np.testing.assert_allclose(loaded.decision_function(row), model.decision_function(row.reshape(1, -1)),
+                               rtol=0, atol=TOLERANCE)
+    assert CompiledForest.load(path, "other-hash") is None
@@ -0,0 +1,55 @@
+import io
+import json
+
+from app.ingest import ingest
+from app.storage import audit_connection, read_checkpoint
+
+
+def jsonl(events):
+    return "".join(json.dumps(e) + "\n" for e in events).encode()
+
+
+def audit_count():
+    return audit_connection().execute("SELECT COUNT(*) FROM audit").fetchone()[0]
+
+
+def test_bad_values_are_counted_not_fatal(fresh_state):
+    events = [{"user": "alice", "login_hour": h} for h in (8, "abc", 9)]
+    data = jsonl(events) + b"not json\n"
+
+    before = audit_count()
+    total, bad, offset = ingest(io.BytesIO(data), chunk_size=10, report_every=1e9)
+
+    assert (total, bad, offset) == (2, 2, len(data))
+    assert audit_count() == before + 2
+
+
+def test_checkpoint_is_stored_with_the_rows(fresh_state):
+    data = jsonl([{"user": "bob", "login_hour": h % 24} for h in range(10)])
+
+    before = audit_count()
+    ingest(io.BytesIO(data), chunk_size=4, checkpoint="backfill-test", report_every=1e9)
+    assert read_checkpoint("backfill-test") == len(data)
+    assert audit_count() == before + 10
+
+    # a rerun from the stored offset adds nothing
+    offset = read_checkpoint("backfill-test")
+    stream = io.BytesIO(data)
+    stream.seek(offset)
+    assert ingest(stream, chunk_size=4, offset=offset, checkpoint="backfill-test", report_every=1e9)[0] == 0
+    assert audit_count() == before + 10
+
+
+def test_timestamps_are_stored_as_utc(fresh_state):
+    events = [
+        {"user": "alice", "session_id": "ts-epoch", "timestamp": 1700000000},
+        {"user": "alice", "session_id": "ts-offset", "timestamp": "2024-03-01T23:30:00-05:00"},
+        {"user": "alice", "session_id": "ts-bad", "timestamp": "03/01/2024 10:00"},
+    ]
+    total, bad, _ = ingest(io.BytesIO(jsonl(events)), chunk_size=10, report_every=1e9)
+    assert (total, bad) == (2, 1)
+
+    stored = dict(audit_connection().execute(
+        "SELECT session_id, timestamp FROM audit WHERE session_id LIKE 'ts-%'"
+    ).fetchall())
+    assert stored == {"ts-epoch": "2023-11-14T22:13:20", "ts-offset": "2024-03-02T04:30:00"}
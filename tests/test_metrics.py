@@ -0,0 +1,67 @@
+import pytest
+from app import metrics
+from app.metrics import BUCKETS, Counter, Histogram, HistogramFamily, bucket_bounds, bucket_index, gauges
+
+
+def test_bucket_bounds_cover_each_value():
+    values = list(range(0, 5000)) + [2 ** e + d for e in range(5, 36) for d in (-1, 0, 1)] + [123_456_789]
+    for micros in values:
+        lower, upper = bucket_bounds(bucket_index(micros))
+        assert lower <= micros < upper
+        # log-linear: a bucket is at most 1/16 of its lower bound wide
+        assert upper - lower <= max(1, lower / 16)
+
+    # contiguous, and anything slower lands in the last bucket
+    assert all(bucket_bounds(i)[1] == bucket_bounds(i + 1)[0] for i in range(BUCKETS - 1))
+    assert bucket_index(10 ** 15) == BUCKETS - 1
+
+
+def test_quantiles():
+    assert Histogram().quantiles() == {0.5: 0.0, 0.9: 0.0, 0.99: 0.0, 0.999: 0.0}
+
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.count == 1000
+    assert histogram.total == pytest.approx(500.5)
+
+    quantiles = histogram.quantiles()
+    for q, want in [(0.5, 0.5), (0.9, 0.9), (0.99, 0.99), (0.999, 0.999)]:
+        assert quantiles[q] == pytest.approx(want, rel=0.03)
+
+
+def test_prometheus_text():
+    family = HistogramFamily("t_stage_seconds", "Stage latency", "stage")
+    family.observe("detect", 0.000010)
+    family.observe("detect", 0.000010)
+    counter = Counter("t_events_total", "Events", "band")
+    counter.inc("high")
+    counter.inc("low", 3)
+
+    assert family.render() == [
+        "# HELP t_stage_seconds Stage latency",
+        "# TYPE t_stage_seconds summary",
+        't_stage_seconds{stage="detect",quantile="0.5"} 0.000010500',
+        't_stage_seconds{stage="detect",quantile="0.9"} 0.000010500',
+        't_stage_seconds{stage="detect",quantile="0.99"} 0.000010500',
+        't_stage_seconds{stage="detect",quantile="0.999"} 0.000010500',
+        't_stage_seconds_sum{stage="detect"} 0.000020000',
+        't_stage_seconds_count{stage="detect"} 2',
+    ]
+    assert counter.render() == [
+        "# HELP t_events_total Events",
+        "# TYPE t_events_total counter",
+        't_events_total{band="high"} 1',
+        't_events_total{band="low"} 3',
+    ]
+    # numbers only; booleans and strings are skipped
+    assert gauges("t_queue", {"depth": 4, "running": True, "mode": "x", "mean": 1.5}, "Queue") == [
+        "# HELP t_queue_depth Queue (depth)", "# TYPE t_queue_depth gauge", "t_queue_depth 4",
+        "# HELP t_queue_mean Queue (mean)", "# TYPE t_queue_mean gauge", "t_queue_mean 1.5",
+    ]
+
+
+def test_render_appends_extra_blocks():
+    text = metrics.render(["t_extra 1"])
+    assert text.endswith("t_extra 1\n")
+    assert "# TYPE trustlens_stage_seconds summary" in text
@@ -0,0 +1,61 @@
+import json
+import sqlite3
+
+from app.migrations import migrate, SCHEMA_VERSION
+
+# the audit table as the shipped data/trustlens.db has it
+LEGACY_TABLE = """
+    CREATE TABLE audit (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        event TEXT,
+        risk REAL,
+        reasons TEXT,
+        verified INTEGER DEFAULT 0,
+        blocked INTEGER DEFAULT 0,
+        credentials_rotated INTEGER DEFAULT 0
+    )
+"""
+
+RAW = {"user": "andrew", "ip": "192.168.1.10", "action": "login"}
+SANITIZED = {
+    "username": "carol", "ip_address": "10.0.0.7", "session_id": "sess-1",
+    "device_name": "iPhone", "location_name": "Kisumu Office", "role_name": "Unknown",
+    "login_hour": 7, "device_known": 1, "location_known": 1, "access_count": 10, "role_level": 2,
+}
+
+PRINCIPALS = "SELECT user, ip, device, location, role, login_hour FROM audit ORDER BY id"
+
+
+def legacy_db(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    with conn:
+        conn.execute(LEGACY_TABLE)
+        conn.executemany(
+            "INSERT INTO audit (timestamp, event, risk, reasons) VALUES ('2024-03-01T10:00:00', ?, 10, '')",
+            [(json.dumps(RAW),), (json.dumps(SANITIZED),)]
+        )
+    return conn
+
+
+def test_backfill_reads_both_blob_shapes(tmp_path):
+    conn = legacy_db(tmp_path)
+    migrate(conn)
+
+    assert conn.execute(PRINCIPALS).fetchall() == [
+        ("andrew", "192.168.1.10", None, None, None, None),
+        ("carol", "10.0.0.7", "iPhone", "Kisumu Office", "Unknown", 7),
+    ]
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+def test_v2_rows_missing_their_aliases_are_read_again(tmp_path):
+    conn = legacy_db(tmp_path)
+    migrate(conn)
+    # what schema v2 stored for the sanitize()-style blob
+    with conn:
+        conn.execute("UPDATE audit SET user = 'Unknown', ip = NULL, device = NULL, location = NULL WHERE id = 2")
+        conn.execute("PRAGMA user_version = 2")
+
+    migrate(conn)
+    assert conn.execute(PRINCIPALS).fetchall()[1][:4] == ("carol", "10.0.0.7", "iPhone", "Kisumu Office")
@@ -0,0 +1,27 @@
+import asyncio
+
+from app.main import score_events
+from app.pipeline import AuditQueue
+from app.storage import fetch_audit_latest
+from tests.test_batch import make_events
+
+
+def test_rows_are_published_after_commit(fresh_state):
+    evaluated = score_events(make_events(10))
+    seen = []
+
+    def on_saved(audit):
+        # the row is already readable when the callback runs
+        latest = {row[4] for row in fetch_audit_latest(len(evaluated))}
+        seen.append(audit[0]["session_id"] in latest)
+
+    async def main():
+        queue = AuditQueue(on_saved=on_saved)
+        await queue.start()
+        await queue.put_many([audit for _, audit in evaluated])
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(main())
+    assert stats["written"] == len(evaluated)
+    assert seen == [True] * len(evaluated)
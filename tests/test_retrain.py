@@ -0,0 +1,101 @@
+import sqlite3
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from app.engine import FEATURES
+from app.retrain import Reservoir, compare_models, ks_distance, previous_path, promote, sample_audit
+from app.storage import audit_row
+from tests.test_analytics import NOW, make_audit_db
+
+
+def test_reservoir_keeps_everything_until_full():
+    reservoir = Reservoir(5, 1, seed=0)
+    reservoir.add([[1], [2], [3]])
+    reservoir.add([[4]])
+    assert reservoir.seen == 4
+    assert reservoir.sample().ravel().tolist() == [1, 2, 3, 4]
+
+
+def test_reservoir_sample_is_uniform():
+    rng = np.random.default_rng(0)
+    stream = np.arange(100, dtype=float).reshape(-1, 1)
+    picked = np.zeros(100)
+
+    for trial in range(2000):
+        reservoir = Reservoir(10, 1, seed=int(rng.integers(1 << 31)))
+        for offset in range(0, 100, 7):
+            reservoir.add(stream[offset:offset + 7])
+        sample = reservoir.sample().ravel().astype(int)
+        assert len(set(sample)) == 10
+        picked[sample] += 1
+
+    # every row is kept with probability 10 / 100
+    assert np.all(np.abs(picked / 2000 - 0.1) < 0.03)
+
+
+def test_reservoir_is_reproducible_with_a_seed():
+    samples = []
+    for _ in range(2):
+        reservoir = Reservoir(8, 2, seed=42)
+        for start in range(0, 200, 25):
+            reservoir.add(np.arange(start, start + 25, dtype=float).repeat(2).reshape(-1, 2))
+        samples.append(reservoir.sample())
+    assert np.array_equal(samples[0], samples[1])
+
+
+def test_ks_distance():
+    a = np.array([1.0, 2.0, 3.0])
+    assert ks_distance(a, a) == 0.0
+    assert ks_distance(a, a + 10) == 1.0
+    assert ks_distance(a, np.array([2.0, 3.0, 4.0])) == pytest.approx(1 / 3)
+
+
+def test_compare_models():
+    current = np.array([-0.2, -0.1, 0.1, 0.2])
+    candidate = np.array([-0.2, 0.1, 0.1, 0.2])
+    report = compare_models(current, candidate)
+
+    assert report["rows"] == 4
+    assert report["current"]["flagged"] == 0.5
+    assert report["candidate"]["flagged"] == 0.25
+    assert report["flag_shift"] == -0.25
+    assert report["agreement"] == 0.75
+
+
+def test_promote_keeps_the_previous_model(tmp_path):
+    model, candidate = tmp_path / "model.joblib", tmp_path / "model.candidate.joblib"
+    model.write_text("old")
+    candidate.write_text("new")
+
+    promote(str(candidate), str(model))
+    assert model.read_text() == "new"
+    assert (tmp_path / "model.previous.joblib").read_text() == "old"
+    assert previous_path(str(model)) == str(tmp_path / "model.previous.joblib")
+    assert not candidate.exists()
+
+
+def test_sample_skips_blocked_and_old_rows(tmp_path):
+    rows = [
+        audit_row({"user": "alice", "timestamp": (NOW - timedelta(days=i)).isoformat(),
+                   "login_hour": i, "device_known": 1, "location_known": 1, "access_count": i, "role_level": 1},
+                  10, [], int(i % 5 == 0), 0, 1)
+        for i in range(20)
+    ]
+    make_audit_db(tmp_path / "audit.db", rows).close()
+
+    sample, seen = sample_audit(str(tmp_path / "audit.db"), window_days=10, size=100, seed=0, now=NOW)
+    # days 0..9, minus the blocked ones (0 and 5)
+    assert seen == 8
+    assert sorted(sample[:, FEATURES.index("login_hour")].tolist()) == [1, 2, 3, 4, 6, 7, 8, 9]
+
+
+def test_sample_from_a_database_the_server_never_opened(tmp_path):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(str(path))
+    with conn:
+        conn.execute("CREATE TABLE audit (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, event TEXT)")
+    conn.close()
+
+    sample, seen = sample_audit(str(path), window_days=0, size=10, now=NOW)
+    assert (len(sample), seen) == (0, 0)
@@ -0,0 +1,84 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from app.migrations import migrate
+from app.rollups import ALL, init_rollups, prune_rollups, rebuild_rollups, risk_trend, update_rollups
+from app.storage import INSERT_AUDIT, audit_row
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def make_db():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    init_rollups(conn)
+
+    rows = []
+    for i in range(60):
+        event = {
+            "user": f"user{i % 7}",
+            "location": ["Nairobi", "Lagos", None][i % 3],
+            "timestamp": (NOW - timedelta(minutes=i * 3)).isoformat(),
+        }
+        rows.append(audit_row(event, (i * 13) % 100, [], int(i % 4 == 0), int(i % 8 == 0), 1))
+    with conn:
+        conn.executemany(INSERT_AUDIT, rows)
+        update_rollups(conn, rows)
+    return conn
+
+
+def expected(rows, user=None, location=None):
+    picked = [r for r in rows if (user is None or r["user"] == user)
+              and (location is None or (r["location"] or "Unknown") == location)]
+    return len(picked), sum(r["risk"] for r in picked), sum(r["blocked"] for r in picked)
+
+
+def trend_totals(conn, **filters):
+    _, buckets = risk_trend(conn, timedelta(hours=6), now=NOW, granularity="hour", **filters)
+    return (sum(b["count"] for b in buckets),
+            sum(b["mean_risk"] * b["count"] for b in buckets),
+            sum(b["blocked"] for b in buckets))
+
+
+def test_all_users_rows_match_per_user_rows():
+    conn = make_db()
+    columns = [d[0] for d in conn.execute("SELECT * FROM audit").description]
+    rows = [dict(zip(columns, r)) for r in conn.execute("SELECT * FROM audit")]
+
+    for filters in ({}, {"location": "Lagos"}, {"location": "Unknown"}, {"user": "user3"},
+                    {"user": "user3", "location": "Nairobi"}):
+        count, risk_sum, blocked = trend_totals(conn, **filters)
+        want = expected(rows, **filters)
+        assert count == want[0]
+        assert abs(risk_sum - want[1]) < 1e-6
+        assert blocked == want[2]
+
+
+def test_totals_are_added_to_older_tables_and_rebuilds():
+    conn = make_db()
+    before = trend_totals(conn)
+
+    with conn:
+        conn.execute("DELETE FROM audit_rollup WHERE user = ?", (ALL,))
+    init_rollups(conn)
+    assert trend_totals(conn) == before
+
+    rebuild_rollups(conn)
+    assert trend_totals(conn) == before
+
+
+def test_prune_drops_only_old_buckets():
+    conn = make_db()
+    old = audit_row({"user": "user1", "location": "Lagos", "timestamp": (NOW - timedelta(days=40)).isoformat()},
+                    90, [], 1, 1, 0)
+    with conn:
+        update_rollups(conn, [old])
+
+    pruned = prune_rollups(conn, {"minute": 2, "hour": 30, "day": None}, now=NOW)
+    assert pruned["minute"] > 0 and pruned["hour"] > 0 and "day" not in pruned
+
+    oldest = dict(conn.execute("SELECT granularity, MIN(bucket) FROM audit_rollup GROUP BY granularity").fetchall())
+    assert oldest["day"] == old["timestamp"][:10]
+    assert oldest["hour"] >= (NOW - timedelta(days=30)).isoformat()[:13]
+    # recent trends are unchanged
+    assert trend_totals(conn)[0] == 60
@@ -0,0 +1,75 @@
+import joblib
+import numpy as np
+import pytest
+from app.config import MODEL_PATH
+from app.engine import score_features
+from app.registry import ModelBundle
+from app.score_table import ScoreTable, file_hash
+
+MAX_ACCESS, MAX_ROLE = 8, 3
+
+
+@pytest.fixture(scope="module")
+def model():
+    return joblib.load(MODEL_PATH)
+
+
+class Counting:
+    """
+    A scorer that counts the rows it scores.
+    """
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.rows = 0
+
+    def decision_function(self, X):
+        self.rows += len(X)
+        return self.scorer.decision_function(X)
+
+
+def test_table_matches_the_model_on_its_grid(model):
+    table = ScoreTable.build(model, "hash", MAX_ACCESS, MAX_ROLE)
+    grid = np.indices(table.scores.shape).reshape(5, -1).T
+
+    scores, hit = table.lookup(grid)
+    assert hit.all()
+    assert np.array_equal(scores, model.decision_function(grid))
+
+    # off the grid: non-integer, negative and too large rows miss
+    off = np.array([[10, 1, 1, 2.5, 1], [-1, 1, 1, 2, 1], [10, 1, 1, MAX_ACCESS + 1, 1]])
+    assert not table.lookup(off)[1].any()
+
+
+def test_score_features_mixes_table_and_model(model):
+    table = ScoreTable.build(model, "hash", MAX_ACCESS, MAX_ROLE)
+    counting = Counting(model)
+    bundle = ModelBundle("v", "hash", {}, counting, table)
+
+    X = np.array([[9, 1, 1, 3, 1], [23, 0, 0, 40, 2], [2, 0, 1, 7, 3]])
+    assert np.allclose(score_features(X, bundle), model.decision_function(X), rtol=0, atol=1e-12)
+    # only the off-grid row reached the model
+    assert counting.rows == 1
+
+
+def test_table_is_rebuilt_when_the_model_changes(model, tmp_path):
+    cache = str(tmp_path / "scores.npz")
+    counting = Counting(model)
+    model_hash = file_hash(MODEL_PATH)
+
+    first = ScoreTable.load_or_build(counting, MODEL_PATH, cache, MAX_ACCESS, MAX_ROLE)
+    built = counting.rows
+    assert first.model_hash == model_hash and built == first.scores.size
+
+    # same model file: served from the cache
+    again = ScoreTable.load_or_build(counting, MODEL_PATH, cache, MAX_ACCESS, MAX_ROLE)
+    assert counting.rows == built
+    assert np.array_equal(again.scores, first.scores)
+
+    # another model hash (or grid): rebuilt and the cache replaced
+    ScoreTable.load_or_build(counting, MODEL_PATH, cache, MAX_ACCESS, MAX_ROLE, model_hash="retrained")
+    assert counting.rows == 2 * built
+    with np.load(cache) as cached:
+        assert str(cached["model_hash"]) == "retrained"
+    ScoreTable.load_or_build(counting, MODEL_PATH, cache, MAX_ACCESS + 1, MAX_ROLE, model_hash="retrained")
+    assert counting.rows > 2 * built
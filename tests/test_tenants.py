@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+from app import registry as registry_module
+from app.blocklist import blocklist
+from app.config import RULES_PATH
+from app.feed import LiveFeed
+from app.main import score_event
+from app.registry import ModelRegistry, RulesRegistry
+from app.tenants import own_path, tenant_dir, tenant_id, tenant_registries
+from tests.test_batch import make_events
+
+
+@pytest.fixture
+def rules_tenant():
+    tenant = "rules-only"
+    os.makedirs(tenant_dir(tenant), exist_ok=True)
+    with open(RULES_PATH) as f:
+        rules = json.load(f)
+    rules["max_access"] = 2
+    with open(own_path(tenant, RULES_PATH), "w") as f:
+        json.dump(rules, f)
+    tenant_registries.forget(tenant)
+    yield tenant
+    tenant_registries.forget(tenant)
+
+
+def test_rules_only_tenant_shares_the_model(rules_tenant):
+    registry = tenant_registries.get(rules_tenant)
+    assert isinstance(registry, RulesRegistry)
+
+    shared = tenant_registries.get(None).current()
+    bundle = registry.current()
+    assert bundle.scorer is shared.scorer
+    assert bundle.rules["max_access"] == 2
+    assert bundle.version != shared.version
+    assert bundle.model_hash == shared.model_hash
+
+
+def test_first_load_happens_once(monkeypatch):
+    loads = []
+    load_bundle = registry_module.load_bundle
+
+    def counting(*args, **kwargs):
+        loads.append(1)
+        return load_bundle(*args, **kwargs)
+
+    monkeypatch.setattr(registry_module, "load_bundle", counting)
+    registry = ModelRegistry()
+    threads = [threading.Thread(target=registry.current) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+
+
+def test_unknown_tenant_is_rejected():
+    with pytest.raises(ValueError, match="Unknown tenant"):
+        tenant_id({"tenant": "nobody"})
+    with pytest.raises(ValueError):
+        score_event(dict(make_events(1)[0], tenant="nobody"))
+    assert not os.path.exists(tenant_dir("nobody"))
+
+
+def test_blocks_are_per_tenant(rules_tenant, fresh_state):
+    event = dict(make_events(1)[0], session_id="shared-sid")
+    blocklist.block("session", f"{rules_tenant}:shared-sid")
+    try:
+        result, _ = score_event(dict(event, tenant=rules_tenant))
+        assert result["blocked"] and "shared-sid" in result["reasons"][0]
+        result, _ = score_event(dict(event))
+        assert not result["reasons"][0].startswith("Blocked session")
+    finally:
+        blocklist.unblock("session", f"{rules_tenant}:shared-sid")
+
+
+def test_feed_sends_one_tenants_results():
+    async def main():
+        feed = LiveFeed(keepalive=0.05)
+        feed.start()
+        feed.publish({"tenant": "a", "n": 1})
+        feed.publish({"tenant": None, "n": 2})
+        feed.publish({"tenant": "a", "n": 3})
+
+        async def first(tenant, count):
+            seen = []
+            async for kind, seq, message in feed.stream(since=0, tenant=tenant):
+                if kind == "result":
+                    seen.append(message["n"])
+                if len(seen) == count:
+                    return seen
+
+        return await first("a", 2), await first(None, 1)
+
+    assert asyncio.run(main()) == ([1, 3], [2])
@@ -0,0 +1,34 @@
+import sqlite3
+
+from app.users import UserRegistry
+
+
+def test_other_processes_changes_are_picked_up(tmp_path):
+    path = str(tmp_path / "users.db")
+    # two workers' registries, polling on every lookup
+    first, second = UserRegistry(path, poll_interval=0), UserRegistry(path, poll_interval=0)
+    assert not second.contains("erin")
+
+    first.add_user("erin")
+    assert second.contains("erin")
+
+    second.remove_user("erin")
+    assert not first.contains("erin")
+
+    # an admin tool writing the table directly
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("INSERT INTO users VALUES ('frank')")
+    conn.close()
+    assert "frank" in first and len(second) == 1
+
+
+def test_changes_wait_for_the_poll_interval(tmp_path):
+    path = str(tmp_path / "users.db")
+    first, second = UserRegistry(path, poll_interval=0), UserRegistry(path, poll_interval=3600)
+    assert len(second) == 0
+
+    first.add_user("grace")
+    assert not second.contains("grace")
+    second.reload()
+    assert second.contains("grace")
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+from app.behavior import store
+from app.config import RULES_PATH
+from app.registry import registry
+from app.main import score_events, stage_events, detect_groups, detect_separately
+from app.workers import ScoringPool
+from tests.test_batch import make_events, VOLATILE
+from tests.test_cache import EVENT
+
+
+def strip(result):
+    return {k: v for k, v in result.items() if k not in VOLATILE}
+
+
+def run_pool(coro_fn):
+    async def main():
+        pool = ScoringPool(workers=2, max_batch=16, max_wait_ms=2.0)
+        await pool.start()
+        try:
+            return await coro_fn(pool)
+        finally:
+            await pool.stop()
+    return asyncio.run(main())
+
+
+def test_pool_matches_in_process_scoring(fresh_state):
+    events = make_events()
+    expected = [result for result, _ in score_events([dict(e) for e in events])]
+    fresh_state()
+
+    async def submit_in_order(pool):
+        # one at a time: concurrent batches may observe velocity in any order
+        return [await pool.submit(dict(e)) for e in events]
+
+    results = [result for result, _ in run_pool(submit_in_order)]
+    assert [strip(r) for r in results] == [strip(r) for r in expected]
+
+    # velocity state lives in this process, not in the workers
+    assert store.users["alice"].logins.value > 1
+
+
+def test_bad_event_fails_alone(fresh_state):
+    events = make_events(20)
+    events[7]["login_hour"] = "abc"
+
+    async def submit_all(pool):
+        return await asyncio.gather(*[pool.submit(e) for e in events], return_exceptions=True)
+
+    outcomes = run_pool(submit_all)
+    failed = [i for i, item in enumerate(outcomes) if isinstance(item, Exception)]
+    assert failed == [7]
+
+
+def test_detect_separately_isolates_the_bad_event(fresh_state):
+    staged = stage_events(make_events(3))
+    requests = staged.requests()
+    # a value only the model step chokes on
+    requests[None][1] = dict(requests[None][1], login_hour=[1, 2])
+
+    detections = detect_separately(requests)[None]
+    assert isinstance(detections[1], Exception)
+    assert detections[0] == detect_groups({None: requests[None][:1]})[None][0]
+
+
+def test_workers_follow_a_server_reload(model_files, fresh_state):
+    async def reload_then_submit(pool):
+        before, _ = await pool.submit(dict(EVENT))
+
+        with open(RULES_PATH) as f:
+            rules = json.load(f)
+        # login_hour 10 is now off-hours
+        rules["allowed_hours"] = [0, 1]
+        with open(RULES_PATH, "w") as f:
+            json.dump(rules, f)
+        version = registry.reload().version
+
+        after, audit = await pool.submit(dict(EVENT))
+        return before, after, audit, version
+
+    before, after, audit, version = run_pool(reload_then_submit)
+    assert audit[0]["model_version"] == version
+    assert after["reasons"] != before["reasons"]
+
+    # what the workers computed is what the server computes with that version
+    fresh_state()
+    assert strip(score_events([dict(EVENT)])[0][0]) == strip(after)